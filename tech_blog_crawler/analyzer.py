@@ -1,11 +1,25 @@
-import google.generativeai as genai
+# google.generativeai, markdown and dotenv are imported where they are used:
+# together they take about a second to import, which would otherwise delay the
+# crawler menu (crawler.py imports this module only when analysis is chosen).
 import os
 import sys
 import glob
 import csv
-import markdown
-from datetime import datetime
-from dotenv import load_dotenv
+import random
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from article_store import ArticleStore, default_db_path
+from report_cache import ReportCache, normalize_title, report_cache_key
+from metrics import get_metrics
+
+_metrics = get_metrics()
+
+ANALYSIS_WINDOW_DAYS = 7 # Articles last seen within this many days are analyzed
+REPORT_CACHE_BYPASS_ENV = 'ANALYZER_NO_CACHE' # Set to 1 to always call the model
 
 def _get_data_path(subfolder):
     """
@@ -40,6 +54,75 @@ def find_latest_csv():
         print(f"尋找 CSV 檔案時發生錯誤: {e}")
         return None
 
+CSV_COLUMNS = ('Title', 'Link', 'Source URL', 'Count', 'Published')
+
+def load_articles_from_csv(csv_file_path):
+    """
+    Reads articles from a crawler CSV file (Title, Link, Source URL[, Count][, Published];
+    columns are located by the header). Returns a list of dictionaries with
+    'title', 'link', 'source_url', 'count' and 'published' (None if unknown).
+    """
+    with open(csv_file_path, 'r', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = [name.strip() for name in next(reader, [])]
+        index = {name: header.index(name) for name in CSV_COLUMNS if name in header}
+
+        def cell(row, name):
+            return row[index[name]] if index.get(name, len(row)) < len(row) else ''
+
+        return [{'title': cell(row, 'Title'), 'link': cell(row, 'Link'), 'source_url': cell(row, 'Source URL'),
+                 'count': int(cell(row, 'Count')) if cell(row, 'Count').isdigit() else 1,
+                 'published': cell(row, 'Published') or None}
+                for row in reader if row]
+
+def load_articles_from_store(days=ANALYSIS_WINDOW_DAYS):
+    """
+    Reads the articles last seen within the given number of days from the
+    article database. Returns None if the database does not exist yet.
+    """
+    db_path = default_db_path()
+    if not os.path.exists(db_path):
+        return None
+    store = ArticleStore(db_path)
+    try:
+        since = (datetime.now() - timedelta(days=days)).isoformat(timespec='seconds')
+        return store.articles(since=since)
+    finally:
+        store.close()
+
+def merge_near_duplicates(articles):
+    """
+    Collapses articles whose titles are near-duplicates (the same story from
+    several blogs) into one canonical article whose 'count' adds up the group,
+    so repeated stories do not inflate the prompt or the trend counts.
+    """
+    try:
+        from dedup import collapse_near_duplicates
+    except ImportError:
+        return articles # NumPy is not installed
+    collapsed = collapse_near_duplicates(articles)
+    merged = len(articles) - len(collapsed)
+    if merged:
+        print(f"已合併 {merged} 篇近似重複的文章，剩下 {len(collapsed)} 篇不同的文章。")
+    return collapsed
+
+def _prompt_titles(articles):
+    """
+    Titles as sent to the model: prefixed with the publication date as [YYYY-MM-DD]
+    when known, and marked with (xN) for stories seen several times.
+    """
+    titles = []
+    for article in articles:
+        if not article.get('title'):
+            continue
+        title = article['title']
+        if article.get('published'):
+            title = f"[{article['published'][:10]}] {title}"
+        if article.get('count', 1) > 1:
+            title += f" (x{article['count']})"
+        titles.append(title)
+    return titles
+
 def get_api_key():
     """
     Retrieves the API key by checking environment variables first,
@@ -52,6 +135,7 @@ def get_api_key():
         # In script mode, look for .env in the project root
         dotenv_path = os.path.join(os.path.abspath('.'), '.env')
     
+    from dotenv import load_dotenv
     load_dotenv(dotenv_path=dotenv_path)
 
     user_key = os.environ.get("GEMINI_API_KEY")
@@ -84,6 +168,7 @@ def _save_as_md(content, timestamp):
 def _save_as_html(content, timestamp):
     """Saves the report content as an HTML file with basic styling."""
     try:
+        import markdown
         html_body = markdown.markdown(content)
         html_template = f"""
         <!DOCTYPE html>
@@ -159,38 +244,180 @@ def _save_report_menu(report_content):
         _save_as_md(report_content, timestamp)
         _save_as_html(report_content, timestamp)
 
-def analyze_data(api_key, csv_file_path):
+# --- Local title statistics (no model needed) ---
+TOP_TERMS = 15
+STATS_SAMPLE_TITLES = 40 # Titles still shown to the model as context in statistics mode
+
+_LATIN_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#.\-]*[a-z0-9+#]|[a-z0-9]")
+_NUMBER_RE = re.compile(r"[\d.\-]+")
+_CJK_RUN_RE = re.compile(r"[\u3400-\u9fff\uf900-\ufaff]+")
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'how', 'in', 'is', 'it', 'its', 'new',
+    'of', 'on', 'or', 'that', 'the', 'this', 'to', 'vs', 'was', 'what', 'why', 'with', 'you', 'your',
+    '的', '了', '與', '和', '及', '在', '是', '為', '將', '於', '也', '都', '讓', '這', '那', '一個',
+}
+
+_jieba = None # The jieba module once looked up, or False if it is not installed
+
+def _get_jieba():
+    # A failed import is not cached by Python and rescans sys.path, so remember the outcome
+    global _jieba
+    if _jieba is None:
+        try:
+            import jieba
+            _jieba = jieba
+        except ImportError:
+            _jieba = False
+    return _jieba
+
+def _segment_cjk(text):
+    """Splits a run of CJK characters into words with jieba if installed, otherwise into character bigrams."""
+    jieba = _get_jieba()
+    if jieba:
+        return [word for word in jieba.lcut(text) if len(word) > 1]
+    if len(text) == 1:
+        return []
+    return [text[i:i + 2] for i in range(len(text) - 1)]
+
+def tokenize_title(title):
+    """Returns the lowercase terms of a title: Latin words plus segmented CJK words."""
+    title = title.lower()
+    terms = [token for token in _LATIN_TOKEN_RE.findall(title) if len(token) > 1 and not _NUMBER_RE.fullmatch(token)]
+    for run in _CJK_RUN_RE.findall(title):
+        terms.extend(_segment_cjk(run))
+    return [term for term in terms if term not in STOPWORDS]
+
+def _stats_days(articles):
+    """The day each article is counted on: its publication date if known, else the crawl day ('' if neither)."""
+    return [(article.get('published') or article.get('first_seen') or '')[:10] for article in articles]
+
+def compute_title_stats(articles, top_n=TOP_TERMS):
     """
-    Reads data from a CSV file and uses the Gemini API to generate an analysis.
+    Builds a sparse term-document matrix of the article titles with NumPy and
+    computes, per term, the total frequency, document frequency, summed TF-IDF
+    and the change in daily mentions between the last two days (the publication
+    date from 'published' when known, otherwise the crawl day from 'first_seen').
+    Returns a dictionary with 'num_titles', 'days', 'top_terms' and 'rising'.
     """
-    try:
+    import numpy as np
+
+    vocab = {}
+    doc_ids, term_ids = [], []
+    day_labels = _stats_days(articles)
+    for doc_id, article in enumerate(articles):
+        for term in tokenize_title(article.get('title', '')):
+            doc_ids.append(doc_id)
+            term_ids.append(vocab.setdefault(term, len(vocab)))
+
+    terms = np.array(list(vocab), dtype=object)
+    num_docs, num_terms = len(articles), len(vocab)
+    if num_terms == 0:
+        return {'num_titles': num_docs, 'days': [], 'top_terms': [], 'rising': []}
+    doc_ids = np.asarray(doc_ids, dtype=np.int64)
+    term_ids = np.asarray(term_ids, dtype=np.int64)
+
+    # Coordinate form of the term-document matrix: one entry per (doc, term) occurrence
+    tf = np.bincount(term_ids, minlength=num_terms)
+    pairs = np.unique(doc_ids * num_terms + term_ids)
+    df = np.bincount(pairs % num_terms, minlength=num_terms)
+    idf = np.log((1 + num_docs) / (1 + df)) + 1
+    doc_lengths = np.bincount(doc_ids, minlength=num_docs)
+    tfidf = np.bincount(term_ids, weights=idf[term_ids] / doc_lengths[doc_ids], minlength=num_terms)
+
+    top = np.argsort(-tfidf, kind='stable')[:top_n]
+    top_terms = [{'term': terms[i], 'count': int(tf[i]), 'df': int(df[i]), 'tfidf': float(tfidf[i])} for i in top]
+
+    # Daily mention counts: a (days x terms) matrix, compared between the last two days
+    days = sorted({day for day in day_labels if day})
+    rising = []
+    if len(days) >= 2:
+        day_index = {day: i for i, day in enumerate(days)}
+        doc_days = np.array([day_index.get(day, -1) for day in day_labels], dtype=np.int64)
+        dated = doc_days[doc_ids] >= 0
+        per_day = np.bincount(doc_days[doc_ids][dated] * num_terms + term_ids[dated],
+                              minlength=len(days) * num_terms).reshape(len(days), num_terms)
+        delta = per_day[-1] - per_day[-2]
+        for i in np.argsort(-delta, kind='stable')[:top_n]:
+            if delta[i] <= 0:
+                break
+            rising.append({'term': terms[i], 'latest': int(per_day[-1, i]), 'previous': int(per_day[-2, i]),
+                           'delta': int(delta[i])})
+
+    return {'num_titles': num_docs, 'days': days, 'top_terms': top_terms, 'rising': rising}
+
+def format_stats_table(stats):
+    """Renders compute_title_stats output as compact Markdown tables."""
+    lines = [f"共 {stats['num_titles']} 篇文章標題" + (f"，期間 {stats['days'][0]} ~ {stats['days'][-1]}" if stats['days'] else "") + "。",
+             "", "| 關鍵字 | 出現次數 | 文章數 | TF-IDF |", "|---|---|---|---|"]
+    lines += [f"| {t['term']} | {t['count']} | {t['df']} | {t['tfidf']:.2f} |" for t in stats['top_terms']]
+    if stats['rising']:
+        lines += ["", f"**增長最快 ({stats['days'][-2]} → {stats['days'][-1]})：**", "",
+                  "| 關鍵字 | 前一天 | 最新一天 | 變化 |", "|---|---|---|---|"]
+        lines += [f"| {t['term']} | {t['previous']} | {t['latest']} | +{t['delta']} |" for t in stats['rising']]
+    return "\n".join(lines)
+
+def render_local_report(stats):
+    """Builds a standalone Markdown report from the local statistics, without calling the model."""
+    top = [t['term'] for t in stats['top_terms'][:3]]
+    summary = f"本報告分析了 {stats['num_titles']} 篇文章標題。"
+    if top:
+        summary += f"出現最多的關鍵字為「{'」、「'.join(top)}」。"
+    if stats['rising']:
+        summary += f"近期討論成長最快的是「{stats['rising'][0]['term']}」(+{stats['rising'][0]['delta']})。"
+    return f"""### 執行摘要
+{summary}
+
+## 趨勢分析
+{format_stats_table(stats)}
+
+## 數據源附註
+數據來源於爬蟲，分析基於標題文字，並以本地詞頻與 TF-IDF 統計產生 (未使用 AI 模型)。
+"""
+
+# --- Model clients ---
+# Any object with a model_name attribute and a generate(prompt) -> str method can
+# be used as a model client, e.g. StubModelClient in tests and benchmarks.
+MODEL_NAME = 'gemini-2.5-flash'
+
+class GeminiClient:
+    """Model client backed by the Gemini API."""
+    def __init__(self, api_key, model_name=MODEL_NAME):
+        import google.generativeai as genai
         genai.configure(api_key=api_key)
-    except Exception as e:
-        print(f"設定 AI 模型時發生錯誤: {e}")
-        return
+        self.model_name = model_name
+        self._model = genai.GenerativeModel(model_name)
 
-    try:
-        with open(csv_file_path, 'r', encoding='utf-8') as f:
-            reader = csv.reader(f)
-            try:
-                next(reader)
-            except StopIteration:
-                print("CSV 檔案為空或無效，沒有可分析的資料。")
-                return
-            data_rows = list(reader)
-            if not data_rows:
-                print("CSV 檔案只有標頭但沒有資料，無法分析。")
-                return
-
-        titles = [row[0] for row in data_rows if row]
-        if not titles:
-            print("在 CSV 資料中找不到有效的標題。")
-            return
+    def generate(self, prompt):
+        return self._model.generate_content(prompt).text
+
+class StubModelClient:
+    """
+    Offline stand-in for GeminiClient. Returns a fixed-format answer after an
+    optional simulated latency, and records every prompt it receives.
+    """
+    def __init__(self, latency=0.0, model_name='stub'):
+        self.model_name = model_name
+        self.latency = latency
+        self.prompts = []
+        self._lock = threading.Lock()
+
+    def generate(self, prompt):
+        with self._lock:
+            self.prompts.append(prompt)
+        if self.latency:
+            time.sleep(self.latency)
+        return f"### 執行摘要\n(stub) 收到 {len(prompt)} 字元的提示。"
+
+# --- Report generation (single prompt or map-reduce) ---
+# Rough prompt budget in tokens. Above it, titles are split into chunks that are
+# summarized concurrently (map) and the summaries merged into one report (reduce).
+PROMPT_TOKEN_BUDGET = 30000
+MAP_WORKERS = 4
+MAX_RETRIES = 5
+RETRY_BASE_DELAY = 2.0 # Seconds; doubled on every retry, with jitter
 
-        data_for_prompt = "\n".join(f"- {title}" for title in titles)
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        prompt = f"""你是一位資深的軟體工程與市場分析顧問。
-你的任務是基於提供的 CSV 文章列表，生成一份專業的「數據洞察報告」。
+REPORT_PROMPT_TEMPLATE = """你是一位資深的軟體工程與市場分析顧問。
+你的任務是基於提供的{source_description}，生成一份專業的「數據洞察報告」。
 
 ## 輸出格式要求 (嚴格遵守 Markdown 格式)：
 1.  **### 執行摘要**：用三句話總結最重大的發現。
@@ -200,45 +427,269 @@ def analyze_data(api_key, csv_file_path):
 3.  **## 產品行動建議**：針對分析結果，提出一項可立即執行的產品或工程行動建議。
 4.  **## 數據源附註**：註明數據來源於爬蟲，且分析基於標題文字。
 
-**Article Titles:**
-{data_for_prompt}
+**{data_heading}:**
+{data}
 
 ---
 **Analysis Report:**
 """
-        print("\n正在生成 AI 分析報告... (可能需要一點時間)")
-        response = model.generate_content(prompt)
-        report_text = response.text
 
-        print("\n" + "="*30)
-        print("      AI 分析報告")
-        print("="*30)
-        print(report_text)
-        print("\n--- 報告結束 ---")
+MAP_PROMPT_TEMPLATE = """你是一位資深的軟體工程與市場分析顧問。
+以下是一大批爬蟲文章標題中的第 {index}/{total} 部分。請只針對這部分標題，以精簡的條列式 Markdown 輸出：
+1. 前五名的趨勢關鍵字，並附上大約的出現次數。
+2. 三個最值得注意的主題或事件 (各一句話)。
+3. 若能從標題看出，任何明顯的增長或衰退趨勢。
+不要撰寫完整報告，這份摘要之後會與其他部分合併。
 
-        _save_report_menu(report_text)
+**Article Titles:**
+{data}
+"""
+
+def estimate_tokens(text):
+    """
+    Cheap token estimate: CJK characters count about one token each, other
+    text about one token per four characters.
+    """
+    cjk = sum(1 for ch in text if '\u2e80' <= ch <= '\u9fff' or '\uac00' <= ch <= '\ud7af')
+    return cjk + (len(text) - cjk) // 4 + 1
 
-    except FileNotFoundError:
-        print(f"錯誤: 找不到檔案 {csv_file_path}")
+def chunk_lines(lines, token_budget):
+    """Splits lines into consecutive chunks whose estimated size stays within token_budget."""
+    chunks, current, current_tokens = [], [], 0
+    for line in lines:
+        tokens = estimate_tokens(line)
+        if current and current_tokens + tokens > token_budget:
+            chunks.append(current)
+            current, current_tokens = [], 0
+        current.append(line)
+        current_tokens += tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+def _is_rate_limit_error(error):
+    """True for quota / rate limit errors (HTTP 429, ResourceExhausted) and 503s."""
+    code = getattr(error, 'code', None)
+    if code in (429, 503):
+        return True
+    return type(error).__name__ in ('ResourceExhausted', 'TooManyRequests', 'ServiceUnavailable') or '429' in str(error)
+
+def generate_with_retry(client, prompt, max_retries=MAX_RETRIES, base_delay=RETRY_BASE_DELAY):
+    """Calls client.generate, retrying rate-limited calls with jittered exponential backoff."""
+    for attempt in range(max_retries + 1):
+        try:
+            with _metrics.timer('model', client.model_name):
+                return client.generate(prompt)
+        except Exception as e:
+            if attempt == max_retries or not _is_rate_limit_error(e):
+                raise
+            _metrics.increment('model_retries', host=client.model_name)
+            delay = base_delay * (2 ** attempt) * random.uniform(0.5, 1.5)
+            print(f"模型請求受到速率限制，{delay:.1f} 秒後重試 ({attempt + 1}/{max_retries})...")
+            time.sleep(delay)
+
+def _map_reduce(client, lines, token_budget, workers, depth=0):
+    """Summarizes chunks of lines concurrently and returns the list of partial summaries."""
+    chunks = chunk_lines(lines, token_budget)
+    print(f"資料量較大，分成 {len(chunks)} 個部分平行分析 (最多 {workers} 個同時進行)...")
+    prompts = [MAP_PROMPT_TEMPLATE.format(index=i + 1, total=len(chunks), data="\n".join(chunk))
+               for i, chunk in enumerate(chunks)]
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        summaries = list(executor.map(lambda prompt: generate_with_retry(client, prompt), prompts))
+
+    # If even the summaries do not fit, summarize them again
+    merged = [f"#### 第 {i + 1} 部分\n{summary}" for i, summary in enumerate(summaries)]
+    if len(merged) > 1 and estimate_tokens("\n\n".join(merged)) > token_budget and depth < 3:
+        return _map_reduce(client, merged, token_budget, workers, depth + 1)
+    return merged
+
+_DATED_TITLE_RE = re.compile(r"^\[\d{4}-\d{2}-\d{2}\] ")
+
+def generate_report(client, titles, token_budget=PROMPT_TOKEN_BUDGET, workers=MAP_WORKERS):
+    """
+    Generates the analysis report for a list of titles. Small inputs are sent as
+    one prompt; larger ones are split by token budget, summarized concurrently
+    and merged into the same report format.
+    """
+    lines = [f"- {title}" for title in titles]
+    data_for_prompt = "\n".join(lines)
+    source_description = "文章列表"
+    if any(re.search(r" \(x\d+\)$", title) for title in titles):
+        source_description += " (標題後的 (xN) 表示同一則新聞在 N 篇文章中出現)"
+    if any(_DATED_TITLE_RE.match(title) for title in titles):
+        source_description += " (標題前的 [YYYY-MM-DD] 為文章發布日期，可用於分析趨勢變化)"
+    if estimate_tokens(data_for_prompt) <= token_budget:
+        prompt = REPORT_PROMPT_TEMPLATE.format(source_description=source_description, data_heading="Article Titles",
+                                               data=data_for_prompt)
+        return generate_with_retry(client, prompt)
+
+    summaries = _map_reduce(client, lines, token_budget, workers)
+    prompt = REPORT_PROMPT_TEMPLATE.format(
+        source_description=f"{len(titles)} 篇文章標題分段分析後的摘要",
+        data_heading=f"Partial Summaries ({len(titles)} titles)",
+        data="\n\n".join(summaries))
+    return generate_with_retry(client, prompt)
+
+def _get_report_cache():
+    return ReportCache(_get_data_path('report_cache'))
+
+def _report_key(model_name, titles, mode='titles', articles=None):
+    # The statistics also count each article on its day, so the same titles give another
+    # trend table once they move to other days (e.g. a crawl day is replaced by "yesterday")
+    extra = None
+    if mode == 'stats' and articles is not None:
+        extra = sorted([normalize_title(article.get('title') or ''), day]
+                       for article, day in zip(articles, _stats_days(articles)))
+    return report_cache_key(model_name, f"{mode}\n{REPORT_PROMPT_TEMPLATE}{MAP_PROMPT_TEMPLATE}", titles, extra)
+
+def _show_report(report_text, heading="AI 分析報告"):
+    """Prints the report and offers to save it."""
+    print("\n" + "="*30)
+    print(f"      {heading}")
+    print("="*30)
+    print(report_text)
+    print("\n--- 報告結束 ---")
+
+    _save_report_menu(report_text)
+
+def get_cached_report(titles, model_name=MODEL_NAME, mode='titles', articles=None):
+    """
+    Returns the cached report for this model, analysis mode and title set, or
+    None. In 'stats' mode, pass the articles too: their days are part of the key.
+    """
+    try:
+        return _get_report_cache().get(_report_key(model_name, titles, mode, articles))
+    except OSError as e:
+        print(f"讀取報告快取時發生錯誤: {e}")
+        return None
+
+def generate_stats_report(client, articles):
+    """
+    Generates the analysis report from the local keyword statistics plus a small
+    sample of titles instead of the full title list, which keeps the prompt
+    small regardless of how many articles were crawled.
+    """
+    stats = compute_title_stats(articles)
+    sample = "\n".join(f"- {title}" for title in _prompt_titles(articles[:STATS_SAMPLE_TITLES]))
+    prompt = REPORT_PROMPT_TEMPLATE.format(
+        source_description="本地統計出的關鍵字與每日趨勢表，以及部分文章標題範例",
+        data_heading="Keyword Statistics",
+        data=f"{format_stats_table(stats)}\n\n**Sample Titles:**\n{sample}")
+    return generate_with_retry(client, prompt)
+
+def analyze_data(api_key, articles, client=None, use_cache=True, mode='titles'):
+    """
+    Uses the Gemini API (or the given model client) to generate an analysis of
+    the given articles (dictionaries with at least a 'title').
+    mode 'titles' sends the titles themselves; 'stats' sends the local keyword
+    statistics instead (see generate_stats_report).
+    With use_cache, a report already generated for the same model, prompt and
+    title set is reused without calling the model, and new reports are cached.
+    Without an api_key or client, the API key is only asked for (get_api_key)
+    once no cached report was found.
+    """
+    articles = [article for article in articles if article.get('title')]
+    titles = _prompt_titles(articles)
+    if not titles:
+        print("在資料中找不到有效的標題。")
+        return
+
+    model_name = client.model_name if client else MODEL_NAME
+    if use_cache:
+        report_text = get_cached_report(titles, model_name, mode, articles)
+        if report_text is not None:
+            print("\n找到相同資料的快取報告，直接使用 (不需呼叫 AI 模型)。")
+            _show_report(report_text)
+            return
+
+    if client is None and not api_key:
+        api_key = get_api_key()
+        if not api_key:
+            print("\n分析已取消，必須提供 API 金鑰。")
+            return
+
+    try:
+        client = client or GeminiClient(api_key)
+    except Exception as e:
+        print(f"設定 AI 模型時發生錯誤: {e}")
+        return
+
+    try:
+        print("\n正在生成 AI 分析報告... (可能需要一點時間)")
+        if mode == 'stats':
+            report_text = generate_stats_report(client, articles)
+        else:
+            report_text = generate_report(client, titles)
+    except ImportError as e: # The keyword statistics need NumPy; not an API problem
+        print(f"關鍵字統計需要 NumPy，請先執行 pip install numpy ({e})")
+        return
     except Exception as e:
         print(f"分析過程中發生錯誤: {e}")
         print("請確認您的 API 金鑰是否有效並擁有權限。")
+        return
+
+    if use_cache:
+        try:
+            _get_report_cache().put(_report_key(model_name, titles, mode, articles), report_text, model_name)
+        except OSError as e:
+            print(f"儲存報告快取時發生錯誤: {e}")
+
+    _show_report(report_text)
+
+def _choose_analysis_mode():
+    """Asks which kind of report to generate. Returns 'titles', 'stats' or 'local'."""
+    while True:
+        print("\n--- 分析方式 ---")
+        print("  1. AI 報告 (將所有標題提供給模型)")
+        print("  2. AI 報告 (以本地關鍵字統計取代完整標題，節省 token)")
+        print("  3. 僅本地統計報告 (不需 API 金鑰)")
+        choice = input("請輸入選項 > ").strip()
+        if choice in ['1', '2', '3']:
+            return {'1': 'titles', '2': 'stats', '3': 'local'}[choice]
+        print("無效的選項，請重新輸入。")
 
-def run_analyzer():
-    """Main function for the analyzer module."""
+def run_analyzer(use_cache=None):
+    """
+    Main function for the analyzer module. Cached reports are reused unless
+    use_cache is False or the ANALYZER_NO_CACHE environment variable is set.
+    """
     print("\n--- AI 分析 ---")
-    
-    csv_file = find_latest_csv()
-    if not csv_file:
-        print("\n找不到任何已爬取的資料可供分析。")
-        print("請先執行爬蟲 (選項 1) 來產生 CSV 檔案。")
-        return
-    
-    print(f"找到資料檔: {os.path.basename(csv_file)}")
+    if use_cache is None:
+        use_cache = os.environ.get(REPORT_CACHE_BYPASS_ENV, '').lower() not in ('1', 'true', 'yes')
+
+    try:
+        articles = load_articles_from_store()
+    except sqlite3.Error as e:
+        print(f"讀取文章資料庫時發生錯誤: {e}")
+        articles = None
+
+    if articles:
+        print(f"從文章資料庫讀取了近 {ANALYSIS_WINDOW_DAYS} 天內的 {len(articles)} 篇文章。")
+    else:
+        # Fall back to CSV files written by older versions or exported by hand
+        csv_file = find_latest_csv()
+        if not csv_file:
+            print("\n找不到任何已爬取的資料可供分析。")
+            print("請先執行爬蟲 (選項 1) 來收集資料。")
+            return
+        print(f"找到資料檔: {os.path.basename(csv_file)}")
+        try:
+            articles = load_articles_from_csv(csv_file)
+        except (IOError, csv.Error) as e:
+            print(f"讀取 CSV 檔案時發生錯誤: {e}")
+            return
+        if not articles:
+            print("CSV 檔案為空或無效，沒有可分析的資料。")
+            return
 
-    api_key = get_api_key()
-    if not api_key:
-        print("\n分析已取消，必須提供 API 金鑰。")
+    articles = merge_near_duplicates(articles)
+    mode = _choose_analysis_mode()
+    if mode == 'local':
+        try:
+            _show_report(render_local_report(compute_title_stats(articles)), heading="本地統計報告")
+        except ImportError as e:
+            print(f"本地統計需要 NumPy，請先執行 pip install numpy ({e})")
         return
 
-    analyze_data(api_key, csv_file)
\ No newline at end of file
+    # A cache hit needs neither an API key nor a network round-trip, so the key is asked for later
+    analyze_data(None, articles, use_cache=use_cache, mode=mode)
\ No newline at end of file
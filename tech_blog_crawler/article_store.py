@@ -0,0 +1,159 @@
+import os
+import sqlite3
+import sys
+import threading
+import uuid
+from datetime import datetime
+
+from url_utils import normalize_url
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    started_at TEXT NOT NULL,
+    description TEXT
+);
+CREATE TABLE IF NOT EXISTS articles (
+    link TEXT PRIMARY KEY,          -- normalized article URL
+    title TEXT NOT NULL,
+    source_url TEXT,
+    published TEXT,                 -- publication date from a feed or sitemap, if known
+    first_seen TEXT NOT NULL,
+    last_seen TEXT NOT NULL,
+    first_run_id TEXT,
+    last_run_id TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_articles_source ON articles (source_url);
+CREATE INDEX IF NOT EXISTS idx_articles_first_seen ON articles (first_seen);
+CREATE INDEX IF NOT EXISTS idx_articles_last_seen ON articles (last_seen);
+-- Append-only log of every time an article was seen, one row per run
+CREATE TABLE IF NOT EXISTS sightings (
+    run_id TEXT NOT NULL,
+    link TEXT NOT NULL,
+    source_url TEXT,
+    seen_at TEXT NOT NULL,
+    PRIMARY KEY (run_id, link)
+);
+CREATE INDEX IF NOT EXISTS idx_sightings_seen_at ON sightings (seen_at);
+"""
+
+def default_db_path():
+    """
+    Path of the article database. Like analyzer._get_data_path, it lives in
+    'dist' in script mode and next to the executable in bundled (.exe) mode.
+    """
+    if getattr(sys, 'frozen', False):
+        base_path = os.path.dirname(sys.executable)
+    else:
+        base_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'dist'))
+    os.makedirs(base_path, exist_ok=True)
+    return os.path.join(base_path, 'articles.sqlite3')
+
+def new_run_id():
+    """Returns a unique, sortable ID for one crawl run."""
+    return f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+
+class ArticleStore:
+    """
+    Embedded SQLite store for crawled articles, keyed by normalized link.
+    Each article keeps first/last seen timestamps and run IDs, and every
+    sighting is appended to a log so individual runs can still be analyzed.
+    """
+    def __init__(self, db_path=None):
+        self.db_path = db_path or default_db_path()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        # WAL lets the analyzer read while a crawl is writing
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        columns = {row['name'] for row in self._db.execute("PRAGMA table_info(articles)")}
+        if 'published' not in columns: # Databases created before feeds were read
+            self._db.execute("ALTER TABLE articles ADD COLUMN published TEXT")
+        self._db.commit()
+
+    def start_run(self, description=None):
+        """Registers a new crawl run and returns its ID."""
+        run_id = new_run_id()
+        with self._lock:
+            self._db.execute("INSERT INTO runs (run_id, started_at, description) VALUES (?, ?, ?)",
+                             (run_id, datetime.now().isoformat(timespec='seconds'), description))
+            self._db.commit()
+        return run_id
+
+    def add_articles(self, records, source_url, run_id):
+        """
+        Inserts or refreshes a batch of {'title', 'link'[, 'published']} records
+        in one transaction. Records without a link (error/info messages) are skipped.
+        Returns the number of records written.
+        """
+        now = datetime.now().isoformat(timespec='seconds')
+        rows = [(normalize_url(r['link']), r['title'], source_url, r.get('published'), now, now, run_id, run_id)
+                for r in records if r.get('link') and r.get('title')]
+        if not rows:
+            return 0
+        with self._lock:
+            with self._db:
+                self._db.executemany("""
+                    INSERT INTO articles (link, title, source_url, published, first_seen, last_seen, first_run_id, last_run_id)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (link) DO UPDATE SET
+                        title = excluded.title,
+                        published = COALESCE(excluded.published, published),
+                        last_seen = excluded.last_seen,
+                        last_run_id = excluded.last_run_id
+                    """, rows)
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO sightings (run_id, link, source_url, seen_at) VALUES (?, ?, ?, ?)",
+                    [(run_id, row[0], source_url, now) for row in rows])
+        return len(rows)
+
+    def count(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+
+    def latest_run_id(self):
+        """Returns the ID of the most recent run that stored any article, or None."""
+        with self._lock:
+            row = self._db.execute("SELECT run_id FROM sightings ORDER BY seen_at DESC, run_id DESC LIMIT 1").fetchone()
+        return row[0] if row else None
+
+    def articles(self, since=None, run_id=None, source_url=None):
+        """
+        Returns stored articles as dictionaries, newest first. Filters: last seen
+        at or after since (ISO timestamp), seen in run_id, or from source_url.
+        """
+        query = "SELECT a.* FROM articles a"
+        conditions, params = [], []
+        if run_id:
+            query += " JOIN sightings s ON s.link = a.link"
+            conditions.append("s.run_id = ?")
+            params.append(run_id)
+        if since:
+            conditions.append("a.last_seen >= ?")
+            params.append(since)
+        if source_url:
+            conditions.append("a.source_url = ?")
+            params.append(source_url)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY a.last_seen DESC"
+        with self._lock:
+            return [dict(row) for row in self._db.execute(query, params)]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+def get_article_store():
+    """Returns the shared article store, creating it on first use."""
+    global _default_store
+    if _default_store is None:
+        with _default_store_lock:
+            if _default_store is None:
+                _default_store = ArticleStore()
+    return _default_store
@@ -0,0 +1,279 @@
+"""
+End-to-end crawler benchmarks against the local fixture server, so changes to
+crawl_blog, crawl_images or save_images can be measured without live sites.
+
+Usage:
+    python benchmarks/crawl_bench.py [--pages 20] [--images 200] [--image-kb 64]
+                                     [--latency-ms 0] [--jitter-ms 0] [--repeat 3]
+                                     [--scenario NAME ...] [--output FILE] [--compare FILE]
+
+Each scenario runs in a fresh interpreter so its peak RSS (VmHWM on Linux) is its own, and is
+repeated --repeat times (the run with the median elapsed time is kept).
+Results are written as JSON (default: dist/benchmarks/crawl_bench_<timestamp>.json);
+--compare prints the change of every metric against an earlier results file.
+
+No recorded real pages are committed (benchmarks/fixtures/ does not exist in the
+repository), so by default every number comes from the synthetic pages in fixtures.py.
+Save real listing pages as benchmarks/fixtures/*.html to add the recorded_pages scenario;
+the number of recorded pages is stored in the results' settings.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from fixture_server import FixtureServer, recorded_pages
+
+# Metrics compared by --compare; for the first three a larger value is better
+METRICS = ('pages_per_s', 'images_per_s', 'mb_per_s', 'parse_ms_per_page', 'seconds', 'peak_rss_mb')
+HIGHER_IS_BETTER = METRICS[:3]
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process in MB, or None if it cannot be
+    measured. On Linux, VmHWM is read from /proc: unlike ru_maxrss, which is
+    inherited across fork+exec and so never falls below the benchmark
+    parent's peak, it is reset when the child interpreter starts.
+    """
+    try:
+        with open('/proc/self/status', 'r', encoding='ascii') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024 # Reported in kB
+    except (IOError, ValueError, IndexError):
+        pass
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+    if psutil is not None:
+        info = psutil.Process().memory_info()
+        peak = getattr(info, 'peak_wset', None) # Windows
+        if peak is not None:
+            return peak / (1024 * 1024)
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss is in bytes on macOS; it is only an upper bound of the child's own peak
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024)
+
+def _time_parse(crawler, page_urls, extract, only):
+    """Fetches each page once and returns the median ms spent parsing and extracting it."""
+    from fetcher import fetch_page
+    timings = []
+    for url in page_urls:
+        page = fetch_page(url)
+        start = time.perf_counter()
+        extract(crawler.parse_page(page, only=only), url)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+def _crawl_pages(page_urls, streaming=False, html=True):
+    import crawler
+    start = time.perf_counter()
+    records = sum(len(crawler.crawl_blog(url, streaming=streaming)) for url in page_urls)
+    elapsed = time.perf_counter() - start
+    metrics = {'pages': len(page_urls), 'records': records, 'seconds': elapsed, 'pages_per_s': len(page_urls) / elapsed}
+    if html and not streaming:
+        # Streaming interleaves parsing with the download, so only full HTML parses are timed
+        metrics['parse_ms_per_page'] = _time_parse(crawler, page_urls, crawler.extract_articles, crawler.ARTICLE_STRAINER)
+    return metrics
+
+def scenario_blog_articles(base_url, args):
+    """crawl_blog on listings that wrap every entry in <article> tags."""
+    return _crawl_pages([f"{base_url}/articles/{i}" for i in range(args.pages)])
+
+def scenario_blog_feed(base_url, args):
+    """crawl_blog on the same listings announcing an RSS feed, which is read instead of the HTML."""
+    return _crawl_pages([f"{base_url}/feed-articles/{i}" for i in range(args.pages)], html=False)
+
+def scenario_sitemap(base_url, args):
+    """crawl_blog on a 100,000-URL sitemap, streamed with constant memory."""
+    return _crawl_pages([f"{base_url}/sitemap.xml"], html=False)
+
+def scenario_blog_links(base_url, args):
+    """crawl_blog on listings without <article> tags (the <a> fallback)."""
+    return _crawl_pages([f"{base_url}/links/{i}" for i in range(args.pages)])
+
+def scenario_huge_page(base_url, args):
+    """crawl_blog on a listing followed by megabytes of inline JSON."""
+    return _crawl_pages([f"{base_url}/huge"] * max(1, args.pages // 4))
+
+def scenario_huge_page_stream(base_url, args):
+    """The same huge page with streaming extraction, which stops reading early."""
+    return _crawl_pages([f"{base_url}/huge"] * max(1, args.pages // 4), streaming=True)
+
+def _run_batch(base_url, args, parse_workers=0):
+    import crawler
+    urls = [f"{base_url}/articles/{i}" for i in range(args.pages)]
+    start = time.perf_counter()
+    pages_ok, pages_failed = crawler.run_batch(urls, None, parse_workers=parse_workers)
+    elapsed = time.perf_counter() - start
+    return {'pages': pages_ok, 'failed': pages_failed, 'seconds': elapsed, 'pages_per_s': pages_ok / elapsed}
+
+def scenario_batch_articles(base_url, args):
+    """run_batch over the article listings with the default worker pool."""
+    return _run_batch(base_url, args)
+
+def scenario_batch_parse_pool(base_url, args):
+    """The same run_batch with one parse worker process per CPU core (includes starting them)."""
+    from parse_pool import default_parse_workers
+    return _run_batch(base_url, args, parse_workers=default_parse_workers())
+
+def scenario_gallery_images(base_url, args):
+    """crawl_images on the gallery, then save_images into a temporary image store."""
+    import crawler
+    from image_store import ImageStore
+    start = time.perf_counter()
+    image_urls = crawler.crawl_images(f"{base_url}/gallery")
+    parse_ms = _time_parse(crawler, [f"{base_url}/gallery"], crawler.extract_images, crawler.IMAGE_STRAINER)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ImageStore(os.path.join(tmp, 'store'))
+        result = crawler.save_images(image_urls, base_url, store=store, output_dir=tmp) or {}
+        store.close()
+    elapsed = time.perf_counter() - start
+    saved, size = result.get('saved', 0), result.get('bytes', 0)
+    download_s = result.get('elapsed') or elapsed
+    return {
+        'pages': 1,
+        'images': saved,
+        'seconds': elapsed,
+        'parse_ms_per_page': parse_ms,
+        'images_per_s': saved / download_s,
+        'mb_per_s': size / download_s / (1024 * 1024),
+    }
+
+def scenario_recorded_pages(base_url, args):
+    """crawl_blog on every recorded page in benchmarks/fixtures."""
+    return _crawl_pages([f"{base_url}/recorded/{name}" for name in recorded_pages()])
+
+SCENARIOS = {
+    'blog_articles': scenario_blog_articles,
+    'blog_feed': scenario_blog_feed,
+    'sitemap': scenario_sitemap,
+    'blog_links': scenario_blog_links,
+    'huge_page': scenario_huge_page,
+    'huge_page_stream': scenario_huge_page_stream,
+    'batch_articles': scenario_batch_articles,
+    'batch_parse_pool': scenario_batch_parse_pool,
+    'gallery_images': scenario_gallery_images,
+    'recorded_pages': scenario_recorded_pages,
+}
+
+def run_child(name, base_url, args):
+    """Runs one scenario in this process and prints its metrics as JSON."""
+    import site_rules
+    with tempfile.TemporaryDirectory() as tmp:
+        # Rules learned from the fixtures must not end up in dist/site_rules.json
+        site_rules.set_site_rules(site_rules.SiteRules(os.path.join(tmp, 'site_rules.json')))
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            metrics = SCENARIOS[name](base_url, args)
+    metrics['peak_rss_mb'] = peak_rss_mb()
+    print(json.dumps(metrics))
+
+def run_scenario(name, base_url, args):
+    """Runs a scenario --repeat times in fresh interpreters and returns the median run."""
+    command = [sys.executable, os.path.abspath(__file__), '--child', name, '--base-url', base_url,
+               '--pages', str(args.pages), '--images', str(args.images)]
+    runs = []
+    for _ in range(max(1, args.repeat)):
+        result = subprocess.run(command, capture_output=True, text=True, cwd=os.path.dirname(BENCH_DIR))
+        if result.returncode != 0:
+            raise RuntimeError(f"scenario {name} failed:\n{result.stderr[-2000:]}")
+        runs.append(json.loads(result.stdout.strip().splitlines()[-1]))
+    runs.sort(key=lambda metrics: metrics['seconds'])
+    return runs[len(runs) // 2]
+
+def compare(results, baseline_path):
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    print(f"\nCompared with {baseline_path} ({baseline.get('timestamp')}):")
+    if baseline.get('settings') != results['settings']:
+        print(f"  Note: the settings differ ({baseline.get('settings')}), so the numbers are not directly comparable.")
+    for name, metrics in results['scenarios'].items():
+        old = baseline.get('scenarios', {}).get(name)
+        if not old:
+            continue
+        changes = []
+        for key in METRICS:
+            value = metrics.get(key)
+            if value is None or not old.get(key):
+                continue
+            change = (value - old[key]) / old[key] * 100
+            better = change > 0 if key in HIGHER_IS_BETTER else change < 0
+            changes.append(f"{key} {change:+.1f}%{'' if abs(change) < 5 else (' (better)' if better else ' (worse)')}")
+        print(f"  {name:<18} " + ", ".join(changes))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the crawler against a local fixture server.')
+    parser.add_argument('--pages', type=int, default=20, help='listing pages per text scenario')
+    parser.add_argument('--images', type=int, default=200, help='images on the gallery page')
+    parser.add_argument('--image-kb', type=int, default=64, help='size of every served image')
+    parser.add_argument('--latency-ms', type=float, default=0, help='delay added to every response')
+    parser.add_argument('--jitter-ms', type=float, default=0, help='random extra delay, up to this many ms')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--scenario', action='append', choices=SCENARIOS, help='run only these scenarios')
+    parser.add_argument('--output', help='results JSON file')
+    parser.add_argument('--compare', help='earlier results JSON file to compare with')
+    parser.add_argument('--child', choices=SCENARIOS, help=argparse.SUPPRESS)
+    parser.add_argument('--base-url', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        run_child(args.child, args.base_url, args)
+        return 0
+
+    recorded = recorded_pages()
+    if args.scenario and 'recorded_pages' in args.scenario and not recorded:
+        parser.error('recorded_pages needs *.html files in benchmarks/fixtures/ (none are committed)')
+    names = args.scenario or [name for name in SCENARIOS if name != 'recorded_pages' or recorded]
+    if not recorded:
+        print('No recorded pages in benchmarks/fixtures/: only synthetic pages are measured.')
+    settings = {key: getattr(args, key) for key in ('pages', 'images', 'image_kb', 'latency_ms', 'jitter_ms', 'repeat')}
+    settings['recorded_pages'] = len(recorded)
+    results = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'settings': settings,
+        'scenarios': {},
+    }
+
+    print(f"{'scenario':<18} {'pages/s':>9} {'parse ms':>9} {'images/s':>9} {'MB/s':>8} {'peak RSS MB':>12}")
+    with FixtureServer(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, image_kb=args.image_kb,
+                       num_images=args.images) as server:
+        for name in names:
+            metrics = run_scenario(name, server.base_url, args)
+            results['scenarios'][name] = metrics
+
+            def show(key, width, digits):
+                value = metrics.get(key)
+                return f"{value:>{width}.{digits}f}" if value is not None else f"{'-':>{width}}"
+            print(f"{name:<18} {show('pages_per_s', 9, 1)} {show('parse_ms_per_page', 9, 1)} "
+                  f"{show('images_per_s', 9, 1)} {show('mb_per_s', 8, 2)} {show('peak_rss_mb', 12, 1)}")
+
+    output = args.output or os.path.join(os.path.dirname(os.path.dirname(BENCH_DIR)), 'dist', 'benchmarks',
+                                         f"crawl_bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults saved to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,213 @@
+"""
+Local HTTP server for offline benchmarks. Serves the synthetic pages from
+fixtures.py, any recorded pages saved as benchmarks/fixtures/*.html (none are
+committed) and generated images of a configurable size, optionally delaying
+every response and answering 429 Too Many Requests above a request rate (to
+exercise the crawler's adaptive per-host controller).
+
+Paths:
+    /articles/<n>   listing with <article> tags (a different page per n)
+    /feed-articles/<n>  the same listing announcing the RSS feed /feed/<n>
+    /feed/<n>       RSS feed
+    /sitemap.xml    sitemap with 100,000 URLs (about 10 MB)
+    /links/<n>      listing without <article> tags
+    /huge           listing followed by megabytes of inline JSON
+    /gallery        gallery page linking /img/0.jpg ... /img/<images - 1>.jpg
+    /img/<n>.jpg    image_kb KB of deterministic bytes, unique per n
+    /recorded/<f>   benchmarks/fixtures/<f>
+
+Usage (standalone, e.g. to point the crawler at it by hand):
+    python benchmarks/fixture_server.py [--port 8000] [--latency-ms 0] [--image-kb 64] [--throttle-rps 0]
+"""
+import argparse
+import glob
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from fixtures import article_page, gallery_page, huge_page, link_page, rss_feed, sitemap
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+_IMAGE_PATH_RE = re.compile(r'^/img/(\d+)\.jpg$')
+_PAGE_PATH_RE = re.compile(r'^/(articles|feed-articles|feed|links)/(\d+)$')
+
+def recorded_pages(fixtures_dir=FIXTURES_DIR):
+    """Returns the file names of the recorded *.html pages."""
+    return sorted(os.path.basename(path) for path in glob.glob(os.path.join(fixtures_dir, '*.html')))
+
+class _QuietHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Streaming extraction closes connections mid-response on purpose
+        if not isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            super().handle_error(request, client_address)
+
+class FixtureServer:
+    """
+    Threaded HTTP server on 127.0.0.1 serving the benchmark pages. Every
+    response is delayed by latency_ms plus up to jitter_ms milliseconds. With
+    throttle_rps, requests beyond that many in the last second get a 429 with
+    a one-second Retry-After.
+    """
+    def __init__(self, port=0, latency_ms=0, jitter_ms=0, image_kb=64, num_images=200, fixtures_dir=FIXTURES_DIR,
+                 throttle_rps=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.image_kb = image_kb
+        self.num_images = num_images
+        self.fixtures_dir = fixtures_dir
+        self.throttle_rps = throttle_rps
+        self.requests_served = 0
+        self.requests_throttled = 0
+        self._recent = deque() # Arrival times within the last second, for throttle_rps
+        self._lock = threading.Lock()
+        self._httpd = _QuietHTTPServer(('127.0.0.1', port), self._handler_class())
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self._httpd.server_address[1]}"
+
+    def url(self, path):
+        return self.base_url + path
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    @lru_cache(maxsize=256)
+    def page(self, path):
+        """Returns (content_type, body bytes) for a path, or None if it does not exist."""
+        match = _PAGE_PATH_RE.match(path)
+        if match:
+            kind, n = match.group(1), int(match.group(2))
+            if kind == 'feed':
+                return 'application/rss+xml; charset=utf-8', rss_feed(seed=n + 1).encode('utf-8')
+            if kind == 'links':
+                html = link_page(seed=n + 2)
+            else:
+                html = article_page(seed=n + 1, feed_url=f'/feed/{n}' if kind == 'feed-articles' else None)
+            return 'text/html; charset=utf-8', html.encode('utf-8')
+        if path == '/sitemap.xml':
+            return 'application/xml', sitemap().encode('utf-8')
+        if path == '/huge':
+            return 'text/html; charset=utf-8', huge_page().encode('utf-8')
+        if path == '/gallery':
+            return 'text/html; charset=utf-8', gallery_page(self.num_images).encode('utf-8')
+        if path.startswith('/recorded/'):
+            file_path = os.path.join(self.fixtures_dir, os.path.basename(path))
+            if os.path.isfile(file_path):
+                with open(file_path, 'rb') as f:
+                    return 'text/html', f.read()
+        return None
+
+    def throttled(self):
+        """Records a request arrival and returns True if it exceeds throttle_rps."""
+        if not self.throttle_rps:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            while self._recent and self._recent[0] <= now - 1:
+                self._recent.popleft()
+            if len(self._recent) >= self.throttle_rps:
+                self.requests_throttled += 1
+                return True
+            self._recent.append(now)
+            return False
+
+    def image(self, index):
+        # Different bytes per index, so the content-addressed image store keeps every image
+        return b'\xff\xd8\xff\xe0' + random.Random(index).randbytes(self.image_kb * 1024 - 4)
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1' # Keep-alive, like real sites
+            # Headers and body are written separately; with Nagle's algorithm and
+            # delayed ACKs, small responses would each wait about 40 ms
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                self._respond(send_body=True)
+
+            def do_HEAD(self):
+                self._respond(send_body=False)
+
+            def _respond(self, send_body):
+                if server.throttled():
+                    self.send_response(429)
+                    self.send_header('Retry-After', '1')
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                delay = server.latency_ms + random.uniform(0, server.jitter_ms)
+                if delay:
+                    time.sleep(delay / 1000)
+                with server._lock:
+                    server.requests_served += 1
+
+                path = self.path.split('?', 1)[0]
+                match = _IMAGE_PATH_RE.match(path)
+                if match:
+                    found = ('image/jpeg', server.image(int(match.group(1))))
+                else:
+                    found = server.page(path)
+                if found is None:
+                    self.send_error(404)
+                    return
+                content_type, body = found
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if send_body:
+                    self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass # Request logging would dominate the benchmark output
+
+        return Handler
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve the benchmark fixture pages locally.')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--image-kb', type=int, default=64)
+    parser.add_argument('--images', type=int, default=200, help='number of images on /gallery')
+    parser.add_argument('--throttle-rps', type=float, default=0, help='answer 429 above this many requests per second')
+    args = parser.parse_args(argv)
+
+    server = FixtureServer(args.port, args.latency_ms, args.jitter_ms, args.image_kb, args.images,
+                           throttle_rps=args.throttle_rps)
+    print(f"Serving benchmark fixtures on {server.base_url} (Ctrl+C to stop)")
+    for name in recorded_pages():
+        print(f"  {server.url('/recorded/' + name)}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Synthetic pages used by the benchmarks. The generators are deterministic so
+results from different runs can be compared.
+"""
+import random
+
+_WORDS = ('python', 'rust', 'cloud', 'kernel', 'release', 'security', 'database', 'AI', 'GPU',
+          'open source', 'browser', 'compiler', '雲端', '資安', '開源', '人工智慧', '資料庫')
+
+def _title(rng, index):
+    return f"{' '.join(rng.choice(_WORDS) for _ in range(6)).capitalize()} #{index}"
+
+def _filler(rng, paragraphs):
+    """Navigation, sidebars and body text that the extractors have to skip over."""
+    parts = ['<nav>' + ''.join(f'<a href="/section/{i}">Section {i}</a>' for i in range(30)) + '</nav>']
+    for i in range(paragraphs):
+        parts.append(f'<div class="widget w{i}"><p>{" ".join(rng.choice(_WORDS) for _ in range(60))}</p>'
+                     f'<span class="meta">by author {i}</span></div>')
+    return ''.join(parts)
+
+def _page(body, title='Benchmark page', feed_url=None):
+    feed_link = f'<link rel="alternate" type="application/rss+xml" href="{feed_url}">' if feed_url else ''
+    return (f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{title}</title>'
+            f'<link rel="stylesheet" href="/style.css">{feed_link}</head><body>{body}</body></html>')
+
+def article_page(num_articles=50, paragraphs=200, seed=1, feed_url=None):
+    """A listing that wraps every entry in an <article> tag, optionally announcing an RSS feed."""
+    rng = random.Random(seed)
+    articles = ''.join(
+        f'<article class="post"><div class="thumb"><img src="/img/{i}.jpg" alt=""></div>'
+        f'<h2 class="title"><a href="/posts/{i}">{_title(rng, i)}</a></h2>'
+        f'<p class="excerpt">{" ".join(rng.choice(_WORDS) for _ in range(40))}</p></article>'
+        for i in range(num_articles))
+    return _page(_filler(rng, paragraphs // 2) + articles + _filler(rng, paragraphs // 2), feed_url=feed_url)
+
+def link_page(num_links=200, paragraphs=200, seed=2):
+    """A listing without <article> tags, so extraction falls back to scanning <a> tags."""
+    rng = random.Random(seed)
+    links = ''.join(f'<li><a href="/story/{i}">{_title(rng, i)}</a></li>' for i in range(num_links))
+    return _page(_filler(rng, paragraphs) + f'<ul class="stories">{links}</ul>')
+
+def huge_page(num_articles=100, inline_json_kb=2048, seed=3):
+    """An infinite-scroll style page: a listing followed by megabytes of inline JSON."""
+    rng = random.Random(seed)
+    state = ','.join(f'{{"id":{i},"t":"{_title(rng, i)}"}}' for i in range(inline_json_kb * 1024 // 40))
+    return article_page(num_articles, 100, seed).replace(
+        '</body>', f'<script>window.__STATE__=[{state}];</script></body>')
+
+def gallery_page(num_images=300, image_path='/img/{}.jpg', seed=4):
+    """An image gallery with num_images <img> tags."""
+    rng = random.Random(seed)
+    images = ''.join(f'<figure><img src="{image_path.format(i)}" alt="{_title(rng, i)}"></figure>'
+                     for i in range(num_images))
+    return _page(_filler(rng, 20) + f'<div class="gallery">{images}</div>')
+
+def rss_feed(num_items=50, seed=1):
+    """An RSS 2.0 feed, as announced by article_page(feed_url=...)."""
+    rng = random.Random(seed)
+    items = ''.join(f'<item><title>{_title(rng, i)}</title><link>https://bench.example/posts/{i}</link>'
+                    f'<pubDate>{1 + i % 28:02d} Sep 2024 08:00:00 GMT</pubDate></item>'
+                    for i in range(num_items))
+    return ('<?xml version="1.0" encoding="utf-8"?><rss version="2.0"><channel><title>Benchmark feed</title>'
+            f'{items}</channel></rss>')
+
+def sitemap(num_urls=100000, seed=5):
+    """A sitemap with num_urls <url> entries (about 100 bytes each) and pseudo-random lastmod dates."""
+    rng = random.Random(seed)
+    urls = ''.join(f'<url><loc>https://bench.example/blog/{i}/post-about-{rng.choice(_WORDS).replace(" ", "-")}-{i}</loc>'
+                   f'<lastmod>20{rng.randint(10, 24)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}</lastmod></url>'
+                   for i in range(num_urls))
+    return f'<?xml version="1.0" encoding="utf-8"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>'
+
+def synthetic_pages():
+    """Returns {name: html} for the standard set of synthetic fixture pages."""
+    return {
+        'synthetic_articles': article_page(),
+        'synthetic_links': link_page(),
+        'synthetic_huge': huge_page(),
+        'synthetic_gallery': gallery_page(),
+    }
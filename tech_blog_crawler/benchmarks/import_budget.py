@@ -0,0 +1,85 @@
+"""
+Import-time budget check for the crawler's cold start.
+
+Usage:
+    python benchmarks/import_budget.py [--module crawler] [--budget-ms 400] [--repeat 5] [--top 10]
+
+Imports the module in fresh interpreters with `python -X importtime`, reports
+the median cumulative import time and the slowest top-level dependencies, and
+exits with status 1 when the median is over budget or when any of the heavy
+analysis-only libraries (the Gemini client, markdown, dotenv, NumPy) were
+imported. Those must only be loaded once the analysis menu is used.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must not be imported just to show the crawler menu
+FORBIDDEN_MODULES = ('analyzer', 'google.generativeai', 'grpc', 'markdown', 'dotenv', 'numpy')
+
+def parse_importtime(stderr):
+    """
+    Parses `-X importtime` output into a list of (module, depth, self_us, cumulative_us),
+    where depth 0 is a module imported directly by the -c statement.
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        stripped = name.lstrip(' ')
+        depth = (len(name) - len(stripped) - 1) // 2
+        entries.append((stripped.strip(), depth, int(self_us), int(cumulative_us)))
+    return entries
+
+def measure(module):
+    """Imports module in a fresh interpreter and returns its parsed -X importtime entries."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=PROJECT_DIR, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check the cold-start import time of a module against a budget.')
+    parser.add_argument('--module', default='crawler')
+    parser.add_argument('--budget-ms', type=float, default=400.0)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args(argv)
+
+    runs = [measure(args.module) for _ in range(max(1, args.repeat))]
+    totals = [next(cumulative for name, depth, _, cumulative in entries if name == args.module and depth == 0)
+              for entries in runs]
+    total_ms = statistics.median(totals) / 1000
+
+    # Direct dependencies of the module, slowest first. Children are listed
+    # before their parent, after the previous top-level import.
+    last = runs[-1]
+    end = next(i for i, (name, depth, _, _) in enumerate(last) if name == args.module and depth == 0)
+    start = max((i + 1 for i, (_, depth, _, _) in enumerate(last[:end]) if depth == 0), default=0)
+    direct = sorted(((cumulative, name) for name, depth, _, cumulative in last[start:end] if depth == 1), reverse=True)
+    print(f"import {args.module}: median {total_ms:.1f} ms over {len(runs)} runs (budget {args.budget_ms:.0f} ms)")
+    print(f"\n{'module':<40} {'cumulative ms':>14}")
+    for cumulative, name in direct[:args.top]:
+        print(f"{name:<40} {cumulative / 1000:>14.1f}")
+
+    imported = {name for name, _, _, _ in last}
+    forbidden = [name for name in FORBIDDEN_MODULES if name in imported and name != args.module]
+    failed = False
+    if forbidden:
+        print(f"\nFAIL: heavy modules imported at startup: {', '.join(forbidden)}")
+        failed = True
+    if total_ms > args.budget_ms:
+        print(f"\nFAIL: import time {total_ms:.1f} ms is over the {args.budget_ms:.0f} ms budget")
+        failed = True
+    if not failed:
+        print("\nOK")
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,73 @@
+"""
+Microbenchmark comparing the HTML parser backends, with and without the
+SoupStrainer restriction used by the extractors.
+
+Usage:
+    python benchmarks/parser_bench.py [--fixtures DIR] [--repeat N]
+
+Every *.html file in the fixtures directory (default: benchmarks/fixtures, e.g.
+pages saved from real sites with "Save page as") is measured together with the
+synthetic pages from fixtures.py.
+"""
+import argparse
+import glob
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4.builder import builder_registry
+
+import crawler
+from fixtures import synthetic_pages
+
+def load_pages(fixtures_dir):
+    pages = synthetic_pages()
+    for path in sorted(glob.glob(os.path.join(fixtures_dir, '*.html'))):
+        with open(path, 'rb') as f:
+            pages[os.path.basename(path)] = f.read().decode('utf-8', errors='replace')
+    return pages
+
+def time_parse(html, parser, only, extract, repeat):
+    """Returns (median ms for parse + extract, number of records extracted)."""
+    page = {'content': html.encode('utf-8'), 'encoding': 'utf-8'}
+    timings = []
+    records = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        soup = crawler.parse_page(page, only=only, parser=parser)
+        records = extract(soup, 'https://example.com/')
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), len(records)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare HTML parser backends on fixture pages.')
+    parser.add_argument('--fixtures', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures'))
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    backends = [name for name in crawler.PARSER_BACKENDS if builder_registry.lookup(name)]
+    missing = [name for name in crawler.PARSER_BACKENDS if name not in backends]
+    if missing:
+        print(f"Skipping backends that are not installed: {', '.join(missing)}")
+
+    extractors = {
+        'articles': (crawler.extract_articles, crawler.ARTICLE_STRAINER),
+        'images': (crawler.extract_images, crawler.IMAGE_STRAINER),
+    }
+
+    print(f"{'page':<24} {'KB':>6} {'extractor':<9} {'backend':<12} {'full ms':>9} {'strained ms':>12} {'speedup':>8} {'records':>8}")
+    for name, html in load_pages(args.fixtures).items():
+        size_kb = len(html.encode('utf-8')) / 1024
+        for kind, (extract, strainer) in extractors.items():
+            for backend in backends:
+                full_ms, full_count = time_parse(html, backend, None, extract, args.repeat)
+                strained_ms, strained_count = time_parse(html, backend, strainer, extract, args.repeat)
+                flag = '' if full_count == strained_count else '  (record count differs!)'
+                print(f"{name[:24]:<24} {size_kb:>6.0f} {kind:<9} {backend:<12} {full_ms:>9.1f} {strained_ms:>12.1f} "
+                      f"{full_ms / strained_ms:>7.1f}x {strained_count:>8}{flag}")
+
+if __name__ == '__main__':
+    main()
@@ -1,38 +1,116 @@
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+from bs4.builder import builder_registry
 import sys
-from analyzer import run_analyzer
 import csv
 from datetime import datetime
 import os
 from urllib.parse import urljoin
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+import argparse
+import hashlib
+import json
+import threading
+import time
+import sqlite3
+import multiprocessing
+from fetcher import DEFAULT_HEADERS, get_session, fetch_page, resolve_encoding, encoding_stats_summary
+from host_control import get_controller
+from site_rules import get_site_rules, domain_of
+from feeds import looks_like_feed_url, is_xml_page, find_feed_links, feed_link, read_feed, FEED_ERRORS
+from http_cache import get_cache
+from image_store import get_image_store
+from article_store import get_article_store
+from metrics import get_metrics, host_of, enable_from_env
 
-DEFAULT_HEADERS = {
-    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-    'Accept-Language': 'en-US,en;q=0.5',
-    'Referer': 'https://www.google.com/', # Some sites check this
-    'DNT': '1', # Do Not Track Request Header
-    'Connection': 'keep-alive',
-    'Upgrade-Insecure-Requests': '1',
-}
+_metrics = get_metrics()
 
-def crawl_blog(url):
+MAX_ARTICLES = 20 # Max number of articles extracted from a single page
+
+# HTML parser backends in order of preference. lxml is a C parser and by far the
+# fastest; html5lib is the most lenient but slowest; html.parser is always available.
+PARSER_BACKENDS = ('lxml', 'html5lib', 'html.parser')
+DEFAULT_PARSER = 'lxml'
+
+# Tags each extractor needs. Parsing only these (and their contents) skips
+# building the rest of the DOM. Note: html5lib ignores parse_only.
+ARTICLE_TAGS = ['article', 'h1', 'h2', 'h3', 'h4', 'a']
+IMAGE_TAGS = ['img']
+ARTICLE_STRAINER = SoupStrainer(ARTICLE_TAGS)
+IMAGE_STRAINER = SoupStrainer(IMAGE_TAGS)
+
+_resolved_parsers = {}
+
+def resolve_parser(preferred=None):
     """
-    Crawls the given URL, extracts article titles and links.
-    Returns a list of dictionaries, each with a 'title' and 'link'.
+    Returns the name of an installed parser backend, starting with preferred
+    (DEFAULT_PARSER if None) and falling back through PARSER_BACKENDS.
     """
-    results = []
-    try:
-        response = requests.get(url, headers=DEFAULT_HEADERS, timeout=10)
-        response.raise_for_status()
-        response.encoding = response.apparent_encoding
-    except requests.exceptions.RequestException as e:
-        results.append({'title': f"讀取 {url} 時發生錯誤: {e}", 'link': ''})
-        return results
+    preferred = preferred or DEFAULT_PARSER
+    if preferred not in _resolved_parsers:
+        candidates = [preferred] + [name for name in PARSER_BACKENDS if name != preferred]
+        _resolved_parsers[preferred] = next(name for name in candidates if builder_registry.lookup(name))
+    return _resolved_parsers[preferred]
 
-    soup = BeautifulSoup(response.text, 'html.parser')
-    
+def set_default_parser(name):
+    """Selects the parser backend used by parse_page when none is given."""
+    global DEFAULT_PARSER
+    if name not in PARSER_BACKENDS:
+        raise ValueError(f"未知的解析器: {name} (可用: {', '.join(PARSER_BACKENDS)})")
+    DEFAULT_PARSER = name
+
+def parse_page(page, only=None, parser=None):
+    """
+    Parses a page returned by fetcher.fetch_page into a BeautifulSoup tree.
+    only is an optional SoupStrainer restricting which tags are built.
+    """
+    text = page['content'].decode(page['encoding'] or 'utf-8', errors='replace')
+    backend = resolve_parser(parser)
+    if backend == 'html5lib':
+        only = None # Not supported by html5lib; avoids a warning on every page
+    with _metrics.timer('parse', host_of(page.get('url', '')) if _metrics.enabled else None):
+        return BeautifulSoup(text, backend, parse_only=only)
+
+def fetch_soup(url, session=None, cache=None, only=None):
+    """
+    Fetches the given URL and parses it into a BeautifulSoup tree.
+    Raises requests.exceptions.RequestException if the page cannot be read.
+    """
+    return parse_page(fetch_page(url, session, cache), only)
+
+NAV_KEYWORDS = ['home', 'about', 'contact', 'privacy', 'terms', 'subscribe']
+
+def _is_prominent_link(href, text):
+    """Heuristic for links that look like article titles rather than navigation."""
+    if href and text and len(text) > 10 and (href.startswith('http') or href.startswith('/')):
+        return not any(nav_keyword in text.lower() for nav_keyword in NAV_KEYWORDS)
+    return False
+
+def extract_articles(soup, url):
+    """
+    Extracts article titles and links from a parsed page.
+    Returns a list of dictionaries, each with a 'title' and 'link' (may be empty).
+    A domain with a rule in the site_rules registry is extracted with its
+    selectors; otherwise the generic heuristics run, and a rule is learned
+    from their results for later crawls of the domain. A learned rule that
+    finds only a few articles on a page is checked against the heuristics.
+    """
+    rules = get_site_rules()
+    rule_results, trusted = rules.extract(soup, url, MAX_ARTICLES)
+    if trusted:
+        return rule_results
+    results = extract_articles_heuristic(soup, url)
+    if rule_results:
+        # A short page, or another layout of the domain; keep whichever found more
+        return rule_results if len(rule_results) >= len(results) else results
+    if results:
+        rules.learn(soup, url, results, MAX_ARTICLES)
+    return results
+
+def extract_articles_heuristic(soup, url):
+    """The generic extraction: <article> tags with a heading and a link, else prominent links."""
+    results = []
     extracted_count = 0
     
     # Attempt 1: Look for <article> tags
@@ -48,32 +126,245 @@ def crawl_blog(url):
                 full_link = urljoin(url, link)
                 results.append({'title': title, 'link': full_link})
                 extracted_count += 1
-                if extracted_count >= 20:
+                if extracted_count >= MAX_ARTICLES:
                     break
     
     # Attempt 2: If no <article> tags, look for prominent links
     if extracted_count == 0:
         for link_tag in soup.find_all('a'):
-            if extracted_count >= 20:
+            if extracted_count >= MAX_ARTICLES:
                 break
                 
             href = link_tag.get('href')
             text = link_tag.get_text(strip=True)
             
-            if href and text and len(text) > 10 and (href.startswith('http') or href.startswith('/')):
-                if not any(nav_keyword in text.lower() for nav_keyword in ['home', 'about', 'contact', 'privacy', 'terms', 'subscribe']):
-                    full_href = urljoin(url, href)
-                    results.append({'title': text, 'link': full_href})
-                    extracted_count += 1
+            if _is_prominent_link(href, text):
+                full_href = urljoin(url, href)
+                results.append({'title': text, 'link': full_href})
+                extracted_count += 1
+
+    return results
+
+STREAM_CHUNK_SIZE = 16 * 1024
+_LXML_ENCODINGS = {'utf-8-sig': 'utf-8'} # Python codec names lxml spells differently
+
+def _element_text(element):
+    """Same as BeautifulSoup's get_text(strip=True) for an lxml element."""
+    return ''.join(text.strip() for text in element.itertext())
+
+def _discard(element):
+    """Frees an element that has been processed, together with its already-seen siblings."""
+    element.clear(keep_tail=True)
+    parent = element.getparent()
+    if parent is not None:
+        while element.getprevious() is not None:
+            del parent[0]
+
+def stream_articles(url, limit=MAX_ARTICLES, session=None, chunk_size=STREAM_CHUNK_SIZE, feeds=False):
+    """
+    Streaming variant of the article extraction in crawl_blog. The response is
+    read in chunks and fed to lxml's incremental HTML parser; each <article> is
+    yielded as a {'title', 'link'} dictionary as soon as its closing tag is seen,
+    and the connection is closed once limit articles were found, so the rest of
+    a huge page is never downloaded. Processed elements are discarded as parsing
+    goes, keeping memory flat.
+
+    Pages without <article> tags holding a heading and a link fall back to the
+    prominent-link heuristic over every <a> (as in extract_articles_heuristic),
+    which can only be decided at the end of the document. With feeds, a page
+    announcing an RSS/Atom feed or sitemap in its <head> is closed when the
+    <body> starts and the feed is read instead.
+    Requires lxml; raises requests.exceptions.RequestException on fetch errors.
+    """
+    from lxml import etree
+
+    session = session or get_session()
+    start = time.perf_counter()
+    try:
+        yield from _stream_article_events(etree, url, limit, session, chunk_size, feeds)
+    finally:
+        # Covers download and parsing, which overlap; recorded when the caller stops reading too
+        if _metrics.enabled:
+            _metrics.observe('stream', time.perf_counter() - start, host_of(url))
+
+def _stream_article_events(etree, url, limit, session, chunk_size, feeds):
+    feed_urls, comment_feeds = [], []
+    with session.get(url, timeout=10, stream=True) as response:
+        response.raise_for_status()
+        parser = None
+        article_count = 0
+        article_depth = 0
+        fallback_links = []
+        in_body = False
+
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            if parser is None:
+                # The first chunk is enough for the header/BOM/<meta> encoding tiers
+                encoding, _ = resolve_encoding(chunk, response.headers, partial=True)
+                # lxml does not know Python's 'utf-8-sig'; it skips a UTF-8 BOM by itself
+                encoding = _LXML_ENCODINGS.get(encoding, encoding)
+                parser = etree.HTMLPullParser(events=('start', 'end'), encoding=encoding)
+            parser.feed(chunk)
+
+            for event, element in parser.read_events():
+                tag = element.tag if isinstance(element.tag, str) else ''
+                if event == 'start':
+                    if tag == 'article':
+                        article_depth += 1
+                    elif tag == 'body':
+                        in_body = True
+                        if feed_urls or comment_feeds:
+                            break # Read the feed instead; leaving the with-block closes the connection
+                    continue
+                if feeds and tag == 'link' and not in_body:
+                    feed = feed_link(url, element.get('rel'), element.get('type'), element.get('href'), element.get('title'))
+                    if feed is not None:
+                        (comment_feeds if feed[1] else feed_urls).append(feed[0])
+                    continue
+
+                if tag == 'article':
+                    article_depth -= 1
+                    link_tag = next(element.iter('a'), None)
+                    title_tag = next(element.iter('h1', 'h2', 'h3', 'h4'), None)
+                    if link_tag is not None and title_tag is not None:
+                        title = _element_text(title_tag)
+                        link = link_tag.get('href')
+                        if link and title:
+                            yield {'title': title, 'link': urljoin(url, link)}
+                            article_count += 1
+                            if article_count >= limit:
+                                return # Leaving the with-block closes the connection
+                    if article_depth == 0:
+                        _discard(element)
+                elif tag == 'a':
+                    # Like extract_articles_heuristic, links inside <article> tags without a heading count too
+                    if article_count == 0 and len(fallback_links) < limit:
+                        href = element.get('href')
+                        text = _element_text(element)
+                        if _is_prominent_link(href, text):
+                            fallback_links.append({'title': text, 'link': urljoin(url, href)})
+                    if article_depth == 0:
+                        _discard(element)
+                elif tag in ('script', 'style') and article_depth == 0:
+                    _discard(element)
+            if in_body and (feed_urls or comment_feeds):
+                break
+
+        if parser is not None and not (feed_urls or comment_feeds):
+            parser.close()
+
+    if feed_urls or comment_feeds:
+        for feed_url in feed_urls + comment_feeds:
+            try:
+                records = read_feed(feed_url, limit, session)
+            except FEED_ERRORS:
+                continue
+            if records:
+                yield from records
+                return
+        # No usable feed: read the page again, this time for its HTML
+        yield from _stream_article_events(etree, url, limit, session, chunk_size, feeds=False)
+        return
+
+    if article_count == 0:
+        yield from fallback_links
+
+FEED_CACHE_VERSION = 'feed' # Cache version of articles read from a feed rather than extracted from HTML
+
+def _feed_records(page, session=None, cache=None):
+    """
+    Reads the articles of a fetched feed or sitemap page. With an HttpCache,
+    they are cached under the feed's URL and reused when the feed itself
+    answered 304 Not Modified.
+    """
+    if page['not_modified']:
+        records = cache.get_extracted(page['url'], 'articles', FEED_CACHE_VERSION)
+        if records is not None:
+            return records
+    records = read_feed(page['url'], MAX_ARTICLES, session, content=page['content'])
+    if records and cache is not None:
+        cache.store_extracted(page['url'], 'articles', records, FEED_CACHE_VERSION)
+    return records
+
+def _articles_from_feeds(page, session=None, cache=None):
+    """
+    Reads the articles of a fetched page from the RSS/Atom feed or sitemap it
+    announces in its <head> (or from the page itself if it is a feed).
+    An announced feed is revalidated on its own URL: a 304 for the page says
+    nothing about whether the feed changed. Returns None if there is no usable feed.
+    """
+    if is_xml_page(page):
+        try:
+            return _feed_records(page, session, cache) or None
+        except FEED_ERRORS:
+            return None
+
+    for feed_url in find_feed_links(page):
+        try:
+            if cache is None:
+                records = read_feed(feed_url, MAX_ARTICLES, session)
+            else:
+                records = _feed_records(fetch_page(feed_url, session, cache), session, cache)
+        except FEED_ERRORS:
+            continue # Broken or missing feed; try the next one, then the HTML
+        if records:
+            return records
+    return None
+
+def fetch_articles(url, session=None, cache=None, streaming=False, feeds=True):
+    """
+    Returns the articles of a page. With feeds, a URL that looks like a feed or
+    sitemap, or a page announcing one with <link rel="alternate">, is read
+    through feeds.read_feed, which is much cheaper than the HTML heuristics and
+    also gives each article a 'published' date. Otherwise, or when the feed has
+    no entries, stream_articles is used when streaming is set and lxml is
+    installed, and the regular process_page pipeline otherwise.
+    Raises requests.exceptions.RequestException if the page cannot be read.
+    """
+    if feeds and looks_like_feed_url(url):
+        try:
+            records = read_feed(url, MAX_ARTICLES, session)
+        except requests.exceptions.RequestException:
+            raise # The page itself cannot be read
+        except FEED_ERRORS:
+            records = None # Not XML after all, or broken compressed data; read it as a web page
+        if records:
+            return records
+    if streaming:
+        try:
+            return list(stream_articles(url, session=session, feeds=feeds))
+        except (ImportError, LookupError):
+            pass # lxml is not installed or does not know the page's encoding; fall back to the full parse
+    page = fetch_page(url, session, cache)
+    if feeds:
+        records = _articles_from_feeds(page, session, cache)
+        if records is not None:
+            return records
+    return list(process_page(url, ['articles'], session, cache, page=page)['extracted']['articles'])
+
+def crawl_blog(url, session=None, cache=None, streaming=False, feeds=True):
+    """
+    Crawls the given URL, extracts article titles and links.
+    Returns a list of dictionaries, each with a 'title' and 'link', and a
+    'published' date (ISO 8601 or None) when they were read from a feed or sitemap.
+    An existing requests.Session can be passed in; otherwise the shared one is used.
+    Pass an HttpCache to revalidate and reuse results of unchanged pages, or
+    streaming=True to stop downloading once enough articles were found.
+    The page's RSS/Atom feed or sitemap is used when it has one, unless feeds is False.
+    """
+    try:
+        results = fetch_articles(url, session, cache, streaming, feeds)
+    except requests.exceptions.RequestException as e:
+        return [{'title': f"讀取 {url} 時發生錯誤: {e}", 'link': ''}]
 
     if not results:
-        no_articles_message = """找不到可辨識的文章。請檢查目標網站的 HTML 結構以優化選擇器。
+        no_articles_message = f"""找不到可辨識的文章。請檢查目標網站的 HTML 結構，並為此網域加入擷取規則。
 您可以這樣做：
 1. 在瀏覽器中打開目標網站。
 2. 在文章標題上按右鍵，選擇 '檢查' 或 '檢查元素'。
-3. 在開發者工具中，找到能夠唯一識別文章標題和連結的 HTML 標籤與 class。
-4. 修改 `crawler.py` 腳本，使用 `soup.find()` 或 `soup.find_all()` 方法來指定這些標籤。
-   例如: `soup.find_all('div', class_='article-card')` 或 `soup.select('h2.post-title > a')`"""
+3. 在開發者工具中，找到包住每篇文章的元素，以及其中的標題與連結的 CSS 選擇器。
+4. 在 {get_site_rules().path} 中加入此網域的規則 (不需修改程式)，例如:
+   "{domain_of(url)}": {{"container": "div.article-card", "title": "h2.post-title", "link": "a"}}"""
         results.append({'title': no_articles_message, 'link': ''})
 
     return results
@@ -88,15 +379,54 @@ def display_text_results(results):
     for item in results:
         # .get() is used to avoid KeyError if 'link' is missing
         if item.get('link'):
-            print(f"標題: {item['title']}\n連結: {item['link']}\n")
+            published = f"\n發布時間: {item['published']}" if item.get('published') else ""
+            print(f"標題: {item['title']}\n連結: {item['link']}{published}\n")
         else:
             print(item['title'])
 
+def _offer_near_duplicate_merge(results):
+    """
+    Looks for near-duplicate titles (the same story under slightly different
+    wording) and, if the user agrees, keeps only one canonical record per group
+    with its 'count'. Used for the CSV export only: the article database keeps
+    every record so the analyzer can count repeated stories itself.
+    """
+    try:
+        from dedup import collapse_near_duplicates
+    except ImportError:
+        return results # NumPy is not installed
+    collapsed = collapse_near_duplicates(results)
+    merged = len(results) - len(collapsed)
+    if merged == 0:
+        return results
+
+    print(f"\n偵測到 {merged} 篇近似重複的文章:")
+    for item in collapsed:
+        if item.get('count', 1) > 1:
+            print(f"  {item['title']} (共 {item['count']} 篇)")
+            for duplicate in item['duplicates']:
+                print(f"    - {duplicate['title']}")
+    if input("是否在 CSV 中合併為一篇代表文章並記錄篇數？ (y/n): ").lower() == 'y':
+        return collapsed
+    return results
+
 def save_text_results(results, target_url):
-    """Saves the extracted text results to a CSV file."""
+    """Saves the extracted text results to the article database and, optionally, a CSV file."""
     print("\n---")
     save_choice = input("您要將結果儲存為檔案嗎？ (y/n): ").lower()
     if save_choice == 'y':
+        try:
+            store = get_article_store()
+            run_id = store.start_run(target_url)
+            with _metrics.timer('save', host_of(target_url)):
+                saved = store.add_articles(results, target_url, run_id)
+            print(f"已將 {saved} 筆文章存入資料庫: {store.db_path}")
+        except sqlite3.Error as e:
+            print(f"儲存至資料庫時發生錯誤: {e}")
+
+        if input("是否也要匯出為 CSV 檔案？ (y/n): ").lower() != 'y':
+            return
+        results = _offer_near_duplicate_merge(results)
         try:
             # Define the output directory for CSV files, making the path absolute
             output_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'dist', 'csv'))
@@ -107,9 +437,9 @@ def save_text_results(results, target_url):
             
             with open(filename, 'w', encoding='utf-8', newline='') as f:
                 writer = csv.writer(f)
-                writer.writerow(['Title', 'Link', 'Source URL']) # Header
+                writer.writerow(['Title', 'Link', 'Source URL', 'Count', 'Published']) # Header
                 for item in results:
-                    writer.writerow([item['title'], item['link'], target_url])
+                    writer.writerow([item['title'], item['link'], target_url, item.get('count', 1), item.get('published') or ''])
             
             print(f"結果已成功儲存至: {filename}")
         except (IOError, csv.Error) as e:
@@ -118,20 +448,10 @@ def save_text_results(results, target_url):
 from urllib.parse import urljoin, urlparse
 
 # --- Image crawling functions ---
-def crawl_images(url):
-    """
-    Crawls the given URL and extracts all absolute image URLs.
-    """
-    try:
-        response = requests.get(url, headers=DEFAULT_HEADERS, timeout=10)
-        response.raise_for_status()
-        response.encoding = response.apparent_encoding
-    except requests.exceptions.RequestException as e:
-        print(f"\n讀取 {url} 時發生錯誤: {e}")
-        return []
-
-    soup = BeautifulSoup(response.text, 'html.parser')
+def extract_images(soup, url):
+    """Extracts all absolute image URLs from a parsed page."""
     image_urls = []
+    seen = set() # Keeps the duplicate check O(1) on pages with many images
     
     for img_tag in soup.find_all('img'):
         src = img_tag.get('src')
@@ -148,13 +468,234 @@ def crawl_images(url):
         # A simple filter for common image extensions
         # and ensure the URL seems valid
         if absolute_url.startswith('http') and any(absolute_url.lower().split('?')[0].endswith(ext) for ext in ['.jpeg', '.jpg', '.png', '.gif', '.webp', '.svg']):
-             if absolute_url not in image_urls:
+             if absolute_url not in seen:
+                seen.add(absolute_url)
                 image_urls.append(absolute_url)
 
     return image_urls
 
-def save_images(image_urls, base_url):
-    """Downloads and saves images from a list of URLs."""
+def crawl_images(url, session=None, cache=None):
+    """
+    Crawls the given URL and extracts all absolute image URLs.
+    An existing requests.Session can be passed in; otherwise the shared one is used.
+    Pass an HttpCache to revalidate and reuse results of unchanged pages.
+    """
+    try:
+        return list(process_page(url, ['images'], session, cache)['extracted']['images'])
+    except requests.exceptions.RequestException as e:
+        print(f"\n讀取 {url} 時發生錯誤: {e}")
+        return []
+
+# --- Page pipeline: fetch and parse once, run many extractors ---
+def extract_meta(soup, url):
+    """Extracts the page title and description / Open Graph meta tags."""
+    meta = {}
+    title_tag = soup.find('title')
+    if title_tag:
+        meta['title'] = title_tag.get_text(strip=True)
+    for meta_tag in soup.find_all('meta'):
+        key = meta_tag.get('property') or meta_tag.get('name')
+        content = meta_tag.get('content')
+        if key and content and (key == 'description' or key.startswith('og:')):
+            meta[key] = content
+    return meta
+
+# Registered extractors: name -> (extract(soup, url), tags it needs or None for the full tree, cache version)
+EXTRACTORS = {}
+
+ARTICLE_EXTRACTOR_VERSION = 1 # Bump when extract_articles changes, so cached results are not reused
+
+def register_extractor(name, extract, tags=None, version=None):
+    """
+    Registers an extractor for process_page. tags lists the HTML tags the
+    extractor looks at, so pages can be parsed with a SoupStrainer; None means
+    it needs the full document. tags may also be a function of the page URL
+    returning such a list (or None). version tags the results kept in the
+    HttpCache, which are only reused under the same version; it may also be a
+    function of the page URL, e.g. to include the site rule the extractor uses.
+    """
+    EXTRACTORS[name] = (extract, tags, version)
+
+def article_tags(url):
+    """
+    Tags the 'articles' extractor needs for url: ARTICLE_TAGS, plus the 'tags'
+    a hand-written site rule lists (None, the full page, if it lists none).
+    Learned rules only use ARTICLE_TAGS, as they are learned from such pages.
+    """
+    rule = get_site_rules().get(url)
+    if rule is None or rule.get('learned'):
+        return ARTICLE_TAGS
+    return ARTICLE_TAGS + list(rule['tags']) if 'tags' in rule else None
+
+def article_version(url):
+    """
+    Cache version of the 'articles' extractor for url: ARTICLE_EXTRACTOR_VERSION
+    and the selectors of the domain's site rule, so a result cached before a
+    rule was learned or edited is extracted again.
+    """
+    rule = get_site_rules().get(url)
+    if rule is None:
+        return str(ARTICLE_EXTRACTOR_VERSION)
+    selectors = {key: rule[key] for key in ('container', 'title', 'link', 'tags') if key in rule}
+    return f"{ARTICLE_EXTRACTOR_VERSION}:{json.dumps(selectors, sort_keys=True, ensure_ascii=False)}"
+
+def extractor_version(name, url):
+    """The cache version of the named extractor's results for url."""
+    version = EXTRACTORS[name][2]
+    return version(url) if callable(version) else version
+
+register_extractor('articles', extract_articles, article_tags, article_version)
+register_extractor('images', extract_images, IMAGE_TAGS)
+register_extractor('meta', extract_meta, ['title', 'meta'])
+
+_parse_pool = None
+
+def set_parse_pool(pool):
+    """
+    Makes process_page hand parsing and extraction to a parse_pool.ParsePool
+    (worker processes) instead of running them in the calling thread; None
+    switches back.
+    """
+    global _parse_pool
+    _parse_pool = pool
+
+def page_tags(url, names):
+    """Sorted union of the tags the named extractors need for url, or None if one needs the full page."""
+    tag_lists = [EXTRACTORS[name][1] for name in names]
+    tag_lists = [tags(url) if callable(tags) else tags for tags in tag_lists]
+    if any(tags is None for tags in tag_lists):
+        return None
+    return sorted({tag for tags in tag_lists for tag in tags})
+
+def run_extractors(page, extractors, tags):
+    """
+    Parses a page returned by fetcher.fetch_page once, restricted to tags (None
+    for the full document), and runs the (name, extract) pairs over the tree.
+    Returns a dictionary mapping each name to its result.
+    """
+    url = page['url']
+    soup = parse_page(page, SoupStrainer(tags) if tags is not None else None)
+    host = host_of(url) if _metrics.enabled else None
+    extracted = {}
+    for name, extract in extractors:
+        with _metrics.timer(f'extract.{name}', host):
+            extracted[name] = extract(soup, url)
+    return extracted
+
+def process_page(url, extractors=None, session=None, cache=None, page=None):
+    """
+    Fetches and parses url once and runs the named extractors (all registered
+    extractors if None) over the same tree. The page is parsed only for the
+    union of the tags the extractors need, in a worker process when a parse
+    pool was set with set_parse_pool (and in the calling thread once it broke).
+
+    Returns a dictionary with the 'url', a 'not_modified' flag and 'extracted',
+    mapping each extractor name to its result. With an HttpCache, results are
+    cached per extractor and reused on 304 Not Modified; the page is parsed only
+    if some extractor has no cached result. A page already fetched with
+    fetcher.fetch_page can be passed in to avoid fetching url again.
+    Raises requests.exceptions.RequestException if the page cannot be read.
+    """
+    names = list(extractors) if extractors is not None else list(EXTRACTORS)
+    if page is None:
+        page = fetch_page(url, session, cache)
+
+    # Taken before extracting: the results belong to the site rules as they were then
+    versions = {name: extractor_version(name, url) for name in names} if cache is not None else {}
+    extracted = {}
+    if page['not_modified']:
+        for name in names:
+            records = cache.get_extracted(url, name, versions[name])
+            if records is not None:
+                extracted[name] = records
+
+    pending = [name for name in names if name not in extracted]
+    if pending:
+        tags = page_tags(url, pending)
+        pending_extractors = [(name, EXTRACTORS[name][0]) for name in pending]
+        pool = _parse_pool
+        if pool is not None and not pool.broken:
+            results = pool.extract(page, pending_extractors, tags)
+        else:
+            results = run_extractors(page, pending_extractors, tags)
+        extracted.update(results)
+        if cache is not None:
+            for name in pending:
+                cache.store_extracted(url, name, extracted[name], versions[name])
+
+    return {'url': url, 'not_modified': page['not_modified'], 'extracted': extracted}
+
+# --- Image saving functions ---
+IMAGE_DOWNLOAD_WORKERS = 8 # Total number of concurrent image downloads
+IMAGE_PER_HOST_LIMIT = 4 # Max simultaneous connections to a single host
+
+def _image_filename(img_url, content_type, index):
+    """
+    Builds a filename for an image from its URL, falling back to the content-type.
+    Names taken from the URL get a short digest of the whole URL, so images with
+    the same basename under different paths (e.g. .../a/logo.png and .../b/logo.png)
+    do not overwrite each other.
+    """
+    img_name = os.path.basename(urlparse(img_url).path)
+    if not img_name or '.' not in img_name:
+        # If no name or extension, create one from the index and try to get extension from content-type
+        ext = '.jpg' # fallback
+        if content_type and 'image/' in content_type:
+            ext = '.' + content_type.split('/')[1].split(';')[0].strip()
+        img_name = f"image_{index+1}{ext}"
+    else:
+        stem, ext = os.path.splitext(img_name)
+        img_name = f"{stem}_{hashlib.sha1(img_url.encode('utf-8')).hexdigest()[:8]}{ext}"
+    return img_name
+
+def _download_image(session, store, img_url, index, dir_name, host_slots, revalidate):
+    """
+    Saves a single image into the content-addressed store and links it into dir_name.
+    Images whose URL is already in the store are not downloaded again (with
+    revalidate, only if a HEAD request shows them unchanged). The per-host slot is
+    held while connected.
+    Returns (filename, digest, bytes downloaded, status) where status is 'downloaded',
+    'known' (skipped, URL already stored) or 'duplicate' (same content stored before).
+    """
+    entry = store.lookup(img_url)
+    if entry is not None and revalidate:
+        with host_slots[urlparse(img_url).netloc]:
+            if not store.is_fresh(img_url, entry, session):
+                entry = None
+
+    if entry is not None:
+        img_name = _image_filename(img_url, entry['content_type'], index)
+        digest, written, status = entry['digest'], 0, 'known'
+    else:
+        host = urlparse(img_url).netloc
+        with host_slots[host], _metrics.timer('image', host), session.get(img_url, timeout=15, stream=True) as img_response:
+            img_response.raise_for_status()
+            img_name = _image_filename(img_url, img_response.headers.get('content-type'), index)
+            digest, written, is_new = store.ingest(img_url, img_response)
+        status = 'downloaded' if is_new else 'duplicate'
+        _metrics.increment('image_bytes', written, host)
+
+    store.link_into(digest, os.path.join(dir_name, img_name))
+    return img_name, digest, written, status
+
+def save_images(image_urls, base_url, max_workers=IMAGE_DOWNLOAD_WORKERS, per_host_limit=IMAGE_PER_HOST_LIMIT, session=None,
+                store=None, revalidate=False, output_dir=None):
+    """
+    Downloads and saves images from a list of URLs.
+    Downloads run concurrently on a thread pool of max_workers threads, with at most
+    per_host_limit connections open to any single host at a time.
+    All downloads share one pooled session so connections are reused.
+
+    Images are kept once in a content-addressed ImageStore (the shared one under
+    dist/image/store by default); URLs fetched in earlier runs are skipped, or
+    checked with a HEAD request when revalidate is set. The per-run folder
+    (created under output_dir, 'dist/image' by default) holds hardlinks to the
+    stored files plus a manifest.json.
+    Returns a dictionary with the folder, the number of images saved, the bytes
+    downloaded and the elapsed seconds, or None if nothing could be saved.
+    """
+    session = session or get_session()
+    store = store or get_image_store()
     if not image_urls:
         # This case is handled in the main loop, but good to have a safeguard
         print("沒有找到可儲存的圖片。 সন")
@@ -167,7 +708,7 @@ def save_images(image_urls, base_url):
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         
         # Create a dedicated, timestamped folder inside 'dist/image'
-        base_image_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'dist', 'image'))
+        base_image_dir = output_dir or os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'dist', 'image'))
         dir_name = os.path.join(base_image_dir, f"images_{domain}_{timestamp}")
         
         os.makedirs(dir_name, exist_ok=True)
@@ -176,40 +717,53 @@ def save_images(image_urls, base_url):
         print(f"\n建立資料夾時發生錯誤: {e}")
         return
 
+    # One semaphore per host caps how many connections we open to it at once
+    host_slots = defaultdict(lambda: threading.BoundedSemaphore(max(1, per_host_limit)))
+    for img_url in image_urls:
+        host_slots[urlparse(img_url).netloc]
+
     saved_count = 0
-    for i, img_url in enumerate(image_urls):
-        try:
-            # Get the image content
-            img_response = requests.get(img_url, headers=DEFAULT_HEADERS, timeout=15, stream=True)
-            img_response.raise_for_status()
+    total_bytes = 0
+    status_counts = {'downloaded': 0, 'known': 0, 'duplicate': 0}
+    manifest = []
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = {
+            executor.submit(_download_image, session, store, img_url, i, dir_name, host_slots, revalidate): img_url
+            for i, img_url in enumerate(image_urls)
+        }
+        # Progress is reported from this thread only, so the output lines never interleave
+        for future in as_completed(futures):
+            img_url = futures[future]
+            try:
+                img_name, digest, written, status = future.result()
+            except requests.exceptions.RequestException as e:
+                print(f"\n  - 下載失敗 {os.path.basename(img_url)}: {e}")
+                continue
+            except (IOError, sqlite3.Error) as e: # E.g. the store's index is locked by another run
+                print(f"\n  - 儲存圖片失敗 {os.path.basename(img_url)}: {e}")
+                continue
 
-            # Create a filename from the URL
-            img_name = os.path.basename(urlparse(img_url).path)
-            if not img_name or '.' not in img_name:
-                # If no name or extension, create one from the index and try to get extension from content-type
-                content_type = img_response.headers.get('content-type')
-                ext = '.jpg' # fallback
-                if content_type and 'image/' in content_type:
-                    ext = '.' + content_type.split('/')[1]
-                img_name = f"image_{i+1}{ext}"
-
-            filepath = os.path.join(dir_name, img_name)
-
-            # Write the image to a file
-            with open(filepath, 'wb') as f:
-                for chunk in img_response.iter_content(chunk_size=8192):
-                    f.write(chunk)
-            
             saved_count += 1
+            total_bytes += written
+            status_counts[status] += 1
+            manifest.append({'name': img_name, 'url': img_url, 'sha256': digest})
             # Use carriage return to show progress on a single line
             print(f"  ({saved_count}/{len(image_urls)}) 已儲存 {os.path.basename(img_name)}", end='\r')
+    elapsed = time.perf_counter() - start_time
 
-        except requests.exceptions.RequestException as e:
-            print(f"\n  - 下載失敗 {os.path.basename(img_url)}: {e}")
-        except IOError as e:
-            print(f"\n  - 儲存圖片失敗 {os.path.basename(img_name)}: {e}")
+    try:
+        with open(os.path.join(dir_name, 'manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+    except IOError as e:
+        print(f"\n  - 儲存 manifest.json 失敗: {e}")
     
     print(f"\n\n成功在 '{dir_name}' 中儲存了 {len(image_urls)} 張圖片中的 {saved_count} 張。 সন")
+    print(f"新下載 {status_counts['downloaded']} 張, 先前已下載而略過 {status_counts['known']} 張, "
+          f"內容與既有圖片重複 {status_counts['duplicate']} 張。")
+    if elapsed > 0:
+        print(f"下載速度: {saved_count / elapsed:.1f} 張/秒, {total_bytes / elapsed / (1024 * 1024):.2f} MB/秒 (耗時 {elapsed:.1f} 秒)")
+    return {'dir': dir_name, 'saved': saved_count, 'bytes': total_bytes, 'elapsed': elapsed}
 
 # --- Main application flow functions ---
 def show_crawler_submenu():
@@ -219,6 +773,7 @@ def show_crawler_submenu():
         print("請選擇要爬取的項目：")
         print("  1. 爬取文字 (標題與連結)")
         print("  2. 爬取圖片")
+        print("  3. 同時爬取文字與圖片 (只讀取一次頁面)")
         print("  b. 返回主選單")
         choice = input("請輸入選項 > ").strip().lower()
 
@@ -232,6 +787,11 @@ def show_crawler_submenu():
             print("\n" + "---"*10)
             print("爬取作業完成。請按 Enter 返回爬蟲選單。 সন")
             input()
+        elif choice == '3':
+            handle_combined_crawling()
+            print("\n" + "---"*10)
+            print("爬取作業完成。請按 Enter 返回爬蟲選單。")
+            input()
         elif choice == 'b':
             return # Go back to the main menu
         else:
@@ -255,7 +815,7 @@ def handle_text_crawling():
         return # User entered 'q'
 
     print("\n讀取中 (Loading)... সন")
-    results = crawl_blog(target_url)
+    results = crawl_blog(target_url, cache=get_cache())
 
     # Check for errors or empty results before displaying
     if not results or (len(results) == 1 and not results[0].get('link')):
@@ -273,7 +833,7 @@ def handle_image_crawling():
         return # User entered 'q'
         
     print("\n讀取中 (Loading)... সন")
-    image_urls = crawl_images(target_url)
+    image_urls = crawl_images(target_url, cache=get_cache())
 
     if image_urls:
         print(f"\n找到 {len(image_urls)} 張圖片。 সন")
@@ -282,6 +842,348 @@ def handle_image_crawling():
         # This message is shown if crawl_images returns an empty list
         print("\n在頁面上找不到可爬取的圖片。 সন")
 
+def handle_combined_crawling():
+    """Crawls text and images from a single fetch of the page."""
+    target_url = get_target_url()
+    if not target_url:
+        return # User entered 'q'
+
+    print("\n讀取中 (Loading)...")
+    try:
+        page_result = process_page(target_url, ['articles', 'images'], cache=get_cache())
+    except requests.exceptions.RequestException as e:
+        print(f"\n讀取 {target_url} 時發生錯誤: {e}")
+        return
+
+    results = page_result['extracted']['articles']
+    if results:
+        display_text_results(results)
+        save_text_results(results, target_url)
+    else:
+        print("\n找不到任何可爬取的文字內容。")
+
+    image_urls = page_result['extracted']['images']
+    if image_urls:
+        print(f"\n找到 {len(image_urls)} 張圖片。")
+        save_images(image_urls, target_url)
+    else:
+        print("\n在頁面上找不到可爬取的圖片。")
+
+# --- Batch (non-interactive) mode ---
+BATCH_WORKERS = 8 # Default number of pages crawled in parallel in batch mode
+
+def read_url_list(sources):
+    """
+    Yields URLs from the given sources. Each source is either a URL, a path to a
+    file with one URL per line, or '-' for standard input. Blank lines and lines
+    starting with '#' are skipped.
+    """
+    for source in sources:
+        if source.startswith('http://') or source.startswith('https://'):
+            yield source
+            continue
+        f = sys.stdin if source == '-' else open(source, 'r', encoding='utf-8')
+        try:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    yield line
+        finally:
+            if f is not sys.stdin:
+                f.close()
+
+def _crawl_page_for_batch(url, mode, session, cache=None, streaming=False, feeds=True):
+    """Crawls a single page for batch mode. Returns the extracted records; raises on fetch errors."""
+    if not (url.startswith('http://') or url.startswith('https://')):
+        raise ValueError("網址格式無效，必須以 'http://' 或 'https://' 開頭")
+    if mode == 'images':
+        return [{'image_url': image_url} for image_url in process_page(url, ['images'], session, cache)['extracted']['images']]
+    return fetch_articles(url, session, cache, streaming, feeds)
+
+def _open_batch_output(output_path, mode, output_format=None, store=None, run_id=None, dedup_index=None):
+    """
+    Opens the batch output file ('-' for stdout, None for no file) and writes the
+    CSV header. Returns a (write_page, close) pair; write_page(url, records, error)
+    appends the records of one finished page and flushes them to disk, and also
+    adds text records to the ArticleStore under run_id when a store is given.
+    With a dedup.NearDuplicateIndex, text records whose title nearly duplicates
+    an earlier one (from any page) are merged into it: the file gets one record
+    per group with its 'count', written on close once the groups are complete.
+    The store still gets every record, so the analyzer can count them itself.
+    """
+    if output_path is None:
+        out = None
+    elif output_path == '-':
+        out = sys.stdout
+    else:
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        out = open(output_path, 'w', encoding='utf-8', newline='')
+    if output_format is None:
+        output_format = 'jsonl' if (output_path or '').lower().endswith(('.jsonl', '.json')) else 'csv'
+    columns = ['image_url'] if mode == 'images' else ['title', 'link', 'count', 'published']
+    dedup = dedup_index is not None and mode == 'text'
+    groups = [] # (source URL, canonical record) per near-duplicate group, in order
+    canonical_of = [] # Canonical record of each title added to dedup_index
+
+    # Same header layout as save_text_results so the CSV can be read by the analyzer
+    csv_writer = csv.writer(out) if out and output_format == 'csv' else None
+    if csv_writer:
+        csv_writer.writerow(['Image URL', 'Source URL'] if mode == 'images' else ['Title', 'Link', 'Source URL', 'Count', 'Published'])
+
+    def write_page(url, records, error):
+        with _metrics.timer('save', host_of(url) if _metrics.enabled else None):
+            _write_page(url, records, error)
+
+    def _write_page(url, records, error):
+        if store is not None and records:
+            store.add_articles(records, url, run_id)
+        if dedup:
+            for record in records:
+                match = dedup_index.add(record['title'])
+                if match is None:
+                    canonical = dict(record, count=record.get('count', 1))
+                    groups.append((url, canonical))
+                else:
+                    canonical = canonical_of[match]
+                    canonical['count'] += record.get('count', 1)
+                canonical_of.append(canonical)
+            records = [] # Written on close, once their counts are known
+        if out is None:
+            return
+        if csv_writer:
+            # CSV output only carries data rows; errors are reported on stderr
+            _write_records(url, records)
+        elif error:
+            out.write(json.dumps({'source_url': url, 'error': error}, ensure_ascii=False) + '\n')
+        else:
+            _write_records(url, records)
+        out.flush()
+
+    def _write_records(url, records):
+        for record in records:
+            if csv_writer:
+                row = [record.get('count', 1) if column == 'count' else record.get(column) or '' for column in columns]
+                # The source URL goes right after the title and link, as in save_text_results
+                csv_writer.writerow(row[:2] + [url] + row[2:])
+            else:
+                out.write(json.dumps(dict(record, source_url=url), ensure_ascii=False) + '\n')
+
+    def close():
+        if out is None:
+            return
+        for url, record in groups:
+            _write_records(url, [record])
+        out.flush()
+        if out is not sys.stdout:
+            out.close()
+
+    return write_page, close
+
+def run_batch(urls, output_path, mode='text', output_format=None, workers=None, session=None, cache=None,
+              streaming=False, store=None, run_id=None, dedup_index=None, feeds=True, parse_workers=0):
+    """
+    Crawls every URL in urls with a bounded pool of worker threads and streams the
+    results to output_path ('-' for stdout) as each page finishes.
+    mode is 'text' (titles and links) or 'images' (image URLs); output_format is
+    'csv' or 'jsonl' and defaults to the output file extension. An optional
+    HttpCache lets unchanged pages be revalidated instead of re-downloaded;
+    streaming uses stream_articles for text mode (the cache is then bypassed);
+    feeds reads text pages from their RSS/Atom feed or sitemap when they have one.
+    Text records are also added to store (an ArticleStore) under run_id, if given,
+    and near-duplicate titles are merged in the output when a dedup_index is given.
+    workers is the number of fetching threads: BATCH_WORKERS by default, or
+    at least two per parse worker when parse_workers is given.
+    With parse_workers, HTML pages are parsed in that many worker processes
+    (see parse_pool.ParsePool) while the threads keep fetching.
+    Returns a (pages_ok, pages_failed) tuple.
+    """
+    session = session or get_session()
+    write_page, close_output = _open_batch_output(output_path, mode, output_format, store, run_id, dedup_index)
+
+    pages_ok = pages_failed = 0
+    max_workers = max(1, workers or BATCH_WORKERS)
+    pool = None
+    if parse_workers:
+        from parse_pool import ParsePool
+        pool = ParsePool(parse_workers, parser=DEFAULT_PARSER)
+        set_parse_pool(pool)
+        if workers is None:
+            # Each thread waits while its page is parsed; two per parse worker keep them all busy
+            max_workers = max(max_workers, pool.workers * 2)
+        elif max_workers < pool.workers * 2:
+            print(f"提示: {max_workers} 個爬取執行緒少於解析子行程數的兩倍 ({pool.workers * 2})，"
+                  f"部分解析子行程可能閒置", file=sys.stderr)
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = {}
+
+            def drain(return_when):
+                nonlocal pages_ok, pages_failed
+                done, _ = wait(pending, return_when=return_when)
+                for future in done:
+                    url = pending.pop(future)
+                    try:
+                        records = future.result()
+                    except Exception as e: # One page's fetch or extraction error (or a dead parse worker) must not stop the batch
+                        pages_failed += 1
+                        error = str(e) or type(e).__name__
+                        write_page(url, [], error)
+                        print(f"[失敗] {url}: {error}", file=sys.stderr)
+                        continue
+                    pages_ok += 1
+                    write_page(url, records, None)
+                    print(f"[完成] {url} ({len(records)} 筆)", file=sys.stderr)
+
+            # Keep only a bounded number of pages in flight so huge URL lists stream through
+            for url in urls:
+                if len(pending) >= max_workers * 2:
+                    drain(FIRST_COMPLETED)
+                pending[executor.submit(_crawl_page_for_batch, url, mode, session, cache, streaming, feeds)] = url
+            while pending:
+                drain(FIRST_COMPLETED)
+    finally:
+        if pool is not None:
+            set_parse_pool(None)
+            pool.close()
+        close_output()
+
+    return pages_ok, pages_failed
+
+def run_frontier_batch(start_urls, output_path, mode='text', output_format=None, workers=BATCH_WORKERS,
+                       max_depth=2, max_pages=50, delay=1.0, bloom_capacity=None, pagination_only=False, session=None,
+                       cache=None, store=None, run_id=None, dedup_index=None):
+    """
+    Multi-page variant of run_batch: follows same-domain links from start_urls
+    breadth-first (see frontier.crawl_site) and streams each page's new records
+    to output_path. Returns a (pages_ok, pages_failed) tuple.
+    """
+    import frontier
+
+    write_page, close_output = _open_batch_output(output_path, mode, output_format, store, run_id, dedup_index)
+    counts = {'ok': 0, 'failed': 0}
+
+    def on_page(url, records, error):
+        write_page(url, records, error)
+        if error:
+            counts['failed'] += 1
+            print(f"[失敗] {url}: {error}", file=sys.stderr)
+        else:
+            counts['ok'] += 1
+            print(f"[完成] {url} ({len(records)} 筆)", file=sys.stderr)
+
+    seen = frontier.BloomSeenSet(bloom_capacity) if bloom_capacity else None
+    if mode == 'images':
+        extract, dedup_key = (lambda soup, url: [{'image_url': u} for u in extract_images(soup, url)]), 'image_url'
+        only = SoupStrainer(IMAGE_TAGS + ['a']) # Links are still needed to find further pages
+    else:
+        extract, dedup_key, only = extract_articles, 'link', ARTICLE_STRAINER
+    try:
+        frontier.crawl_site(list(start_urls), max_depth=max_depth, max_pages=max_pages, delay=delay,
+                            workers=workers, session=session, extract=extract, dedup_key=dedup_key,
+                            seen=seen, pagination_only=pagination_only, cache=cache, only=only,
+                            on_page=on_page, fetch_soup=fetch_soup)
+    finally:
+        close_output()
+
+    return counts['ok'], counts['failed']
+
+def batch_main(argv):
+    """
+    Command-line entry point for batch mode. Returns the process exit code:
+    0 when every page was crawled, 1 when any page failed.
+    """
+    parser = argparse.ArgumentParser(
+        prog='crawler.py',
+        description='批次爬取模式：爬取一個網址、網址清單檔案或標準輸入 (-) 中的所有網址。',
+    )
+    parser.add_argument('sources', nargs='*', help="網址、網址清單檔案 (每行一個網址)，或 '-' 代表標準輸入")
+    parser.add_argument('-i', '--input', action='append', default=[], help="網址清單檔案，或 '-' 代表標準輸入 (可重複指定)")
+    parser.add_argument('-m', '--mode', choices=['text', 'images'], default='text', help='爬取文字 (標題與連結) 或圖片網址')
+    parser.add_argument('-o', '--output', help="另外輸出的檔案路徑 (.csv 或 .jsonl)，'-' 代表標準輸出；文字結果一律存入文章資料庫")
+    parser.add_argument('-f', '--format', choices=['csv', 'jsonl'], help='輸出格式 (預設依副檔名判斷)')
+    parser.add_argument('-w', '--workers', type=int, help=f'同時爬取的頁面數 (預設 {BATCH_WORKERS}；使用 --parse-workers 時至少為其兩倍)')
+    parser.add_argument('--depth', type=int, default=0, help='跟隨同網域連結的最大深度 (例如分頁、較舊文章)；0 代表只爬取指定頁面')
+    parser.add_argument('--max-pages', type=int, default=50, help='多頁爬取時最多讀取的頁面數 (預設 50)')
+    parser.add_argument('--delay', type=float, default=1.0, help='多頁爬取時對同一主機的請求間隔秒數 (預設 1.0)')
+    parser.add_argument('--pagination-only', action='store_true', help='多頁爬取時只跟隨分頁連結 (下一頁、較舊文章等)')
+    parser.add_argument('--parse-workers', type=int, default=0, help=f'以多少個子行程平行解析 HTML 頁面 (0 代表在爬取執行緒中解析；建議為 CPU 核心數 {os.cpu_count() or 1}，--stream 與 --depth 時不使用)')
+    parser.add_argument('--parser', choices=PARSER_BACKENDS, default=DEFAULT_PARSER, help=f'HTML 解析器 (未安裝時自動改用下一個可用的解析器，預設 {DEFAULT_PARSER})')
+    parser.add_argument('--cache', action='store_true', help='使用 dist/cache 中的 HTTP 快取 (以 ETag/Last-Modified 重新驗證未變更的頁面)')
+    parser.add_argument('--stream', action='store_true', help='以串流方式解析文字頁面，找到足夠的文章後即停止下載 (需要 lxml)')
+    parser.add_argument('--no-feeds', action='store_true', help='不使用網站的 RSS/Atom feed 或 sitemap，一律解析 HTML 頁面')
+    parser.add_argument('--no-store', action='store_true', help='不要將文字結果存入文章資料庫 (dist/articles.sqlite3)')
+    parser.add_argument('--bloom-capacity', type=int, help='以 Bloom filter 記錄已見網址，並指定預估的網址數量 (適用於大型爬取)')
+    parser.add_argument('--robots', action='store_true', help='遵守 robots.txt 的 Crawl-delay (每個主機的請求間隔)')
+    parser.add_argument('--metrics', action='store_true', help='記錄各階段 (下載、解析、擷取、儲存) 的耗時，並在結束時顯示統計')
+    parser.add_argument('--metrics-out', help='將效能統計匯出至檔案 (.prom 為 Prometheus 文字格式，其餘為 JSON Lines)；隱含 --metrics')
+    parser.add_argument('--dedup', action='store_true', help='將標題近似重複的文章合併為一筆並記錄篇數 (例如不同網站轉載的同一則新聞，需要 NumPy)；合併後的結果於爬取結束時寫出')
+    args = parser.parse_args(argv)
+
+    sources = args.sources + args.input
+    set_default_parser(args.parser)
+    if args.metrics or args.metrics_out:
+        _metrics.enable(report=True, export_path=args.metrics_out)
+    get_controller().respect_robots = args.robots
+    if not sources:
+        parser.error('請至少提供一個網址或網址清單檔案。')
+
+    output_path = args.output
+    if not output_path and args.mode == 'images':
+        # Image URLs are not stored in the article database, so default to a file
+        output_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'dist', 'csv'))
+        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        ext = 'jsonl' if args.format == 'jsonl' else 'csv'
+        output_path = os.path.join(output_dir, f"crawled_images_{timestamp}.{ext}")
+
+    cache = get_cache() if args.cache else None
+    store = run_id = None
+    if args.mode == 'text' and not args.no_store:
+        store = get_article_store()
+        run_id = store.start_run('batch: ' + ' '.join(sources))
+    dedup_index = None
+    if args.dedup:
+        try:
+            from dedup import NearDuplicateIndex
+        except ImportError as e:
+            parser.error(f'--dedup 需要 NumPy: {e}')
+        dedup_index = NearDuplicateIndex()
+    try:
+        if args.depth > 0:
+            pages_ok, pages_failed = run_frontier_batch(read_url_list(sources), output_path, mode=args.mode,
+                                                        output_format=args.format, workers=args.workers or BATCH_WORKERS,
+                                                        max_depth=args.depth, max_pages=args.max_pages,
+                                                        delay=args.delay, bloom_capacity=args.bloom_capacity,
+                                                        pagination_only=args.pagination_only, cache=cache,
+                                                        store=store, run_id=run_id, dedup_index=dedup_index)
+        else:
+            pages_ok, pages_failed = run_batch(read_url_list(sources), output_path, mode=args.mode,
+                                               output_format=args.format, workers=args.workers, cache=cache,
+                                               streaming=args.stream, store=store, run_id=run_id,
+                                               dedup_index=dedup_index, feeds=not args.no_feeds,
+                                               parse_workers=args.parse_workers)
+    except (IOError, csv.Error, sqlite3.Error) as e:
+        print(f"批次爬取時發生錯誤: {e}", file=sys.stderr)
+        return 1
+
+    print(f"批次爬取完成: 成功 {pages_ok} 頁, 失敗 {pages_failed} 頁。", file=sys.stderr)
+    if dedup_index is not None:
+        print(f"合併近似重複的文章: {dedup_index.duplicates} 篇", file=sys.stderr)
+    if output_path:
+        print(f"結果已儲存至: {output_path}", file=sys.stderr)
+    if store is not None:
+        print(f"文章已存入資料庫: {store.db_path} (執行 ID: {run_id})", file=sys.stderr)
+    print(encoding_stats_summary(), file=sys.stderr)
+    throttling = get_controller().summary()
+    if throttling:
+        print(throttling, file=sys.stderr)
+    if cache is not None:
+        cache.save()
+        print(cache.summary(), file=sys.stderr)
+    rules = get_site_rules()
+    rules.save()
+    print(rules.summary(), file=sys.stderr)
+    return 1 if pages_failed else 0
+
 def main():
     """Main application loop for V2.0."""
     while True:
@@ -297,6 +1199,8 @@ def main():
         if choice == '1':
             show_crawler_submenu()
         elif choice == '2':
+            # Imported on demand: the analyzer pulls in the AI client libraries
+            from analyzer import run_analyzer
             run_analyzer()
         elif choice == '3':
             print("\n正在離開程式，再見！ সন")
@@ -310,4 +1214,8 @@ def main():
             input()
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support() # Parse workers of the bundled .exe start here
+    enable_from_env()
+    if len(sys.argv) > 1:
+        sys.exit(batch_main(sys.argv[1:]))
     main()
@@ -0,0 +1,126 @@
+import re
+import zlib
+
+import numpy as np
+
+SIMILARITY_THRESHOLD = 0.6 # Jaccard similarity of title shingles
+NUM_PERMUTATIONS = 128
+LSH_BANDS = 32 # 32 bands of 4 rows: pairs above ~0.4 similarity become candidates
+SHINGLE_SIZE = 3
+
+_SHIFT = np.uint64(32)
+_NON_WORD_RE = re.compile(r"[^\w]+")
+_NUMBER_RE = re.compile(r"\d+")
+
+def title_shingles(title, size=SHINGLE_SIZE):
+    """
+    Returns the set of character n-grams of a normalized title. Character
+    shingles work for Latin and CJK titles alike, without word segmentation.
+    """
+    text = ' '.join(_NON_WORD_RE.sub(' ', title.casefold()).split())
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+class NearDuplicateIndex:
+    """
+    Incremental MinHash index with LSH banding. Each added title is only
+    compared with the titles that share at least one band of its signature,
+    so indexing n titles stays far below n^2 comparisons. Candidates are
+    confirmed with the exact Jaccard similarity of their shingles, and titles
+    with different numbers ("Part 1" / "Part 2", "3.13" / "3.14") are never
+    considered duplicates.
+    """
+    def __init__(self, threshold=SIMILARITY_THRESHOLD, num_perm=NUM_PERMUTATIONS, bands=LSH_BANDS, seed=1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(0, 1 << 63, size=(num_perm, 1), dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._b = rng.integers(0, 1 << 63, size=(num_perm, 1), dtype=np.uint64)
+        self._buckets = {}
+        self._shingles = []
+        self._numbers = []
+        self._canonical = [] # Index of the canonical (first seen) title of each entry's cluster
+        self.duplicates = 0
+
+    def signature(self, shingles):
+        """
+        MinHash signature of a shingle set: the minimum of each hash function.
+        The functions are multiply-shift hashes, (a * x + b) mod 2^64 >> 32.
+        """
+        x = np.fromiter((zlib.crc32(s.encode('utf-8')) for s in shingles), dtype=np.uint64, count=len(shingles))
+        return ((self._a * x + self._b) >> _SHIFT).min(axis=1)
+
+    def add(self, title):
+        """
+        Indexes a title and returns the position of the earlier title it
+        duplicates (the canonical one of its cluster), or None if it is new.
+        """
+        index = len(self._shingles)
+        shingles = title_shingles(title)
+        numbers = sorted(_NUMBER_RE.findall(title))
+        self._shingles.append(shingles)
+        self._numbers.append(numbers)
+        if not shingles:
+            self._canonical.append(index)
+            return None
+
+        signature = self.signature(shingles)
+        keys = [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+        match = None
+        checked = set()
+        for key in keys:
+            for candidate in self._buckets.get(key, ()):
+                if candidate in checked:
+                    continue
+                checked.add(candidate)
+                if numbers == self._numbers[candidate] and jaccard(shingles, self._shingles[candidate]) >= self.threshold:
+                    match = self._canonical[candidate]
+                    break
+            if match is not None:
+                break
+
+        self._canonical.append(index if match is None else match)
+        if match is not None:
+            self.duplicates += 1
+        else:
+            # Only canonical titles are bucketed, which keeps the buckets small
+            for key in keys:
+                self._buckets.setdefault(key, []).append(index)
+        return match
+
+def collapse_near_duplicates(records, threshold=SIMILARITY_THRESHOLD):
+    """
+    Groups records whose titles are near-duplicates and returns one canonical
+    record per group (the first one seen), in the original order. Each returned
+    record is a copy with 'count' (the size of its group, adding up any counts
+    the records already carry) and 'duplicates' (the other records of the
+    group). Records without a title or link are kept as they are.
+    """
+    index = NearDuplicateIndex(threshold)
+    collapsed = []
+    by_position = {}
+    for record in records:
+        if not record.get('title') or not record.get('link'):
+            collapsed.append(record)
+            continue
+        position = len(by_position)
+        match = index.add(record['title'])
+        if match is None:
+            canonical = dict(record, count=record.get('count', 1), duplicates=[])
+            by_position[position] = canonical
+            collapsed.append(canonical)
+        else:
+            canonical = by_position[match]
+            canonical['count'] += record.get('count', 1)
+            canonical['duplicates'].append(record)
+            by_position[position] = canonical
+    return collapsed
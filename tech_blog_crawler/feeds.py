@@ -0,0 +1,308 @@
+import gzip
+import heapq
+import io
+import re
+import zlib
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from itertools import islice
+from urllib.parse import urljoin, urlsplit, unquote
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    from lxml import etree # Faster, same iterparse API
+except ImportError:
+    import xml.etree.ElementTree as etree
+
+from fetcher import get_session
+from metrics import get_metrics, host_of
+
+_metrics = get_metrics()
+
+# <link rel="alternate" type="..."> values that announce a feed
+FEED_TYPES = ('application/rss+xml', 'application/atom+xml', 'application/rdf+xml')
+# Paths that are read as feeds or sitemaps directly, without looking at HTML first
+FEED_PATH_RE = re.compile(r'(\.(xml|rss|atom|rdf)(\.gz)?|/(feed|rss|atom)/?)$', re.IGNORECASE)
+HEAD_SCAN_BYTES = 64 * 1024 # Scanned for <link> tags when a page has no </head>
+_HEAD_END_RE = re.compile(rb'</head\s*>', re.IGNORECASE)
+_XML_CONTENT_TYPES = ('xml', 'rss', 'atom')
+
+_GZIP_MAGIC = b'\x1f\x8b'
+# Errors read_feed raises for a broken, truncated or wrongly compressed document
+# (requests' RequestException is an OSError too)
+FEED_ERRORS = (SyntaxError, OSError, EOFError, zlib.error)
+
+MAX_CHILD_SITEMAPS = 5 # Newest child sitemaps read from a sitemap index
+MIN_SLUG_TITLE = 10 # Sitemap URLs whose slug is shorter than this are skipped (see _title_from_url)
+
+def looks_like_feed_url(url):
+    """True for URLs whose path suggests a feed or sitemap (e.g. /feed, /rss.xml, /sitemap.xml.gz)."""
+    return bool(FEED_PATH_RE.search(urlsplit(url).path))
+
+def is_xml_page(page):
+    """True if a page returned by fetcher.fetch_page is an XML document rather than HTML."""
+    content_type = (page['headers'].get('Content-Type') or '').lower()
+    if 'html' in content_type:
+        return False
+    if any(kind in content_type for kind in _XML_CONTENT_TYPES):
+        return True
+    return page['content'][:256].lstrip().startswith(b'<?xml')
+
+def find_feed_links(page):
+    """
+    Returns the absolute URLs of the feeds a page announces with
+    <link rel="alternate" type="application/rss+xml"> (or Atom/RDF), and of a
+    <link rel="sitemap">, in page order with comment feeds last. Only the
+    <head> is parsed, so this is cheap even for huge pages.
+    """
+    content = page['content']
+    match = _HEAD_END_RE.search(content)
+    head = content[:match.start()] if match else content[:HEAD_SCAN_BYTES]
+    text = head.decode(page['encoding'] or 'utf-8', errors='replace')
+
+    feeds, comment_feeds = [], []
+    for link in BeautifulSoup(text, 'html.parser', parse_only=SoupStrainer('link')).find_all('link'):
+        feed = feed_link(page['url'], ' '.join(link.get('rel') or []), link.get('type'), link.get('href'),
+                         link.get('title'))
+        if feed is not None:
+            url, is_comments = feed
+            if url not in feeds and url not in comment_feeds:
+                (comment_feeds if is_comments else feeds).append(url)
+    return feeds + comment_feeds
+
+def feed_link(base_url, rel, link_type, href, title=None):
+    """
+    Given the rel, type, href and title attributes of a <link> tag, returns
+    (absolute URL, is_comment_feed) if it announces a feed or sitemap, else None.
+    """
+    rel = (rel or '').lower().split()
+    if not href or not ('alternate' in rel and (link_type or '').lower() in FEED_TYPES or 'sitemap' in rel):
+        return None
+    return urljoin(base_url, href), 'comment' in (title or '').lower() or 'comment' in href.lower()
+
+def parse_date(value):
+    """
+    Parses an RSS (RFC 822), Atom or sitemap (ISO 8601 / W3C) date into an ISO
+    8601 string, in UTC when the date has a time zone. Returns None if unparsable.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        when = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        try:
+            when = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+    if when.tzinfo is not None:
+        when = when.astimezone(timezone.utc)
+    return when.isoformat(timespec='seconds')
+
+ENTRY_TAGS = ('item', 'entry', 'url', 'sitemap') # RSS, Atom, sitemap and sitemap index entries
+_RDF_ABOUT = '{http://www.w3.org/1999/02/22-rdf-syntax-ns#}about'
+_local_names = {}
+
+def _local_name(tag):
+    """'{http://www.w3.org/2005/Atom}entry' -> 'entry'. Memoized: documents only use a few tags."""
+    name = _local_names.get(tag)
+    if name is None:
+        name = _local_names[tag] = tag.rsplit('}', 1)[-1].lower() if isinstance(tag, str) else ''
+    return name
+
+def _fields(element):
+    """Maps the local name of each direct child to its stripped text (the first non-empty one wins)."""
+    fields = {}
+    for child in element:
+        text = child.text
+        if text:
+            text = text.strip()
+            if text:
+                fields.setdefault(_local_name(child.tag), text)
+    return fields
+
+def _absolute(base_url, link):
+    return link if link.startswith(('http://', 'https://')) else urljoin(base_url, link)
+
+def _atom_link(entry):
+    fallback = None
+    for child in entry:
+        if _local_name(child.tag) == 'link' and child.get('href'):
+            if child.get('rel', 'alternate') == 'alternate':
+                return child.get('href')
+            fallback = fallback or child.get('href')
+    return fallback
+
+def _title_from_url(url):
+    """'https://blog.example.com/2024/05/faster-json-parsing.html' -> 'faster json parsing', or None."""
+    path = url.split('://', 1)[-1].split('?', 1)[0].split('#', 1)[0].rstrip('/')
+    if '/' not in path:
+        return None # Only a host name
+    slug = unquote(path.rsplit('/', 1)[1]).rsplit('.', 1)[0]
+    title = ' '.join(_SLUG_SEPARATORS_RE.split(slug)).strip()
+    if len(title) < MIN_SLUG_TITLE or title.replace(' ', '').isdigit():
+        return None
+    return title
+
+_SLUG_SEPARATORS_RE = re.compile(r'[-_+]+')
+
+def _record(kind, element, base_url):
+    """Converts an RSS <item>, Atom <entry> or sitemap <url>/<sitemap> element into a record, or None."""
+    fields = _fields(element)
+    if kind == 'item': # RSS 2.0 and RSS 1.0 (RDF)
+        title = fields.get('title')
+        link = fields.get('link') or element.get(_RDF_ABOUT)
+        published = fields.get('pubdate') or fields.get('date') or fields.get('published') or fields.get('updated')
+    elif kind == 'entry': # Atom
+        title = fields.get('title')
+        link = _atom_link(element)
+        published = fields.get('published') or fields.get('updated')
+    elif kind == 'url': # Sitemap entry; Google News sitemaps also carry a title
+        link = fields.get('loc')
+        if not link:
+            return None
+        news = next((child for child in element if _local_name(child.tag) == 'news'), None)
+        news = _fields(news) if news is not None else {}
+        # Without a news title, one is made from the URL by _with_title, only for the entries kept
+        title = news.get('title')
+        published = news.get('publication_date') or fields.get('lastmod')
+    else: # Entry of a sitemap index
+        link = fields.get('loc')
+        return {'sitemap': _absolute(base_url, link), 'published': parse_date(fields.get('lastmod'))} if link else None
+    if not link or not (title or kind == 'url'):
+        return None
+    return {'title': ' '.join(title.split()) if title else None, 'link': _absolute(base_url, link),
+            'published': parse_date(published)}
+
+def _with_title(record):
+    """Fills in the title of a sitemap record from its URL; returns None if that gives no title."""
+    if record['title'] is None:
+        record['title'] = _title_from_url(record['link'])
+    return record if record['title'] else None
+
+def _iter_entry_elements(source):
+    """
+    Yields each entry element once its end tag was parsed, then removes it from
+    the tree, so memory stays flat on multi-MB sitemaps.
+    """
+    if hasattr(etree, 'LXML_VERSION'):
+        # lxml filters the entry tags in C and can find an element's parent
+        for _, element in etree.iterparse(source, events=('end',), tag=[f'{{*}}{tag}' for tag in ENTRY_TAGS]):
+            yield element
+            element.clear()
+            parent = element.getparent()
+            if parent is not None:
+                while element.getprevious() is not None:
+                    del parent[0]
+        return
+
+    ancestors = []
+    for event, element in etree.iterparse(source, events=('start', 'end')):
+        if event == 'start':
+            ancestors.append(element)
+            continue
+        ancestors.pop()
+        if _local_name(element.tag) in ENTRY_TAGS:
+            yield element
+            element.clear()
+            if ancestors:
+                ancestors[-1].remove(element)
+
+def _iter_entries(source, base_url):
+    """Yields (kind, record) for every entry; kind is the local name of the entry element."""
+    for element in _iter_entry_elements(source):
+        kind = _local_name(element.tag)
+        record = _record(kind, element, base_url)
+        if record is not None:
+            yield kind, record
+
+def iter_feed(source, base_url):
+    """
+    Incrementally parses an RSS, Atom or sitemap document from source (a file
+    object) and yields a {'title', 'link', 'published'} record per entry, or a
+    {'sitemap', 'published'} record per entry of a sitemap index. 'published'
+    is an ISO 8601 string or None. Each entry is removed from the tree once it
+    was read, so memory stays constant however long the document is.
+    Raises the parser's error (a SyntaxError subclass) on malformed XML.
+    """
+    for kind, record in _iter_entries(source, base_url):
+        if kind != 'url' or _with_title(record):
+            yield record
+
+def _newest_first(records, limit):
+    """The limit records with the latest 'published' dates; records without a date come last."""
+    return heapq.nlargest(limit, records, key=lambda record: record['published'] or '')
+
+def _newest_sitemap_entries(records, limit):
+    """
+    Like _newest_first for sitemap <url> records, but titles are only derived
+    (and untitled records dropped) for records that would enter the top limit.
+    """
+    heap = [] # (published, sequence, record); the oldest kept record is heap[0]
+    for sequence, record in enumerate(records):
+        key = record['published'] or ''
+        if len(heap) >= limit and key <= heap[0][0]:
+            continue
+        if _with_title(record) is None:
+            continue
+        if len(heap) < limit:
+            heapq.heappush(heap, (key, -sequence, record))
+        else:
+            heapq.heapreplace(heap, (key, -sequence, record))
+    return [record for _, _, record in sorted(heap, reverse=True)]
+
+def read_feed(url, limit, session=None, content=None, _depth=0):
+    """
+    Reads the feed or sitemap at url and returns up to limit article records.
+    Feed entries are taken in document order (feeds list the newest first);
+    for sitemaps, which are unordered, the limit most recently modified pages
+    are kept, and a sitemap index is followed into its newest child sitemaps.
+    The document is streamed from the network unless its bytes are passed as
+    content; gzipped documents (e.g. sitemap.xml.gz) are decompressed.
+    Raises one of FEED_ERRORS: requests.exceptions.RequestException on fetch
+    errors, the parser's error (a SyntaxError subclass) on malformed XML, and
+    OSError, EOFError or zlib.error on broken compressed data.
+    """
+    session = session or get_session()
+    with _metrics.timer('feed', host_of(url) if _metrics.enabled else None):
+        if content is not None:
+            return _read_entries(_gunzipped(io.BufferedReader(io.BytesIO(content))), url, limit, session, _depth)
+        with session.get(url, timeout=10, stream=True) as response:
+            response.raise_for_status()
+            response.raw.decode_content = True # Undo Content-Encoding (gzip/deflate) while streaming
+            response.raw.auto_close = False # Keep reads at the end of the body valid (for GzipFile)
+            return _read_entries(_gunzipped(io.BufferedReader(response.raw)), url, limit, session, _depth)
+
+def _gunzipped(source):
+    """
+    Wraps a buffered stream in a GzipFile if it starts with the gzip magic
+    bytes. A .gz file may or may not still be compressed once the
+    Content-Encoding was undone, so the bytes are checked rather than the URL.
+    """
+    return gzip.GzipFile(fileobj=source) if source.peek(2)[:2] == _GZIP_MAGIC else source
+
+def _read_entries(source, url, limit, session, depth):
+    entries = _iter_entries(source, url)
+    first = next(entries, None)
+    if first is None:
+        return []
+    kind = first[0]
+    records = (record for _, record in _chain(first, entries))
+    if kind == 'sitemap':
+        if depth > 0:
+            return [] # Nested sitemap indexes are not followed
+        results = []
+        for child in _newest_first(records, MAX_CHILD_SITEMAPS):
+            try:
+                results.extend(read_feed(child['sitemap'], limit, session, _depth=depth + 1))
+            except FEED_ERRORS:
+                continue # A missing or broken child sitemap; the others still count
+        return _newest_first(results, limit)
+    if kind == 'url':
+        return _newest_sitemap_entries(records, limit)
+    return list(islice(records, limit))
+
+def _chain(first, rest):
+    yield first
+    yield from rest
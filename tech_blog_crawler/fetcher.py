@@ -0,0 +1,252 @@
+import codecs
+import re
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from host_control import AdaptiveHTTPAdapter, THROTTLE_STATUS_CODES, get_controller
+from metrics import get_metrics, host_of
+
+_metrics = get_metrics()
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Referer': 'https://www.google.com/', # Some sites check this
+    'DNT': '1', # Do Not Track Request Header
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1',
+}
+
+# Connection pool tuning. POOL_MAXSIZE should be at least the number of worker
+# threads that may talk to the same host, otherwise connections get discarded.
+POOL_CONNECTIONS = 32 # Number of per-host pools kept alive
+POOL_MAXSIZE = 16 # Connections kept alive per host
+
+# Retry policy for transient failures (connection errors and 5xx responses)
+RETRY_TOTAL = 3
+RETRY_BACKOFF_FACTOR = 0.5 # Sleeps 0.5s, 1s, 2s between attempts
+RETRY_STATUS_CODES = (500, 502, 503, 504) # 429/503 go to the adaptive controller when it is used
+
+# Encoding resolution. Tiers are tried from cheapest to most expensive; the
+# statistical detector only runs when nothing else identifies the charset.
+ENCODING_SNIFF_BYTES = 4096 # How much of the body is searched for <meta charset>
+ENCODING_TIERS = ('header', 'bom', 'meta', 'utf-8', 'detected')
+ENCODING_STATS = {tier: 0 for tier in ENCODING_TIERS}
+
+# Byte order marks, UTF-32 first since its LE mark starts with the UTF-16 LE mark
+_BOMS = (
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+_META_CHARSET_RE = re.compile(rb'<meta[^>]+?charset\s*=\s*["\']?\s*([a-zA-Z0-9_:.\-]+)', re.IGNORECASE)
+_HEADER_CHARSET_RE = re.compile(r'charset\s*=\s*["\']?\s*([a-zA-Z0-9_:.\-]+)', re.IGNORECASE)
+
+# Labels that browsers decode with a superset codec (per the WHATWG Encoding standard)
+_ENCODING_ALIASES = {
+    'big5': 'big5hkscs',
+    'x-x-big5': 'big5hkscs',
+    'gb2312': 'gb18030',
+    'gbk': 'gb18030',
+    'iso-8859-1': 'cp1252',
+    'latin1': 'cp1252',
+    'us-ascii': 'cp1252',
+    'ascii': 'cp1252',
+    'shift-jis': 'cp932',
+    'shift_jis': 'cp932',
+    'x-sjis': 'cp932',
+}
+
+_encoding_stats_lock = threading.Lock()
+_default_session = None
+_default_session_lock = threading.Lock()
+
+def create_session(headers=None, pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE,
+                   retries=RETRY_TOTAL, backoff_factor=RETRY_BACKOFF_FACTOR, controller=None, adaptive=True):
+    """
+    Creates a requests.Session with pooled keep-alive connections, a retry/backoff
+    policy and the crawler's default headers.
+    With adaptive (the default), requests go through a host_control.AdaptiveController
+    (the shared one unless controller is given), which adapts per-host concurrency
+    and rate and retries 429/503 responses honoring Retry-After.
+    """
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS if headers is None else headers)
+
+    status_codes = RETRY_STATUS_CODES
+    if adaptive:
+        status_codes = tuple(code for code in status_codes if code not in THROTTLE_STATUS_CODES)
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=status_codes,
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        raise_on_status=False, # Let callers see the final response via raise_for_status()
+        # Otherwise urllib3 itself would retry 429/503 responses that carry a Retry-After
+        respect_retry_after_header=not adaptive,
+    )
+    if adaptive:
+        adapter = AdaptiveHTTPAdapter(controller or get_controller(), pool_connections=pool_connections,
+                                      pool_maxsize=pool_maxsize, max_retries=retry)
+    else:
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def get_session():
+    """Returns the crawler-wide shared session, creating it on first use."""
+    global _default_session
+    if _default_session is None:
+        with _default_session_lock:
+            if _default_session is None:
+                _default_session = create_session()
+    return _default_session
+
+def _normalize_encoding(label):
+    """Maps a charset label to a Python codec name, or None if it is unknown."""
+    if isinstance(label, bytes):
+        label = label.decode('ascii', errors='ignore')
+    label = label.strip().lower()
+    label = _ENCODING_ALIASES.get(label, label)
+    try:
+        return codecs.lookup(label).name
+    except LookupError:
+        return None
+
+def _detect_encoding(content):
+    """Statistical charset detection over the whole body (slow on large pages)."""
+    try:
+        from charset_normalizer import from_bytes
+    except ImportError:
+        return 'utf-8'
+    best = from_bytes(content).best()
+    return best.encoding if best else 'utf-8'
+
+def resolve_encoding(content, headers, partial=False):
+    """
+    Determines the character encoding of a page body using, in order: the
+    Content-Type charset, a byte order mark, a <meta charset> / http-equiv
+    declaration in the first ENCODING_SNIFF_BYTES bytes, a strict UTF-8 decode,
+    and only then statistical detection. With partial, content is only the
+    start of the body (e.g. the first streamed chunk), which may end in the
+    middle of a character.
+    Returns (encoding, tier) and counts the tier in ENCODING_STATS.
+    """
+    encoding, tier = None, None
+
+    match = _HEADER_CHARSET_RE.search(headers.get('Content-Type', '') or '')
+    if match:
+        encoding, tier = _normalize_encoding(match.group(1)), 'header'
+
+    if not encoding:
+        for bom, bom_encoding in _BOMS:
+            if content.startswith(bom):
+                encoding, tier = bom_encoding, 'bom'
+                break
+
+    if not encoding:
+        match = _META_CHARSET_RE.search(content[:ENCODING_SNIFF_BYTES])
+        if match:
+            encoding, tier = _normalize_encoding(match.group(1)), 'meta'
+            if encoding and encoding.startswith(('utf-16', 'utf-32')):
+                encoding = 'utf-8' # An ASCII-readable <meta> cannot really be UTF-16/32
+
+    if not encoding:
+        try:
+            if partial:
+                codecs.getincrementaldecoder('utf-8')().decode(content, final=False)
+            else:
+                content.decode('utf-8')
+            encoding, tier = 'utf-8', 'utf-8'
+        except UnicodeDecodeError:
+            encoding, tier = _detect_encoding(content), 'detected'
+
+    with _encoding_stats_lock:
+        ENCODING_STATS[tier] += 1
+    return encoding, tier
+
+def encoding_stats_summary():
+    """Returns a one-line description of which tier resolved each page's encoding."""
+    return "編碼判斷: " + ", ".join(f"{tier} {count}" for tier, count in ENCODING_STATS.items())
+
+def _record_fetch(response, start, host):
+    """
+    Records the timing of a finished request: 'fetch.ttfb' is the time from
+    sending it until the response headers arrived (including DNS and connect
+    for a new connection), 'fetch.body' the rest of the download. Time spent
+    queued by the host controller before sending is not part of either (see
+    host_control.AdaptiveHTTPAdapter); it is its own 'host_wait' stage, and
+    only 'fetch' covers all three.
+    """
+    if not _metrics.enabled:
+        return
+    total = time.perf_counter() - start
+    headers_at = min(response.elapsed.total_seconds(), total)
+    _metrics.observe('fetch', total, host)
+    _metrics.observe('fetch.ttfb', max(0.0, headers_at - getattr(response, 'wait_seconds', 0.0)), host)
+    _metrics.observe('fetch.body', total - headers_at, host)
+    _metrics.increment('pages', host=host)
+    _metrics.increment('bytes_downloaded', len(response.content), host)
+    if response.status_code == 304:
+        _metrics.increment('not_modified', host=host)
+
+def fetch_page(url, session=None, cache=None, timeout=10):
+    """
+    Fetches a page and returns a dictionary with its 'url', 'content' (bytes),
+    'headers', 'encoding' (see resolve_encoding), 'encoding_source' and
+    'not_modified' flag.
+
+    When an HttpCache is given the request is made conditional on the cached
+    validators; a 304 Not Modified answer is served from the cache with
+    'not_modified' set. Raises requests.exceptions.RequestException on failure.
+    """
+    session = session or get_session()
+    headers = cache.conditional_headers(url) if cache is not None else {}
+    host = host_of(url) if _metrics.enabled else None
+    start = time.perf_counter()
+    try:
+        response = session.get(url, headers=headers, timeout=timeout)
+    except requests.exceptions.RequestException:
+        _metrics.increment('fetch_errors', host=host)
+        raise
+
+    if response.status_code == 304 and cache is not None:
+        cached = cache.load(url)
+        if cached is not None:
+            _record_fetch(response, start, host)
+            body, entry = cached
+            return {
+                'url': url,
+                'content': body,
+                'headers': {'Content-Type': entry.get('content_type') or ''},
+                'encoding': entry.get('encoding'),
+                'encoding_source': 'cache',
+                'not_modified': True,
+            }
+        # The cached body vanished; fetch the page again without validators
+        response = session.get(url, timeout=timeout)
+
+    if not response.ok:
+        _metrics.increment('fetch_errors', host=host)
+    response.raise_for_status()
+    _record_fetch(response, start, host)
+    with _metrics.timer('encoding', host):
+        encoding, encoding_source = resolve_encoding(response.content, response.headers)
+    page = {
+        'url': url,
+        'content': response.content,
+        'headers': response.headers,
+        'encoding': encoding,
+        'encoding_source': encoding_source,
+        'not_modified': False,
+    }
+    if cache is not None:
+        cache.store(url, page['content'], response.headers, page['encoding'])
+    return page
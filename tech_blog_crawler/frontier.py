@@ -0,0 +1,266 @@
+import hashlib
+import math
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urljoin, urlsplit
+
+from fetcher import get_session
+from url_utils import normalize_url
+
+DEFAULT_MAX_DEPTH = 2 # Start pages are depth 0
+DEFAULT_MAX_PAGES = 50
+DEFAULT_CRAWL_DELAY = 1.0 # Seconds between two requests to the same host
+FRONTIER_WORKERS = 8
+
+# Links to these file types are never pages worth crawling
+SKIP_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.svg', '.pdf', '.zip', '.gz', '.mp3', '.mp4', '.css', '.js', '.xml')
+
+# Hints used to recognize links to further pages of an article listing
+PAGINATION_PATTERN = re.compile(r'(/page/\d+/?$|[?&](page|paged|p)=\d+)', re.IGNORECASE)
+PAGINATION_TEXT_HINTS = ('next', 'older', 'more posts', '下一頁', '較舊', '更多文章', '下一页', '更早')
+
+def _url_digest(url):
+    """Returns a compact 8-byte fingerprint of a (normalized) URL."""
+    return hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest()
+
+class CompactSeenSet:
+    """
+    Exact set of seen URLs that stores 8-byte digests instead of full URL strings.
+    Collisions are possible in theory but negligible below billions of URLs.
+    """
+    def __init__(self):
+        self._digests = set()
+        self._lock = threading.Lock()
+
+    def add(self, url):
+        """Adds url to the set. Returns True if it was not seen before."""
+        digest = _url_digest(url)
+        with self._lock:
+            if digest in self._digests:
+                return False
+            self._digests.add(digest)
+            return True
+
+    def __contains__(self, url):
+        return _url_digest(url) in self._digests
+
+    def __len__(self):
+        return len(self._digests)
+
+class BloomSeenSet:
+    """
+    Bloom filter backed seen-set with fixed memory for very large crawls.
+    May report an unseen URL as seen with probability error_rate, never the reverse.
+    """
+    def __init__(self, capacity, error_rate=0.001):
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def _positions(self, url):
+        # Double hashing: derive all k positions from two 64-bit hashes
+        digest = hashlib.blake2b(url.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, url):
+        """Adds url to the filter. Returns True if it was (probably) not seen before."""
+        positions = self._positions(url)
+        with self._lock:
+            new = False
+            for pos in positions:
+                byte, bit = divmod(pos, 8)
+                if not self._bits[byte] & (1 << bit):
+                    self._bits[byte] |= 1 << bit
+                    new = True
+            if new:
+                self._count += 1
+            return new
+
+    def __contains__(self, url):
+        return all(self._bits[pos // 8] & (1 << (pos % 8)) for pos in self._positions(url))
+
+    def __len__(self):
+        return self._count
+
+class HostScheduler:
+    """
+    Per-host politeness scheduler. Each host has its own FIFO queue, at most one
+    request in flight and a minimum delay between two requests.
+    """
+    def __init__(self, delay=DEFAULT_CRAWL_DELAY):
+        self.delay = delay
+        self._queues = {}
+        self._next_allowed = {}
+        self._busy = set()
+
+    def push(self, url, depth):
+        host = urlsplit(url).netloc
+        self._queues.setdefault(host, deque()).append((url, depth))
+
+    def pop_ready(self, now):
+        """Returns a (host, url, depth) that may be fetched now, or None."""
+        for host, queue in self._queues.items():
+            if queue and host not in self._busy and self._next_allowed.get(host, 0) <= now:
+                self._busy.add(host)
+                url, depth = queue.popleft()
+                return host, url, depth
+        return None
+
+    def release(self, host, now):
+        """Marks the in-flight request to host as finished and starts its delay."""
+        self._busy.discard(host)
+        self._next_allowed[host] = now + self.delay
+
+    def has_pending(self):
+        return any(self._queues.values())
+
+    def next_wake(self, now):
+        """Seconds until the earliest idle host with queued URLs becomes ready."""
+        waits = [self._next_allowed.get(host, 0) - now
+                 for host, queue in self._queues.items() if queue and host not in self._busy]
+        return max(0.0, min(waits)) if waits else None
+
+def _host_key(host):
+    """Treats 'www.example.com' and 'example.com' as the same site."""
+    host = host.lower()
+    return host[4:] if host.startswith('www.') else host
+
+def is_pagination_link(link_tag, absolute_url):
+    """Guesses whether a link points to the next/older page of a listing."""
+    rel = link_tag.get('rel') or []
+    if 'next' in rel:
+        return True
+    if PAGINATION_PATTERN.search(absolute_url):
+        return True
+    text = link_tag.get_text(strip=True).lower()
+    return any(hint in text for hint in PAGINATION_TEXT_HINTS)
+
+def discover_links(soup, page_url, allowed_hosts, pagination_only=False):
+    """
+    Returns the normalized same-domain page links found in a parsed page, with
+    pagination links ("next", "older posts", /page/2, ...) first so archives are
+    reached before the page budget runs out.
+    """
+    pagination_links = []
+    links = []
+    for link_tag in soup.find_all('a', href=True):
+        href = link_tag['href'].strip()
+        if not href or href.startswith(('#', 'mailto:', 'javascript:', 'tel:')):
+            continue
+        absolute = urljoin(page_url, href)
+        parts = urlsplit(absolute)
+        if parts.scheme not in ('http', 'https') or _host_key(parts.netloc) not in allowed_hosts:
+            continue
+        if parts.path.lower().endswith(SKIP_EXTENSIONS):
+            continue
+        if is_pagination_link(link_tag, absolute):
+            pagination_links.append(normalize_url(absolute))
+        elif not pagination_only:
+            links.append(normalize_url(absolute))
+    return pagination_links + links
+
+def crawl_site(start_urls, max_depth=DEFAULT_MAX_DEPTH, max_pages=DEFAULT_MAX_PAGES, delay=DEFAULT_CRAWL_DELAY,
+               workers=FRONTIER_WORKERS, session=None, extract=None, dedup_key='link', seen=None, pagination_only=False, cache=None, only=None, on_page=None,
+               fetch_soup=None):
+    """
+    Breadth-first crawl starting from start_urls, following links on the same
+    domain(s) up to max_depth and max_pages, and running extract(soup, url) on
+    every fetched page (crawler.extract_articles by default).
+
+    Different hosts are crawled concurrently while each host gets at most one
+    request at a time, spaced by delay seconds. seen defaults to a
+    CompactSeenSet; pass a BloomSeenSet for very large crawls. With
+    pagination_only, only "next page"/"older posts" style links are followed.
+    An optional HttpCache makes unchanged pages cost a 304 instead of a download.
+    only is the SoupStrainer used to parse pages (crawler.ARTICLE_STRAINER by
+    default); it must keep <a> tags for link discovery. Pages are read with
+    fetch_soup(url, session, cache, only), crawler.fetch_soup by default;
+    crawler.run_frontier_batch passes its own functions, so the settings of a
+    crawler.py run as a script (e.g. --parser) apply, which a second imported
+    copy of crawler would not see.
+    on_page(url, records, error) is called as each page finishes; a page that
+    cannot be fetched or extracted is reported with its error and skipped.
+    Returns the list of extracted records, deduplicated by their dedup_key field.
+    """
+    if fetch_soup is None or extract is None or only is None:
+        import crawler
+        fetch_soup = fetch_soup or crawler.fetch_soup
+        extract = extract or crawler.extract_articles
+        only = only if only is not None else crawler.ARTICLE_STRAINER
+    session = session or get_session()
+    seen = seen if seen is not None else CompactSeenSet()
+    scheduler = HostScheduler(delay)
+    allowed_hosts = set()
+
+    for url in start_urls:
+        url = normalize_url(url)
+        allowed_hosts.add(_host_key(urlsplit(url).netloc))
+        if seen.add(url):
+            scheduler.push(url, 0)
+
+    def fetch_page(url, depth):
+        soup = fetch_soup(url, session, cache, only)
+        records = extract(soup, url)
+        links = discover_links(soup, url, allowed_hosts, pagination_only) if depth < max_depth else []
+        return records, links
+
+    results = []
+    seen_links = set()
+    pages_started = 0
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        in_flight = {}
+        while True:
+            now = time.monotonic()
+            while pages_started < max_pages and len(in_flight) < workers:
+                ready = scheduler.pop_ready(now)
+                if ready is None:
+                    break
+                host, url, depth = ready
+                in_flight[executor.submit(fetch_page, url, depth)] = (host, url, depth)
+                pages_started += 1
+
+            if not in_flight:
+                if pages_started >= max_pages or not scheduler.has_pending():
+                    break
+                # Every queued host is still inside its politeness delay
+                time.sleep(scheduler.next_wake(now) or 0.05)
+                continue
+
+            # Wake up early only if an idle host may become ready while workers are free
+            can_start = pages_started < max_pages and len(in_flight) < workers
+            timeout = scheduler.next_wake(now) if can_start else None
+            done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                host, url, depth = in_flight.pop(future)
+                scheduler.release(host, time.monotonic())
+                try:
+                    records, links = future.result()
+                except Exception as e: # A fetch or extraction error only costs this page
+                    if on_page:
+                        on_page(url, [], str(e) or type(e).__name__)
+                    continue
+
+                new_records = []
+                for record in records:
+                    key = normalize_url(record[dedup_key]) if record.get(dedup_key) else None
+                    if key and key in seen_links:
+                        continue
+                    if key:
+                        seen_links.add(key)
+                    new_records.append(record)
+                results.extend(new_records)
+                if on_page:
+                    on_page(url, new_records, None)
+
+                for link in links:
+                    if seen.add(link):
+                        scheduler.push(link, depth + 1)
+
+    return results
@@ -0,0 +1,311 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import get_metrics
+
+# AIMD concurrency: each host starts with a small number of parallel requests,
+# doubles them per window of successful requests until it is first throttled
+# (slow start), then gains about one slot per window and halves on throttling.
+INITIAL_CONCURRENCY = 2
+MAX_CONCURRENCY = 16 # Matches fetcher.POOL_MAXSIZE, the connections kept per host
+
+# Token bucket: request rate per host, adapted the same way
+INITIAL_RATE = 10.0 # Requests per second
+MAX_RATE = 100.0
+MIN_RATE = 0.2
+RATE_INCREASE = 1.0 # Requests per second gained per second of successful requests
+DECREASE_COOLDOWN = 1.0 # Throttles within this many seconds of a decrease count as one
+
+# Throttling responses (429 Too Many Requests, 503 Service Unavailable)
+THROTTLE_STATUS_CODES = (429, 503)
+THROTTLE_RETRIES = 4
+BACKOFF_BASE = 1.0 # Seconds; doubled per consecutive throttle, with jitter
+BACKOFF_MAX = 60.0
+MAX_RETRY_AFTER = 300.0 # Longer Retry-After values are not waited for
+
+_metrics = get_metrics()
+
+def parse_retry_after(value, now=None):
+    """Returns the delay in seconds of a Retry-After header (seconds or HTTP date), or None."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - (now if now is not None else time.time()))
+
+def parse_crawl_delay(robots_txt, user_agent=None):
+    """
+    Returns the Crawl-delay in seconds that robots.txt sets for user_agent (a
+    group naming a token of it) or for '*', or None. Unlike urllib.robotparser,
+    fractional delays such as 0.5 are accepted.
+    """
+    agent = (user_agent or '').lower()
+    delays = {} # 'specific' / 'default' -> delay
+    group_agents, in_rules = [], False
+    for line in robots_txt.splitlines():
+        key, _, value = line.split('#', 1)[0].partition(':')
+        key, value = key.strip().lower(), value.strip()
+        if key == 'user-agent':
+            if in_rules:
+                group_agents, in_rules = [], False
+            group_agents.append(value.lower())
+        elif key:
+            in_rules = True
+            if key == 'crawl-delay':
+                try:
+                    delay = float(value)
+                except ValueError:
+                    continue
+                for name in group_agents:
+                    if name == '*':
+                        delays.setdefault('default', delay)
+                    elif agent and name.split('/')[0] in agent:
+                        delays.setdefault('specific', delay)
+    return delays.get('specific', delays.get('default'))
+
+class TokenBucket:
+    """Token bucket whose rate can be changed while in use. Tokens may be reserved ahead."""
+    def __init__(self, rate, burst=1.0):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._last = time.monotonic()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def reserve(self, now):
+        """Takes one token and returns how many seconds the caller must wait before using it."""
+        self._refill(now)
+        self._tokens -= 1
+        return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def reconfigure(self, rate, burst, now=None):
+        """Switches to a new rate and burst, keeping the tokens earned so far up to the new burst."""
+        self._refill(time.monotonic() if now is None else now)
+        self.rate = rate
+        self.burst = burst
+        self._tokens = min(self._tokens, burst)
+
+class HostState:
+    """Adaptive limits of one host. All fields are guarded by the controller's condition."""
+    def __init__(self, max_concurrency=MAX_CONCURRENCY, max_rate=MAX_RATE):
+        self.max_concurrency = max_concurrency
+        self.max_rate = max_rate
+        self.limit = float(min(INITIAL_CONCURRENCY, max_concurrency))
+        self.bucket = TokenBucket(min(INITIAL_RATE, max_rate), burst=self.limit)
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        self.consecutive_throttles = 0
+        self.last_decrease = 0.0
+        self.slow_start = True
+        self.throttled = 0
+        self.requests = 0
+        self.robots_checked = None # threading.Event set once robots.txt was read
+
+class AdaptiveController:
+    """
+    Per-host adaptive concurrency and rate control. Successful responses grow
+    a host's concurrency limit and request rate additively; 429/503 responses
+    and connection failures halve them, and 429/503 responses also pause the
+    host for the Retry-After delay or a jittered exponential backoff. Each host
+    converges on the highest rate it tolerates. With respect_robots, a
+    robots.txt Crawl-delay caps the host at one request per delay.
+    """
+    def __init__(self, respect_robots=False, max_concurrency=MAX_CONCURRENCY, max_rate=MAX_RATE):
+        self.respect_robots = respect_robots
+        self.max_concurrency = max_concurrency
+        self.max_rate = max_rate
+        self._hosts = {}
+        self._condition = threading.Condition()
+
+    def _state(self, host):
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = HostState(self.max_concurrency, self.max_rate)
+        return state
+
+    def acquire(self, host):
+        """
+        Blocks until a request to host may be sent: a free slot, no backoff pause
+        and a rate token. The time spent waiting is recorded as the 'host_wait'
+        stage and returned, in seconds.
+        """
+        start = time.perf_counter()
+        with self._condition:
+            state = self._state(host)
+            while True:
+                now = time.monotonic()
+                if now < state.blocked_until:
+                    self._condition.wait(state.blocked_until - now)
+                elif state.in_flight >= int(state.limit):
+                    self._condition.wait()
+                else:
+                    break
+            state.in_flight += 1
+            state.requests += 1
+            wait = state.bucket.reserve(now)
+        if wait > 0:
+            time.sleep(wait)
+        waited = time.perf_counter() - start
+        _metrics.observe('host_wait', waited, host)
+        return waited
+
+    def release(self, host, outcome, retry_after=None):
+        """
+        Ends a request started with acquire. outcome is 'ok' (grow the limits),
+        'throttled' or 'error' (shrink them and pause the host) or 'neutral'.
+        """
+        with self._condition:
+            state = self._state(host)
+            state.in_flight -= 1
+            now = time.monotonic()
+            if outcome == 'ok':
+                state.consecutive_throttles = 0
+                if state.slow_start:
+                    # +1 per response doubles the limit per window and the rate per second
+                    state.limit = min(state.max_concurrency, state.limit + 1)
+                    state.bucket.rate = min(state.max_rate, state.bucket.rate + 1)
+                else:
+                    # Additive increase: about +1 slot per window and +RATE_INCREASE per second
+                    state.limit = min(state.max_concurrency, state.limit + 1 / state.limit)
+                    state.bucket.rate = min(state.max_rate, state.bucket.rate + RATE_INCREASE / state.bucket.rate)
+            elif outcome in ('throttled', 'error'):
+                # Requests that were already in flight often fail together; halve only once for them
+                if now - state.last_decrease >= DECREASE_COOLDOWN:
+                    state.last_decrease = now
+                    state.slow_start = False
+                    state.limit = max(1.0, state.limit / 2)
+                    state.bucket.rate = max(MIN_RATE, state.bucket.rate / 2)
+                if outcome == 'throttled':
+                    state.throttled += 1
+                    state.consecutive_throttles += 1
+                    backoff = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (state.consecutive_throttles - 1))
+                    pause = retry_after if retry_after is not None else backoff * random.uniform(0.5, 1.5)
+                    # Longer Retry-After values are not retried (see AdaptiveHTTPAdapter.send),
+                    # so they must not park every other request to the host either
+                    pause = min(pause, MAX_RETRY_AFTER)
+                    state.blocked_until = max(state.blocked_until, now + pause)
+            state.bucket.burst = max(1.0, state.limit)
+            self._condition.notify_all()
+
+    def set_crawl_delay(self, host, delay):
+        """Limits host to one request every delay seconds."""
+        with self._condition:
+            state = self._state(host)
+            state.max_concurrency = 1
+            state.limit = 1.0
+            state.max_rate = min(state.max_rate, 1 / delay)
+            state.bucket.reconfigure(min(state.bucket.rate, state.max_rate), 1.0)
+
+    def check_robots(self, adapter, scheme, host, user_agent=None, timeout=10):
+        """
+        Reads the host's robots.txt once (through adapter, bypassing the
+        controller) and applies its Crawl-delay for user_agent, if any. Other
+        requests to the host wait until this is done.
+        """
+        with self._condition:
+            state = self._state(host)
+            checked = state.robots_checked
+            if checked is None:
+                state.robots_checked = threading.Event()
+        if checked is not None:
+            checked.wait()
+            return
+        try:
+            self._read_robots(adapter, scheme, host, user_agent, timeout)
+        finally:
+            state.robots_checked.set()
+
+    def _read_robots(self, adapter, scheme, host, user_agent, timeout):
+        headers = {'User-Agent': user_agent} if user_agent else {}
+        request = requests.Request('GET', f"{scheme}://{host}/robots.txt", headers=headers).prepare()
+        try:
+            response = HTTPAdapter.send(adapter, request, timeout=timeout)
+        except requests.exceptions.RequestException:
+            return
+        if response.status_code != 200:
+            return
+        delay = parse_crawl_delay(response.text, user_agent)
+        if delay:
+            self.set_crawl_delay(host, float(delay))
+
+    def summary(self):
+        """One line per host that was throttled, with the limits it converged on."""
+        with self._condition:
+            lines = [f"  {host}: 被限流 {state.throttled} 次, 目前並行上限 {int(state.limit)}, "
+                     f"速率 {state.bucket.rate:.1f} 次/秒 (共 {state.requests} 次請求)"
+                     for host, state in sorted(self._hosts.items()) if state.throttled]
+        return "主機流量控制:\n" + "\n".join(lines) if lines else ""
+
+class AdaptiveHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that routes every request through an AdaptiveController and
+    retries 429/503 responses after the host's pause, up to throttle_retries times.
+    The concurrency slot is held until the response headers have arrived.
+    requests measures response.elapsed around this whole method, so the time
+    spent before the returned attempt was sent (waiting for the controller,
+    throttled attempts and their pauses) is set as response.wait_seconds.
+    """
+    def __init__(self, controller, throttle_retries=THROTTLE_RETRIES, **kwargs):
+        self.controller = controller
+        self.throttle_retries = throttle_retries
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        start = time.perf_counter()
+        parts = urlsplit(request.url)
+        host = parts.netloc
+        if self.controller.respect_robots:
+            self.controller.check_robots(self, parts.scheme, host, request.headers.get('User-Agent'))
+        retries = self.throttle_retries if request.method in ('GET', 'HEAD') else 0
+
+        for attempt in range(retries + 1):
+            self.controller.acquire(host)
+            sent = time.perf_counter()
+            try:
+                response = super().send(request, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                self.controller.release(host, 'error')
+                raise
+            except BaseException:
+                # Not a sign of overload (e.g. an invalid header or Ctrl+C), but the slot must be freed
+                self.controller.release(host, 'neutral')
+                raise
+
+            response.wait_seconds = sent - start
+            if response.status_code not in THROTTLE_STATUS_CODES:
+                self.controller.release(host, 'ok' if response.status_code < 500 else 'neutral')
+                return response
+
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            self.controller.release(host, 'throttled', retry_after)
+            _metrics.increment('throttled', host=host)
+            if attempt == retries or (retry_after is not None and retry_after > MAX_RETRY_AFTER):
+                return response # The caller's raise_for_status() reports it
+            response.close()
+        return response
+
+_default_controller = None
+_default_controller_lock = threading.Lock()
+
+def get_controller():
+    """Returns the controller shared by all sessions created by fetcher.create_session."""
+    global _default_controller
+    if _default_controller is None:
+        with _default_controller_lock:
+            if _default_controller is None:
+                _default_controller = AdaptiveController()
+    return _default_controller
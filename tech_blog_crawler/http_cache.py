@@ -0,0 +1,187 @@
+import atexit
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+DEFAULT_CACHE_MAX_BYTES = 200 * 1024 * 1024 # 200 MB of cached page bodies
+
+def default_cache_dir():
+    """Returns the 'dist/cache' folder next to the other crawler output."""
+    return os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'dist', 'cache'))
+
+class HttpCache:
+    """
+    Persistent on-disk cache of page responses.
+
+    Each entry keeps the response body, its ETag / Last-Modified validators and
+    the extraction results computed from it, so that a 304 Not Modified answer
+    can skip both the download and the parse. Bodies are evicted least recently
+    used first once their total size exceeds max_bytes.
+    """
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.stats = {'hits': 0, 'misses': 0, 'extraction_hits': 0, 'evictions': 0}
+        self._index_path = os.path.join(self.cache_dir, 'index.json')
+        self._entries = OrderedDict() # key -> entry, least recently used first
+        self._total_bytes = 0
+        self._dirty = False
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self._index_path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except (IOError, ValueError):
+            return
+        for key, entry in entries:
+            if os.path.exists(self._body_path(key)):
+                self._entries[key] = entry
+                self._total_bytes += entry.get('size', 0)
+
+    def save(self):
+        """Writes the index to disk if it changed since the last save."""
+        with self._lock:
+            if not self._dirty:
+                return
+            tmp_path = self._index_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(list(self._entries.items()), f, ensure_ascii=False)
+            os.replace(tmp_path, self._index_path)
+            self._dirty = False
+
+    @staticmethod
+    def _key(url):
+        return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+    def _body_path(self, key):
+        return os.path.join(self.cache_dir, key + '.body')
+
+    def conditional_headers(self, url):
+        """Returns the If-None-Match / If-Modified-Since headers for a cached URL."""
+        entry = self._entries.get(self._key(url))
+        if not entry:
+            return {}
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def load(self, url):
+        """
+        Returns (body, entry) for a cached URL after a 304 response, marking it as
+        recently used, or None if the body is gone.
+        """
+        key = self._key(url)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self._dirty = True
+        try:
+            with open(self._body_path(key), 'rb') as f:
+                body = f.read()
+        except IOError:
+            return None
+        with self._lock:
+            self.stats['hits'] += 1
+        return body, entry
+
+    def store(self, url, body, headers, encoding=None):
+        """Stores a 200 response body with its validators, evicting old entries if needed."""
+        with self._lock:
+            self.stats['misses'] += 1
+        if 'no-store' in headers.get('Cache-Control', '').lower():
+            return
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+        if not etag and not last_modified:
+            return # Without validators the entry could never be revalidated
+        if len(body) > self.max_bytes:
+            return
+
+        key = self._key(url)
+        with open(self._body_path(key), 'wb') as f:
+            f.write(body)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old:
+                self._total_bytes -= old.get('size', 0)
+            self._entries[key] = {
+                'url': url,
+                'etag': etag,
+                'last_modified': last_modified,
+                'content_type': headers.get('Content-Type'),
+                'encoding': encoding,
+                'size': len(body),
+                'extracted': {},
+            }
+            self._total_bytes += len(body)
+            self._evict()
+            self._dirty = True
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and self._entries:
+            key, entry = self._entries.popitem(last=False)
+            self._total_bytes -= entry.get('size', 0)
+            self.stats['evictions'] += 1
+            try:
+                os.remove(self._body_path(key))
+            except OSError:
+                pass
+
+    def get_extracted(self, url, kind, version=None):
+        """
+        Returns the cached extraction result of the given kind (e.g. 'articles'),
+        or None if there is none or it was made by another version of the
+        extractor (see store_extracted).
+        """
+        entry = self._entries.get(self._key(url))
+        if entry is None:
+            return None
+        cached = entry.get('extracted', {}).get(kind)
+        # Entries written before results were versioned hold a bare list
+        if not isinstance(cached, dict) or cached.get('version') != version:
+            return None
+        with self._lock:
+            self.stats['extraction_hits'] += 1
+        return cached['records']
+
+    def store_extracted(self, url, kind, records, version=None):
+        """
+        Attaches an extraction result to a cached URL. version identifies what
+        produced it (the extractor and any site rule it applied): the result is
+        only reused by get_extracted with the same version.
+        """
+        with self._lock:
+            entry = self._entries.get(self._key(url))
+            if entry is not None:
+                entry.setdefault('extracted', {})[kind] = {'version': version, 'records': records}
+                self._dirty = True
+
+    def summary(self):
+        """Returns a one-line description of the cache counters."""
+        s = self.stats
+        return (f"快取: 命中 {s['hits']} 次 (其中 {s['extraction_hits']} 次重用解析結果), "
+                f"未命中 {s['misses']} 次, 淘汰 {s['evictions']} 筆, "
+                f"共 {len(self._entries)} 筆 / {self._total_bytes / (1024 * 1024):.1f} MB")
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def get_cache():
+    """Returns the shared cache under dist/cache, creating it on first use."""
+    global _default_cache
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = HttpCache()
+                atexit.register(_default_cache.save)
+    return _default_cache
@@ -0,0 +1,130 @@
+import hashlib
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+from datetime import datetime
+
+import requests
+
+def default_store_dir():
+    """Returns the 'dist/image/store' folder that holds every downloaded image once."""
+    return os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'dist', 'image', 'store'))
+
+class ImageStore:
+    """
+    Content-addressed image store. Each distinct image is saved once under its
+    SHA-256 digest, and a persistent URL -> digest index lets images that were
+    already downloaded in an earlier run be skipped entirely. Per-run folders
+    are filled with hardlinks to the stored files.
+    """
+    def __init__(self, root=None):
+        self.root = root or default_store_dir()
+        os.makedirs(self.root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(self.root, 'index.sqlite3'), check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS images (
+                url TEXT PRIMARY KEY,
+                digest TEXT NOT NULL,
+                etag TEXT,
+                content_length INTEGER,
+                content_type TEXT,
+                updated_at TEXT
+            )""")
+        self._db.commit()
+
+    def blob_path(self, digest):
+        """Path of the stored file for a digest, sharded by its first two characters."""
+        return os.path.join(self.root, digest[:2], digest)
+
+    def lookup(self, url):
+        """Returns the index entry of a URL whose file is still present, or None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT digest, etag, content_length, content_type FROM images WHERE url = ?", (url,)).fetchone()
+        if row is None or not os.path.exists(self.blob_path(row[0])):
+            return None
+        return {'digest': row[0], 'etag': row[1], 'content_length': row[2], 'content_type': row[3]}
+
+    def is_fresh(self, url, entry, session, timeout=15):
+        """
+        Revalidates a known URL with a HEAD request. The image is considered
+        unchanged if its ETag, or failing that its Content-Length, still matches.
+        """
+        try:
+            response = session.head(url, timeout=timeout, allow_redirects=True)
+            response.raise_for_status()
+        except requests.exceptions.RequestException:
+            return False
+        etag = response.headers.get('ETag')
+        if etag and entry['etag']:
+            return etag == entry['etag']
+        content_length = (response.headers.get('Content-Length') or '').strip()
+        if not content_length.isdigit() or entry['content_length'] is None:
+            return False # Missing or malformed; download the image again
+        return int(content_length) == entry['content_length']
+
+    def ingest(self, url, response, chunk_size=8192):
+        """
+        Streams an image response into the store, hashing it on the way.
+        Returns (digest, bytes_written, is_new) where is_new is False when the
+        same content was already stored under another URL.
+        """
+        sha256 = hashlib.sha256()
+        written = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    f.write(chunk)
+                    sha256.update(chunk)
+                    written += len(chunk)
+            digest = sha256.hexdigest()
+            blob_path = self.blob_path(digest)
+            is_new = not os.path.exists(blob_path)
+            if is_new:
+                os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                os.chmod(tmp_path, 0o644) # mkstemp creates owner-only files
+                os.replace(tmp_path, blob_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        # is_fresh compares this with a HEAD Content-Length, which counts the encoded
+        # (e.g. gzip) bytes, so keep the header rather than the decoded size
+        content_length = (response.headers.get('Content-Length') or '').strip()
+        content_length = int(content_length) if content_length.isdigit() else written
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO images (url, digest, etag, content_length, content_type, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (url, digest, response.headers.get('ETag'), content_length, response.headers.get('Content-Type'),
+                 datetime.now().isoformat(timespec='seconds')))
+            self._db.commit()
+        return digest, written, is_new
+
+    def link_into(self, digest, dest_path):
+        """Places a stored image at dest_path as a hardlink, copying if links are not supported."""
+        if os.path.exists(dest_path):
+            os.remove(dest_path)
+        try:
+            os.link(self.blob_path(digest), dest_path)
+        except OSError:
+            shutil.copyfile(self.blob_path(digest), dest_path)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+def get_image_store():
+    """Returns the shared image store under dist/image/store, creating it on first use."""
+    global _default_store
+    if _default_store is None:
+        with _default_store_lock:
+            if _default_store is None:
+                _default_store = ImageStore()
+    return _default_store
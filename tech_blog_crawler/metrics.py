@@ -0,0 +1,207 @@
+import atexit
+import json
+import os
+import random
+import sys
+import threading
+import time
+from urllib.parse import urlparse
+
+METRICS_ENV = 'CRAWLER_METRICS' # Set to 1 to collect metrics, or to a .jsonl/.prom path to also export them
+MAX_SAMPLES = 10000 # Per stage and host; beyond this a uniform random sample is kept
+PERCENTILES = (50, 90, 99)
+
+def host_of(url):
+    return urlparse(url).netloc or None
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class _NullTimer:
+    """Returned by timer() while metrics are disabled, so timing a block costs almost nothing."""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+class _Timer:
+    def __init__(self, metrics, stage, host):
+        self.metrics = metrics
+        self.stage = stage
+        self.host = host
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.observe(self.stage, time.perf_counter() - self.start, self.host)
+        return False
+
+class Metrics:
+    """
+    Collects durations per (stage, host) and counters per (name, host).
+    Nothing is recorded until enable() is called. Durations are summarized as
+    percentiles and can be exported as JSON lines or Prometheus text format.
+    """
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._series = {} # (stage, host) -> [count, total seconds, max seconds, samples]
+        self._counters = {} # (name, host) -> value
+        self._rng = random.Random(0)
+        self.export_path = None
+        self._report_registered = False
+
+    def enable(self, report=False, export_path=None):
+        """
+        Starts recording. With report, the summary is printed to stderr when
+        the program exits; with export_path, the metrics are also written there.
+        """
+        self.enabled = True
+        if export_path:
+            self.export_path = export_path
+        if (report or export_path) and not self._report_registered:
+            self._report_registered = True
+            atexit.register(self._report)
+
+    def disable(self):
+        self.enabled = False
+
+    def _report(self):
+        if not self._series and not self._counters:
+            return
+        print(self.summary(), file=sys.stderr)
+        if self.export_path:
+            try:
+                self.export(self.export_path)
+                print(f"效能統計已匯出至: {self.export_path}", file=sys.stderr)
+            except IOError as e:
+                print(f"匯出效能統計時發生錯誤: {e}", file=sys.stderr)
+
+    def timer(self, stage, host=None):
+        """Context manager that records how long its block took under stage and host."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, stage, host)
+
+    def observe(self, stage, seconds, host=None):
+        if not self.enabled:
+            return
+        with self._lock:
+            series = self._series.get((stage, host))
+            if series is None:
+                series = self._series[(stage, host)] = [0, 0.0, 0.0, []]
+            series[0] += 1
+            series[1] += seconds
+            series[2] = max(series[2], seconds)
+            samples = series[3]
+            if len(samples) < MAX_SAMPLES:
+                samples.append(seconds)
+            else:
+                # Reservoir sampling keeps the percentiles unbiased with bounded memory
+                slot = self._rng.randrange(series[0])
+                if slot < MAX_SAMPLES:
+                    samples[slot] = seconds
+
+    def increment(self, name, value=1, host=None):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[(name, host)] = self._counters.get((name, host), 0) + value
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+            self._counters.clear()
+
+    def stats(self):
+        """Returns a list of per-(stage, host) summaries, sorted by stage and host."""
+        with self._lock:
+            items = [(key, series[0], series[1], series[2], sorted(series[3])) for key, series in self._series.items()]
+        stats = []
+        for (stage, host), count, total, maximum, samples in sorted(items, key=lambda item: (item[0][0], item[0][1] or '')):
+            entry = {'stage': stage, 'host': host, 'count': count, 'sum': total, 'max': maximum}
+            for p in PERCENTILES:
+                # Nearest-rank percentile
+                entry[f'p{p}'] = samples[min(len(samples) - 1, max(0, -(-p * len(samples) // 100) - 1))]
+            stats.append(entry)
+        return stats
+
+    def counters(self):
+        with self._lock:
+            return [{'name': name, 'host': host, 'value': value}
+                    for (name, host), value in sorted(self._counters.items(), key=lambda item: (item[0][0], item[0][1] or ''))]
+
+    def summary(self):
+        """Human-readable table of the recorded stages and counters."""
+        lines = ["效能統計 (毫秒):",
+                 f"  {'stage':<18} {'host':<28} {'count':>6} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8} {'total s':>8}"]
+        for entry in self.stats():
+            lines.append(f"  {entry['stage']:<18} {(entry['host'] or '-')[:28]:<28} {entry['count']:>6} "
+                         f"{entry['p50'] * 1000:>8.1f} {entry['p90'] * 1000:>8.1f} {entry['p99'] * 1000:>8.1f} "
+                         f"{entry['max'] * 1000:>8.1f} {entry['sum']:>8.2f}")
+        for counter in self.counters():
+            lines.append(f"  {counter['name']:<18} {(counter['host'] or '-')[:28]:<28} {counter['value']:>6}")
+        return "\n".join(lines)
+
+    def to_jsonl(self):
+        records = [dict(entry, type='timing') for entry in self.stats()]
+        records += [dict(counter, type='counter') for counter in self.counters()]
+        return "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+
+    def to_prometheus(self):
+        """Prometheus text exposition format: one summary for the stages, one counter per name."""
+        def labels(**values):
+            parts = [f'{key}="{_escape_label(value)}"' for key, value in values.items() if value is not None]
+            return "{" + ",".join(parts) + "}" if parts else ""
+
+        lines = ["# HELP crawler_stage_seconds Time spent per crawl stage.", "# TYPE crawler_stage_seconds summary"]
+        for entry in self.stats():
+            for p in PERCENTILES:
+                lines.append(f"crawler_stage_seconds{labels(stage=entry['stage'], host=entry['host'], quantile=p / 100)} {entry[f'p{p}']:.6f}")
+            lines.append(f"crawler_stage_seconds_sum{labels(stage=entry['stage'], host=entry['host'])} {entry['sum']:.6f}")
+            lines.append(f"crawler_stage_seconds_count{labels(stage=entry['stage'], host=entry['host'])} {entry['count']}")
+        names = sorted({counter['name'] for counter in self.counters()})
+        for name in names:
+            metric = f"crawler_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            for counter in self.counters():
+                if counter['name'] == name:
+                    lines.append(f"{metric}{labels(host=counter['host'])} {counter['value']}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, path):
+        """Writes the metrics to path: Prometheus text format for .prom/.txt, JSON lines otherwise."""
+        text = self.to_prometheus() if path.lower().endswith(('.prom', '.txt')) else self.to_jsonl()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+_default_metrics = Metrics()
+
+def get_metrics():
+    """Returns the shared Metrics instance used by the crawler and analyzer."""
+    return _default_metrics
+
+def timer(stage, host=None):
+    return _default_metrics.timer(stage, host)
+
+def observe(stage, seconds, host=None):
+    _default_metrics.observe(stage, seconds, host)
+
+def increment(name, value=1, host=None):
+    _default_metrics.increment(name, value, host)
+
+def enable_from_env():
+    """
+    Enables the shared metrics when CRAWLER_METRICS is set: '1' prints the
+    summary to stderr at exit, a file path also exports the metrics there.
+    """
+    setting = os.environ.get(METRICS_ENV, '').strip()
+    if not setting or setting.lower() in ('0', 'false', 'no'):
+        return
+    _default_metrics.enable(report=True, export_path=None if setting.lower() in ('1', 'true', 'yes') else setting)
@@ -0,0 +1,161 @@
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from metrics import get_metrics, host_of
+from site_rules import SiteRules, domain_of, get_site_rules, set_site_rules
+
+PARSE_BATCH_SIZE = 4 # Pages sent to a worker process at once, amortizing the IPC round trip
+PARSE_BATCH_LINGER = 0.005 # Seconds a partial batch waits for more pages before it is sent
+BATCHES_PER_WORKER = 2 # Batches in flight per worker; further pages wait in the bounded queue
+
+_metrics = get_metrics()
+
+def default_parse_workers():
+    """One parse worker per CPU core."""
+    return os.cpu_count() or 1
+
+# --- Worker process side ---
+_run_extractors = None
+
+def _init_worker(parser, rules_path):
+    global _run_extractors
+    import crawler
+    if parser:
+        crawler.set_default_parser(parser)
+    get_metrics().disable() # Pages are timed here and recorded by the parent
+    set_site_rules(SiteRules(rules_path)) # Learned rules are sent back to the parent, not saved here
+    _run_extractors = crawler.run_extractors
+
+def _parse_batch(jobs, rules):
+    """
+    Runs in a worker process: parses and extracts every (page, extractors, tags)
+    job with crawler.run_extractors, using the parent's current site rules for
+    the batch's domains. Returns a list of (ok, result or exception, seconds)
+    per job, and the site rule updates since the previous batch.
+    """
+    get_site_rules().sync(rules)
+    results = []
+    for page, extractors, tags in jobs:
+        start = time.perf_counter()
+        try:
+            results.append((True, _run_extractors(page, extractors, tags), time.perf_counter() - start))
+        except Exception as e:
+            results.append((False, e, time.perf_counter() - start))
+    return results, get_site_rules().take_updates()
+
+# --- Parent process side ---
+class ParsePool:
+    """
+    Parses fetched pages and runs their extractors in worker processes, so
+    parsing is not limited to the one core the GIL gives all fetcher threads.
+    Pages wait in a bounded queue (submit blocks while it is full, which slows
+    the fetchers down), are sent to the workers in batches of up to batch_size
+    and come back as futures. Extractor functions are sent by reference, so
+    they must be module-level functions. Each batch carries the shared
+    site_rules registry's rules for its domains, and rules the workers learn
+    are merged back into it. If a worker dies (e.g. out of memory), the pages
+    in flight fail with BrokenProcessPool and broken is set, so callers can
+    parse the remaining pages themselves.
+    """
+    def __init__(self, workers=None, parser=None, batch_size=PARSE_BATCH_SIZE, linger=PARSE_BATCH_LINGER,
+                 max_queued=None):
+        self.workers = max(1, workers or default_parse_workers())
+        self.batch_size = max(1, batch_size)
+        self.linger = linger
+        self.broken = False
+        # Spawned rather than forked: the fetcher threads are already running, and it
+        # behaves the same on every platform (including the bundled .exe)
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'),
+                                             initializer=_init_worker, initargs=(parser, get_site_rules().path))
+        self._queue = queue.Queue(maxsize=max_queued or self.workers * self.batch_size * BATCHES_PER_WORKER)
+        self._slots = threading.Semaphore(self.workers * BATCHES_PER_WORKER)
+        self._dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+        self._dispatcher.start()
+
+    def submit(self, page, extractors, tags):
+        """
+        Queues a page returned by fetcher.fetch_page to be parsed for tags (None
+        for the full document) and run through the (name, extract) pairs.
+        Blocks while the queue is full. Returns a Future of {name: result}.
+        """
+        future = Future()
+        self._queue.put((future, page, extractors, tags))
+        return future
+
+    def extract(self, page, extractors, tags):
+        """Like crawler.run_extractors, but in a worker process; waits for the result."""
+        with _metrics.timer('parse_wait', host_of(page['url']) if _metrics.enabled else None):
+            return self.submit(page, extractors, tags).result()
+
+    def _dispatch(self):
+        closing = False
+        while not closing:
+            job = self._queue.get()
+            if job is None:
+                break
+            batch = [job]
+            deadline = time.monotonic() + self.linger
+            while len(batch) < self.batch_size:
+                try:
+                    job = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if job is None:
+                    closing = True
+                    break
+                batch.append(job)
+
+            self._slots.acquire() # At most BATCHES_PER_WORKER batches per worker in flight
+            try:
+                registry = get_site_rules()
+                rules = {domain_of(job[1]['url']): registry.get(job[1]['url']) for job in batch}
+                future = self._executor.submit(_parse_batch, [job[1:] for job in batch], rules)
+            except Exception as e: # E.g. BrokenProcessPool after a worker died
+                self._slots.release()
+                self._check_broken(e)
+                for job in batch:
+                    job[0].set_exception(e)
+                continue
+            future.add_done_callback(lambda future, batch=batch: self._batch_done(batch, future))
+
+    def _batch_done(self, batch, future):
+        self._slots.release()
+        try:
+            results, rule_updates = future.result()
+        except Exception as e:
+            self._check_broken(e)
+            for job in batch:
+                job[0].set_exception(e)
+            return
+        get_site_rules().merge(rule_updates)
+        for job, (ok, value, seconds) in zip(batch, results):
+            if _metrics.enabled:
+                _metrics.observe('parse_worker', seconds, host_of(job[1]['url']))
+            if ok:
+                job[0].set_result(value)
+            else:
+                job[0].set_exception(value)
+
+    def _check_broken(self, error):
+        # Set before the futures fail, so no page is sent to the dead pool after its own failed
+        if isinstance(error, BrokenProcessPool) and not self.broken:
+            self.broken = True
+            print("解析子行程異常結束，其餘頁面改在爬取執行緒中解析", file=sys.stderr)
+
+    def close(self):
+        """Parses the pages still queued, then stops the workers."""
+        self._queue.put(None)
+        self._dispatcher.join()
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,85 @@
+import hashlib
+import json
+import os
+import time
+
+DEFAULT_TTL_SECONDS = 24 * 60 * 60 # Reports older than a day are regenerated
+DEFAULT_MAX_ENTRIES = 200
+DEFAULT_MAX_BYTES = 20 * 1024 * 1024
+
+def normalize_title(title):
+    """Collapses whitespace and case so cosmetic differences do not change the key."""
+    return ' '.join(title.split()).casefold()
+
+def report_cache_key(model_name, prompt_template, titles, extra=None):
+    """
+    Fingerprint of one analysis request: the model, the prompt template and the
+    set of titles (order and duplicates do not matter), plus extra, any other
+    JSON-serializable input the report depends on.
+    """
+    request = {
+        'model': model_name,
+        'template': prompt_template,
+        'titles': sorted({normalize_title(title) for title in titles if title}),
+    }
+    if extra is not None:
+        request['extra'] = extra
+    payload = json.dumps(request, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class ReportCache:
+    """
+    Disk-backed cache of generated report texts, one JSON file per key.
+    Entries expire after ttl seconds; when the cache holds more than
+    max_entries files or max_bytes, the least recently used ones are removed.
+    """
+    def __init__(self, cache_dir, ttl=DEFAULT_TTL_SECONDS, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + '.json')
+
+    def get(self, key):
+        """Returns the cached report text for key, or None if missing or expired."""
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (IOError, ValueError):
+            return None
+        if time.time() - entry.get('created_at', 0) > self.ttl:
+            os.remove(path)
+            return None
+        os.utime(path) # Mark as recently used for eviction
+        return entry.get('report')
+
+    def put(self, key, report, model_name=None):
+        """Stores a report and evicts expired and least recently used entries."""
+        with open(self._path(key), 'w', encoding='utf-8') as f:
+            json.dump({'created_at': time.time(), 'model': model_name, 'report': report}, f, ensure_ascii=False)
+        self._evict()
+
+    def _evict(self):
+        now = time.time()
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        entries.sort() # Least recently used first
+        total_bytes = sum(size for _, size, _ in entries)
+        while entries:
+            mtime, size, path = entries[0]
+            over_limit = len(entries) > self.max_entries or total_bytes > self.max_bytes
+            if not over_limit and now - mtime <= self.ttl:
+                break
+            os.remove(path)
+            entries.pop(0)
+            total_bytes -= size
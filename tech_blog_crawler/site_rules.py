@@ -0,0 +1,321 @@
+import atexit
+import json
+import os
+import sys
+import threading
+from datetime import datetime
+from functools import lru_cache
+from urllib.parse import urljoin, urlsplit
+
+import soupsieve
+
+# A learned rule must cover this many of the heuristic's articles (or all of them, if fewer)
+MIN_LEARN_MATCHES = 3
+# A learned rule that finds fewer articles on a page is not trusted there: it was
+# learned from one page and may match only a featured card on another layout
+MIN_RULE_MATCHES = MIN_LEARN_MATCHES
+MIN_COVERAGE = 0.6 # Share of the heuristic's articles the learned rule must find again
+MIN_PRECISION = 0.8 # Share of the rule's matches that must be articles the heuristics found
+MAX_CONTAINER_LEVELS = 4 # How far above an article's <a> a container is looked for
+MAX_CLASSES = 2 # Classes used per selector step
+
+def default_rules_path():
+    """
+    Path of the rule registry. Like article_store.default_db_path, it lives in
+    'dist' in script mode and next to the executable in bundled (.exe) mode.
+    """
+    if getattr(sys, 'frozen', False):
+        base_path = os.path.dirname(sys.executable)
+    else:
+        base_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'dist'))
+    return os.path.join(base_path, 'site_rules.json')
+
+def domain_of(url):
+    """Registry key of a URL: its host name in lowercase, without a leading 'www.'."""
+    host = (urlsplit(url).hostname or '').lower()
+    return host[4:] if host.startswith('www.') else host
+
+@lru_cache(maxsize=512)
+def compile_selector(selector):
+    """Compiles a CSS selector once; later calls with the same selector reuse it."""
+    return soupsieve.compile(selector)
+
+def _text(element):
+    return element.get_text(strip=True)
+
+def apply_rule(rule, soup, url, limit):
+    """
+    Extracts up to limit {'title', 'link'} records with a rule: every element
+    matching rule['container'] is one article, whose title and link are its
+    first descendants matching rule['title'] and rule['link'] (the container
+    itself when those are empty).
+    """
+    results = []
+    title_selector = compile_selector(rule['title']) if rule.get('title') else None
+    link_selector = compile_selector(rule['link']) if rule.get('link') else None
+    for container in compile_selector(rule['container']).iselect(soup):
+        title_tag = title_selector.select_one(container) if title_selector else container
+        link_tag = link_selector.select_one(container) if link_selector else container
+        if title_tag is None or link_tag is None:
+            continue
+        title = _text(title_tag)
+        href = link_tag.get('href')
+        if title and href:
+            results.append({'title': title, 'link': urljoin(url, href)})
+            if len(results) >= limit:
+                break
+    return results
+
+def _step(element):
+    """CSS selector step for one element: its tag plus up to MAX_CLASSES classes without digits."""
+    classes = [name for name in element.get('class') or [] if not any(ch.isdigit() for ch in name)]
+    return element.name + ''.join('.' + soupsieve.escape(name) for name in classes[:MAX_CLASSES])
+
+def _candidate_selectors(element):
+    """Selectors for element as a container: its own step and, for a step without classes, parent > step."""
+    step = _step(element)
+    yield step
+    parent = element.parent
+    if '.' not in step and parent is not None and parent.name not in (None, '[document]'):
+        yield f"{_step(parent)} > {step}"
+
+def _relative_step(container, element):
+    """Selector for element within container, or '' if it is the container itself."""
+    return '' if element is container else _step(element)
+
+def _holds_article(element, url, wanted):
+    anchors = [element] if element.name == 'a' else element.find_all('a', href=True)
+    return any(urljoin(url, anchor.get('href', '')) in wanted for anchor in anchors)
+
+def learn_rule(soup, url, articles, limit):
+    """
+    Finds a repeated container pattern behind the articles the heuristics
+    extracted from soup (at most limit of them): for each <a> that yielded an
+    article, its ancestors (up to MAX_CONTAINER_LEVELS) are candidate
+    containers. The candidate selector that covers the most articles while its
+    first limit matches hold few other elements wins, and the title and link
+    are located inside its first match.
+    Returns a rule dictionary, or None if no pattern is reliable enough.
+    """
+    wanted = {article['link']: article['title'] for article in articles if article.get('link')}
+    if not wanted:
+        return None
+    anchors = [tag for tag in soup.find_all('a', href=True) if urljoin(url, tag['href']) in wanted]
+
+    candidates = {} # container selector -> {link: (container, anchor)}
+    levels = {} # container selector -> levels above the <a>
+    for anchor in anchors:
+        link = urljoin(url, anchor['href'])
+        element = anchor
+        for level in range(MAX_CONTAINER_LEVELS):
+            if element is None or element.name in (None, 'body', 'html', '[document]'):
+                break
+            for selector in _candidate_selectors(element):
+                candidates.setdefault(selector, {}).setdefault(link, (element, anchor))
+                levels[selector] = max(levels.get(selector, 0), level)
+            element = element.parent
+
+    required = min(MIN_LEARN_MATCHES, len(wanted))
+    best, best_score = None, (0.0, 0)
+    for selector, covered in candidates.items():
+        if len(covered) < required or len(covered) / len(wanted) < MIN_COVERAGE:
+            continue
+        if len({id(container) for container, _ in covered.values()}) < len(covered):
+            continue # Holds several articles (e.g. the whole list), not one per match
+        matches = compile_selector(selector).select(soup, limit=limit)
+        hits = sum(1 for match in matches if _holds_article(match, url, wanted))
+        precision = hits / len(matches) if matches else 0.0
+        # Ties go to the outermost container, which holds both the title and the link
+        score = (len(covered) / len(wanted) * precision, levels[selector])
+        if precision >= MIN_PRECISION and score > best_score:
+            best, best_score = selector, score
+    if best is None:
+        return None
+
+    link, (container, anchor) = next(iter(candidates[best].items()))
+    title_tag = anchor
+    for element in [container] + container.find_all(True):
+        if _text(element) == wanted[link]:
+            title_tag = element
+            if element.name in ('h1', 'h2', 'h3', 'h4', 'h5', 'h6'):
+                break
+    rule = {'container': best, 'title': _relative_step(container, title_tag), 'link': _relative_step(container, anchor)}
+
+    # On the page it was learned from, the rule must find the same articles and little else
+    found = [record['link'] for record in apply_rule(rule, soup, url, limit)]
+    matched = sum(1 for link in found if link in wanted)
+    if matched < max(required, MIN_COVERAGE * len(wanted)) or matched < MIN_PRECISION * len(found):
+        return None
+    return rule
+
+def _same_selectors(rule, other):
+    return all(rule.get(key) == other.get(key) for key in ('container', 'title', 'link'))
+
+class SiteRules:
+    """
+    Registry of per-domain extraction rules, stored as JSON:
+    {"example.com": {"container": "div.post-card", "title": "h2", "link": "a", "learned": false}}
+    Hand-written rules ("learned": false or missing) are never replaced; learned
+    rules are replaced when they stop matching. Selectors are compiled with
+    soupsieve once and reused.
+    """
+    def __init__(self, path=None):
+        self.path = path or default_rules_path()
+        self.stats = {'rule_hits': 0, 'learned': 0}
+        self._rules = {}
+        self._unlearnable = set() # Domains where learning failed in this run; not retried
+        self._new_rules = {} # Learned since the last take_updates()
+        self._learned_domains = set() # Domains whose rule was learned in this run
+        self._reported_hits = 0
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                rules = json.load(f)
+        except (IOError, ValueError):
+            return
+        for domain, rule in rules.items():
+            if not isinstance(rule, dict) or not rule.get('container'):
+                continue
+            try:
+                for key in ('container', 'title', 'link'):
+                    if rule.get(key):
+                        compile_selector(rule[key])
+            except soupsieve.SelectorSyntaxError as e:
+                print(f"略過 {domain} 的擷取規則 (選擇器無效: {e})", file=sys.stderr)
+                continue
+            self._rules[domain] = rule
+
+    def save(self):
+        """Writes the registry to disk if a rule was learned since the last save."""
+        with self._lock:
+            if not self._dirty:
+                return
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._rules, f, ensure_ascii=False, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+
+    def get(self, url):
+        return self._rules.get(domain_of(url))
+
+    def extract(self, soup, url, limit):
+        """
+        Applies the URL's domain rule. Returns (records, trusted): records is
+        empty if there is no rule or it found nothing. The records of a
+        hand-written rule are trusted if there are any, those of a learned rule
+        only if there are at least MIN_RULE_MATCHES; otherwise the caller
+        should compare them with the generic heuristics.
+        """
+        rule = self.get(url)
+        if rule is None:
+            return [], False
+        results = apply_rule(rule, soup, url, limit)
+        trusted = len(results) >= (MIN_RULE_MATCHES if rule.get('learned') else 1)
+        if trusted:
+            with self._lock:
+                self.stats['rule_hits'] += 1
+        return results, trusted
+
+    def learn(self, soup, url, articles, limit):
+        """
+        Learns and stores a rule for the URL's domain from the articles (at most
+        limit) the heuristics found, unless the domain has a hand-written rule.
+        Callers only relearn a domain whose learned rule found nothing on a page
+        (e.g. after a redesign), not one that merely found a few articles on
+        another layout. Returns the new rule or None.
+        """
+        domain = domain_of(url)
+        current = self._rules.get(domain)
+        if domain in self._unlearnable or current is not None and not current.get('learned'):
+            return None
+        rule = learn_rule(soup, url, articles, limit)
+        if rule is None:
+            with self._lock:
+                self._unlearnable.add(domain)
+            return None
+        rule.update(learned=True, source_url=url, updated=datetime.now().isoformat(timespec='seconds'))
+        with self._lock:
+            stored = self._rules.get(domain)
+            if stored is not current:
+                return stored # Another thread learned the domain meanwhile
+            return self._store(domain, rule)
+
+    def adopt(self, domain, rule):
+        """
+        Stores a rule learned by another registry (e.g. in a parse worker
+        process) unless the domain has a hand-written rule or a rule was
+        already learned for it in this run: the first one wins, so rules
+        learned independently by several workers do not replace each other.
+        Returns the domain's rule.
+        """
+        with self._lock:
+            stored = self._rules.get(domain)
+            if stored is not None and (not stored.get('learned') or domain in self._learned_domains
+                                       or _same_selectors(stored, rule)):
+                return stored
+            return self._store(domain, rule)
+
+    def sync(self, rules):
+        """
+        Takes over {domain: rule} from another registry (in a parse worker, the
+        parent's), without counting them as learned here. Domains mapped to
+        None keep their rule.
+        """
+        with self._lock:
+            for domain, rule in rules.items():
+                if rule is not None:
+                    self._rules[domain] = rule
+
+    def _store(self, domain, rule):
+        # The caller holds self._lock
+        self._rules[domain] = rule
+        self._new_rules[domain] = rule
+        self._learned_domains.add(domain)
+        self.stats['learned'] += 1
+        self._dirty = True
+        return rule
+
+    def take_updates(self):
+        """
+        Returns the rules learned ({domain: rule}) and the number of rule hits
+        since the last call, for merge() into another process's registry.
+        """
+        with self._lock:
+            learned, self._new_rules = self._new_rules, {}
+            hits, self._reported_hits = self.stats['rule_hits'] - self._reported_hits, self.stats['rule_hits']
+        return {'learned': learned, 'rule_hits': hits}
+
+    def merge(self, updates):
+        """Adds the updates another registry returned from take_updates()."""
+        for domain, rule in updates['learned'].items():
+            self.adopt(domain, rule)
+        with self._lock:
+            self.stats['rule_hits'] += updates['rule_hits']
+
+    def summary(self):
+        s = self.stats
+        return f"擷取規則: 共 {len(self._rules)} 個網域, 本次套用 {s['rule_hits']} 頁, 新學習 {s['learned']} 個"
+
+_default_rules = None
+_default_rules_lock = threading.Lock()
+
+def set_site_rules(rules):
+    """Replaces the shared registry, e.g. with SiteRules(path) for a separate rules file."""
+    global _default_rules
+    _default_rules = rules
+
+def get_site_rules():
+    """Returns the shared rule registry, loading it on first use; learned rules are saved at exit."""
+    global _default_rules
+    if _default_rules is None:
+        with _default_rules_lock:
+            if _default_rules is None:
+                _default_rules = SiteRules()
+                atexit.register(_default_rules.save)
+    return _default_rules
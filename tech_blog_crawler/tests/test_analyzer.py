@@ -0,0 +1,182 @@
+import builtins
+
+import pytest
+
+import analyzer
+from analyzer import StubModelClient, analyze_data
+
+ARTICLES = [{'title': 'Python 3.14 released'}, {'title': 'A guide to asyncio'}]
+
+def test_missing_numpy_in_stats_mode_is_not_reported_as_an_api_error(monkeypatch, capsys):
+    def compute_title_stats(articles):
+        raise ImportError("No module named 'numpy'")
+    monkeypatch.setattr(analyzer, 'compute_title_stats', compute_title_stats)
+    client = StubModelClient()
+    analyze_data(None, ARTICLES, client=client, use_cache=False, mode='stats')
+    out = capsys.readouterr().out
+    assert 'pip install numpy' in out
+    assert 'API 金鑰' not in out
+    assert client.prompts == []
+
+def test_api_key_is_only_asked_for_when_the_report_is_not_cached(monkeypatch, tmp_path):
+    from report_cache import ReportCache
+    asked = []
+    clients = []
+
+    def get_api_key():
+        asked.append(True)
+        return 'key'
+
+    def gemini_client(api_key):
+        clients.append(StubModelClient(model_name=analyzer.MODEL_NAME))
+        return clients[-1]
+
+    monkeypatch.setattr(analyzer, '_get_report_cache', lambda: ReportCache(str(tmp_path)))
+    monkeypatch.setattr(analyzer, '_save_report_menu', lambda report: None)
+    monkeypatch.setattr(analyzer, 'get_api_key', get_api_key)
+    monkeypatch.setattr(analyzer, 'GeminiClient', gemini_client)
+
+    analyze_data(None, ARTICLES)
+    assert len(asked) == 1 and len(clients[0].prompts) == 1
+    analyze_data(None, ARTICLES) # Cached: no key, no model call
+    assert len(asked) == 1 and len(clients) == 1
+
+# --- Token-budget chunking and map-reduce ---
+def test_estimate_tokens_counts_cjk_characters_one_each():
+    assert analyzer.estimate_tokens('abcdefgh') == 3
+    assert analyzer.estimate_tokens('中文標題') == 5
+
+def test_chunk_lines_respects_the_budget():
+    lines = ['x' * 36] * 5 # 10 tokens each
+    assert [len(chunk) for chunk in analyzer.chunk_lines(lines, 30)] == [3, 2]
+    assert [len(chunk) for chunk in analyzer.chunk_lines(lines, 29)] == [2, 2, 1]
+    # A line above the budget still gets a chunk of its own
+    assert analyzer.chunk_lines(['x' * 400, 'y'], 30) == [['x' * 400], ['y']]
+    assert analyzer.chunk_lines([], 30) == []
+
+def test_small_input_is_one_prompt():
+    client = StubModelClient()
+    analyzer.generate_report(client, ['Title one', 'Title two'], token_budget=1000)
+    assert len(client.prompts) == 1 and '- Title one' in client.prompts[0]
+
+def test_large_input_is_mapped_then_reduced():
+    client = StubModelClient()
+    titles = [f'A fairly long article title number {i}' for i in range(40)] # About 10 tokens each
+    report = analyzer.generate_report(client, titles, token_budget=100, workers=3)
+    map_prompts = [p for p in client.prompts if '部分標題' in p]
+    assert len(map_prompts) == len(analyzer.chunk_lines([f'- {t}' for t in titles], 100)) > 1
+    assert all(p in ''.join(map_prompts) for p in ('- A fairly long article title number 0', 'number 39'))
+    assert len(client.prompts) == len(map_prompts) + 1
+    assert 'Partial Summaries (40 titles)' in client.prompts[-1] and report.startswith('### 執行摘要')
+
+class VerboseStub(StubModelClient):
+    """Map summaries as long as their input, so they must be reduced again."""
+    def generate(self, prompt):
+        super().generate(prompt)
+        return 'summary ' * (analyzer.estimate_tokens(prompt) // 2)
+
+def test_summaries_over_the_budget_are_reduced_again():
+    client = VerboseStub()
+    titles = [f'A fairly long article title number {i}' for i in range(40)]
+    analyzer.generate_report(client, titles, token_budget=200, workers=2)
+    rounds = [p for p in client.prompts if '#### 第 1 部分' in p and 'Partial Summaries' not in p]
+    assert rounds # The second round summarizes the first round's summaries
+    assert 'Partial Summaries (40 titles)' in client.prompts[-1]
+
+class RateLimited(Exception):
+    code = 429
+
+class FlakyStub(StubModelClient):
+    def __init__(self, failures):
+        super().__init__()
+        self.failures = failures
+
+    def generate(self, prompt):
+        if self.failures:
+            self.failures -= 1
+            raise RateLimited('429 Too Many Requests')
+        return super().generate(prompt)
+
+def test_rate_limited_calls_are_retried_with_backoff(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(analyzer.time, 'sleep', sleeps.append)
+    client = FlakyStub(failures=2)
+    assert analyzer.generate_with_retry(client, 'prompt', base_delay=1.0).startswith('### 執行摘要')
+    assert len(sleeps) == 2 and 0.5 <= sleeps[0] <= 1.5 and 1.0 <= sleeps[1] <= 3.0
+
+def test_retries_give_up_and_other_errors_are_not_retried(monkeypatch):
+    monkeypatch.setattr(analyzer.time, 'sleep', lambda seconds: None)
+    with pytest.raises(RateLimited):
+        analyzer.generate_with_retry(FlakyStub(failures=3), 'prompt', max_retries=2)
+
+    class Broken(StubModelClient):
+        calls = 0
+        def generate(self, prompt):
+            Broken.calls += 1
+            raise ValueError('bad request')
+    with pytest.raises(ValueError):
+        analyzer.generate_with_retry(Broken(), 'prompt')
+    assert Broken.calls == 1
+
+# --- Local title statistics ---
+def test_cjk_runs_fall_back_to_bigrams_without_jieba(monkeypatch):
+    monkeypatch.setattr(analyzer, '_jieba', False)
+    assert analyzer.tokenize_title('大型語言模型') == ['大型', '型語', '語言', '言模', '模型']
+    # Single CJK characters, stopwords, numbers and one-letter tokens are dropped
+    assert analyzer.tokenize_title('Rust 的 未來 in 2026: a C++ 一個 X') == ['rust', 'c++', '未來']
+
+def test_jieba_lookup_is_resolved_once(monkeypatch):
+    monkeypatch.setattr(analyzer, '_jieba', None)
+    imports = []
+    real_import = builtins.__import__
+
+    def tracking_import(name, *args, **kwargs):
+        if name == 'jieba':
+            imports.append(name)
+        return real_import(name, *args, **kwargs)
+    monkeypatch.setattr('builtins.__import__', tracking_import)
+    for title in ('中文標題', '另一個標題', '第三個'):
+        analyzer.tokenize_title(title)
+    assert imports == ['jieba']
+
+ARTICLES_BY_DAY = [
+    {'title': 'Python asyncio guide', 'published': '2026-01-01T08:00:00+00:00'},
+    {'title': 'Python packaging', 'first_seen': '2026-01-02T10:00:00'}, # Crawl day when the date is unknown
+    {'title': 'Python asyncio tips', 'published': '2026-01-02'},
+]
+
+def test_title_stats_numbers():
+    np = pytest.importorskip('numpy')
+    stats = analyzer.compute_title_stats(ARTICLES_BY_DAY)
+    terms = {t['term']: t for t in stats['top_terms']}
+    assert (terms['python']['count'], terms['python']['df']) == (3, 3)
+    assert (terms['asyncio']['count'], terms['asyncio']['df']) == (2, 2)
+    idf = lambda df: np.log(4 / (1 + df)) + 1
+    assert terms['python']['tfidf'] == pytest.approx(idf(3) * (1 / 3 + 1 / 2 + 1 / 3))
+    assert terms['asyncio']['tfidf'] == pytest.approx(idf(2) * (1 / 3 + 1 / 3))
+    assert terms['packaging']['tfidf'] == pytest.approx(idf(1) / 2)
+    assert [t['tfidf'] for t in stats['top_terms']] == sorted((t['tfidf'] for t in stats['top_terms']), reverse=True)
+
+def test_title_stats_daily_counts():
+    pytest.importorskip('numpy')
+    stats = analyzer.compute_title_stats(ARTICLES_BY_DAY)
+    assert stats['num_titles'] == 3 and stats['days'] == ['2026-01-01', '2026-01-02']
+    assert [(t['term'], t['previous'], t['latest'], t['delta']) for t in stats['rising']] == [
+        ('python', 1, 2, 1), ('packaging', 0, 1, 1), ('tips', 0, 1, 1)]
+
+def test_title_stats_without_terms_or_dates():
+    pytest.importorskip('numpy')
+    assert analyzer.compute_title_stats([{'title': 'a'}]) == {'num_titles': 1, 'days': [], 'top_terms': [], 'rising': []}
+    assert analyzer.compute_title_stats([{'title': 'Python'}])['rising'] == []
+
+def test_stats_report_key_follows_the_article_days():
+    yesterday = [dict(a, first_seen='2026-01-01T09:00:00') for a in ({'title': 'Python packaging'}, {'title': 'Rust'})]
+    today = [dict(yesterday[0]), dict(yesterday[1], first_seen='2026-01-02T09:00:00')]
+    titles = analyzer._prompt_titles(yesterday)
+    assert titles == analyzer._prompt_titles(today)
+    assert analyzer._report_key('m', titles, 'stats', yesterday) != analyzer._report_key('m', titles, 'stats', today)
+    # The titles mode only sends the titles, so the days do not matter there
+    assert analyzer._report_key('m', titles, 'titles', yesterday) == analyzer._report_key('m', titles, 'titles', today)
+    # Order and title spelling do not matter either
+    shuffled = [dict(today[1], title=' RUST '), today[0]]
+    assert analyzer._report_key('m', titles, 'stats', shuffled) == analyzer._report_key('m', titles, 'stats', today)
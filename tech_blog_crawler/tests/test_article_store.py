@@ -0,0 +1,55 @@
+import pytest
+
+import article_store
+from article_store import ArticleStore
+
+@pytest.fixture
+def store(tmp_path):
+    store = ArticleStore(str(tmp_path / 'articles.sqlite3'))
+    yield store
+    store.close()
+
+def _at(monkeypatch, timestamp):
+    class FixedDatetime(article_store.datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return cls.fromisoformat(timestamp)
+    monkeypatch.setattr(article_store, 'datetime', FixedDatetime)
+
+def test_upsert_keeps_first_seen_and_refreshes_the_rest(store, monkeypatch):
+    _at(monkeypatch, '2026-01-01T08:00:00')
+    first_run = store.start_run('first')
+    assert store.add_articles([{'title': 'Old title', 'link': 'HTTPS://Blog.example/a?utm_source=x', 'published': '2025-12-31'},
+                               {'title': 'Error message', 'link': ''}], 'https://blog.example/', first_run) == 1
+    _at(monkeypatch, '2026-01-02T08:00:00')
+    second_run = store.start_run('second')
+    store.add_articles([{'title': 'New title', 'link': 'https://blog.example/a'}], 'https://blog.example/', second_run)
+
+    [article] = store.articles()
+    assert article['link'] == 'https://blog.example/a' and article['title'] == 'New title'
+    assert article['published'] == '2025-12-31' # Not erased by a record without a date
+    assert (article['first_seen'], article['last_seen']) == ('2026-01-01T08:00:00', '2026-01-02T08:00:00')
+    assert (article['first_run_id'], article['last_run_id']) == (first_run, second_run)
+    assert store.count() == 1
+
+def test_sightings_log_every_run(store, monkeypatch):
+    _at(monkeypatch, '2026-01-01T08:00:00')
+    first_run = store.start_run()
+    store.add_articles([{'title': 'A', 'link': 'https://blog.example/a'}], 'https://blog.example/', first_run)
+    _at(monkeypatch, '2026-01-02T08:00:00')
+    second_run = store.start_run()
+    store.add_articles([{'title': 'B', 'link': 'https://blog.example/b'}], 'https://blog.example/', second_run)
+    # The same article twice in one run is one sighting
+    store.add_articles([{'title': 'B', 'link': 'https://blog.example/b'}], 'https://blog.example/', second_run)
+
+    assert store.latest_run_id() == second_run
+    assert [a['link'] for a in store.articles(run_id=first_run)] == ['https://blog.example/a']
+    assert [a['link'] for a in store.articles(run_id=second_run)] == ['https://blog.example/b']
+    assert [a['link'] for a in store.articles(since='2026-01-02T00:00:00')] == ['https://blog.example/b']
+    assert len(store.articles(source_url='https://blog.example/')) == 2
+
+def test_ipv6_and_userinfo_links_stay_valid(store):
+    run_id = store.start_run()
+    store.add_articles([{'title': 'Local', 'link': 'http://[::1]:8080/a'},
+                        {'title': 'Private', 'link': 'https://user:pw@host.example/p'}], 'http://[::1]:8080/', run_id)
+    assert sorted(a['link'] for a in store.articles()) == ['http://[::1]:8080/a', 'https://user:pw@host.example/p']
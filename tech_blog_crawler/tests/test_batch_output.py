@@ -0,0 +1,57 @@
+import csv
+import json
+
+import pytest
+
+pytest.importorskip('numpy')
+
+from analyzer import load_articles_from_csv
+from crawler import _open_batch_output
+from dedup import NearDuplicateIndex
+
+PAGE_A = [{'title': 'Python 3.14 released with free-threading support', 'link': 'https://a.example/py314'},
+          {'title': 'A guide to asyncio', 'link': 'https://a.example/asyncio'}]
+PAGE_B = [{'title': 'Python 3.14 released with free-threading support!', 'link': 'https://b.example/py314'}]
+
+def _write(path, output_format, dedup_index):
+    write_page, close = _open_batch_output(str(path), 'text', output_format, dedup_index=dedup_index)
+    write_page('https://a.example/', PAGE_A, None)
+    write_page('https://b.example/', PAGE_B, None)
+    close()
+
+def test_csv_dedup_counts_merged_titles(tmp_path):
+    path = tmp_path / 'out.csv'
+    _write(path, 'csv', NearDuplicateIndex())
+    articles = load_articles_from_csv(str(path))
+    assert [(a['link'], a['count']) for a in articles] == [('https://a.example/py314', 2), ('https://a.example/asyncio', 1)]
+    assert articles[0]['source_url'] == 'https://a.example/'
+
+def test_csv_without_dedup_keeps_every_row(tmp_path):
+    path = tmp_path / 'out.csv'
+    _write(path, 'csv', None)
+    with open(path, encoding='utf-8') as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ['Title', 'Link', 'Source URL', 'Count', 'Published']
+    assert [row[3] for row in rows[1:]] == ['1', '1', '1']
+
+def test_jsonl_dedup_counts_merged_titles(tmp_path):
+    path = tmp_path / 'out.jsonl'
+    _write(path, 'jsonl', NearDuplicateIndex())
+    with open(path, encoding='utf-8') as f:
+        records = [json.loads(line) for line in f]
+    assert [(r['link'], r['count']) for r in records] == [('https://a.example/py314', 2), ('https://a.example/asyncio', 1)]
+
+def test_interactive_merge_only_applies_to_the_csv_export(monkeypatch, tmp_path):
+    import crawler
+    from article_store import ArticleStore
+    store = ArticleStore(str(tmp_path / 'articles.sqlite3'))
+    monkeypatch.setattr(crawler, 'get_article_store', lambda: store)
+    monkeypatch.setattr(crawler, '__file__', str(tmp_path / 'pkg' / 'crawler.py')) # CSV goes to tmp_path/dist/csv
+    answers = iter(['y', 'y', 'y']) # Save, export a CSV, merge near-duplicates
+    monkeypatch.setattr('builtins.input', lambda prompt: next(answers))
+    crawler.save_text_results(PAGE_A + PAGE_B, 'https://a.example/')
+
+    assert store.count() == 3
+    [csv_path] = (tmp_path / 'dist' / 'csv').iterdir()
+    articles = load_articles_from_csv(str(csv_path))
+    assert [(a['link'], a['count']) for a in articles] == [('https://a.example/py314', 2), ('https://a.example/asyncio', 1)]
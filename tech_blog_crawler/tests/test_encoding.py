@@ -0,0 +1,24 @@
+import codecs
+
+import pytest
+
+from fetcher import resolve_encoding
+
+def test_bom_is_detected():
+    assert resolve_encoding(codecs.BOM_UTF8 + b'<html></html>', {}) == ('utf-8-sig', 'bom')
+
+def test_header_charset_wins():
+    assert resolve_encoding(b'<html></html>', {'Content-Type': 'text/html; charset=Big5'})[0] == 'big5hkscs'
+
+def test_partial_chunk_may_end_inside_a_character():
+    body = ('<html><body>' + '中' * 100).encode('utf-8')
+    chunk = body[:-1] # Cuts the last character in two
+    assert resolve_encoding(chunk, {}, partial=True) == ('utf-8', 'utf-8')
+
+def test_lxml_accepts_the_streaming_encoding_of_a_bom_page():
+    etree = pytest.importorskip('lxml.etree')
+    import crawler
+    encoding, _ = resolve_encoding(codecs.BOM_UTF8 + b'<html>', {}, partial=True)
+    parser = etree.HTMLPullParser(encoding=crawler._LXML_ENCODINGS.get(encoding, encoding))
+    parser.feed(codecs.BOM_UTF8 + '<html><body><p>中文</p></body></html>'.encode('utf-8'))
+    assert [element.text for _, element in parser.read_events() if element.tag == 'p'] == ['中文']
@@ -0,0 +1,214 @@
+import gzip
+import io
+from datetime import timedelta
+
+import pytest
+import requests
+
+import crawler
+from feeds import find_feed_links, iter_feed, parse_date, read_feed
+
+class _Body(io.BytesIO):
+    """Stands in for urllib3's raw response stream (attributes can be set on it)."""
+
+class FakeResponse:
+    def __init__(self, body, content_type='application/xml', status_code=200):
+        self.body = body
+        self.headers = {'Content-Type': content_type}
+        self.status_code = status_code
+        self.raw = _Body(body)
+        self.chunks_read = 0
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f'{self.status_code} error')
+
+    def iter_content(self, chunk_size=1):
+        for start in range(0, len(self.body), chunk_size):
+            self.chunks_read += 1
+            yield self.body[start:start + chunk_size]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+class FakeSession:
+    """Serves canned responses by URL; unknown URLs answer 404."""
+    def __init__(self, routes):
+        self.routes = routes
+        self.requested = []
+
+    def get(self, url, **kwargs):
+        self.requested.append(url)
+        route = self.routes.get(url)
+        if isinstance(route, FakeResponse):
+            return route
+        if route is None:
+            return FakeResponse(b'', status_code=404)
+        return FakeResponse(route)
+
+def _read(xml, limit=20, session=None, url='https://blog.example.com/feed'):
+    return read_feed(url, limit, session=session or FakeSession({}), content=xml.encode('utf-8'))
+
+def test_rss2_items_ignore_the_channel_image():
+    xml = """<?xml version="1.0"?><rss version="2.0"><channel><title>Blog</title>
+        <image><url>https://blog.example.com/logo.png</url><title>Blog</title><link>https://blog.example.com/</link></image>
+        <item><title> First   post </title><link>/posts/1</link><pubDate>Tue, 03 Sep 2024 08:00:00 +0200</pubDate></item>
+        <item><title>Second post</title><link>https://blog.example.com/posts/2</link></item>
+        <item><link>https://blog.example.com/untitled</link></item>
+        </channel></rss>"""
+    assert _read(xml) == [
+        {'title': 'First post', 'link': 'https://blog.example.com/posts/1', 'published': '2024-09-03T06:00:00+00:00'},
+        {'title': 'Second post', 'link': 'https://blog.example.com/posts/2', 'published': None},
+    ]
+
+def test_rss1_rdf_items():
+    xml = """<?xml version="1.0"?>
+        <rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#" xmlns="http://purl.org/rss/1.0/"
+                 xmlns:dc="http://purl.org/dc/elements/1.1/">
+        <channel rdf:about="https://blog.example.com/"><title>Blog</title></channel>
+        <item rdf:about="https://blog.example.com/a"><title>RDF entry</title><dc:date>2024-05-01T10:00:00Z</dc:date></item>
+        </rdf:RDF>"""
+    assert _read(xml) == [{'title': 'RDF entry', 'link': 'https://blog.example.com/a', 'published': '2024-05-01T10:00:00+00:00'}]
+
+def test_atom_prefers_the_alternate_link():
+    xml = """<?xml version="1.0"?><feed xmlns="http://www.w3.org/2005/Atom"><title>Blog</title>
+        <link rel="self" href="https://blog.example.com/atom.xml"/>
+        <entry><title>Alternate</title><link rel="self" href="/self/1"/><link rel="alternate" href="/posts/1"/>
+               <updated>2024-01-02T00:00:00Z</updated></entry>
+        <entry><title>No rel</title><link href="/posts/2"/><published>2024-01-01T00:00:00Z</published></entry>
+        <entry><title>Only self</title><link rel="self" href="/self/3"/></entry>
+        </feed>"""
+    assert [record['link'] for record in _read(xml)] == [
+        'https://blog.example.com/posts/1', 'https://blog.example.com/posts/2', 'https://blog.example.com/self/3']
+
+def test_feed_limit_keeps_document_order():
+    items = ''.join(f'<item><title>Post {i}</title><link>/p/{i}</link></item>' for i in range(10))
+    assert [r['title'] for r in _read(f'<rss><channel>{items}</channel></rss>', limit=3)] == ['Post 0', 'Post 1', 'Post 2']
+
+def _sitemap(entries):
+    urls = ''.join(f'<url><loc>{loc}</loc><lastmod>{lastmod}</lastmod></url>' for loc, lastmod in entries)
+    return f'<?xml version="1.0"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>'
+
+def test_sitemap_keeps_the_newest_pages_with_slug_titles():
+    xml = _sitemap([('https://b.example/2024/old-but-gold-article', '2024-01-01'),
+                    ('https://b.example/2024/newest-article-title', '2024-03-01'),
+                    ('https://b.example/12345', '2024-04-01'), # No usable slug
+                    ('https://b.example/2024/middle-article-title', '2024-02-01')])
+    assert [(r['title'], r['published'][:10]) for r in _read(xml, limit=2)] == [
+        ('newest article title', '2024-03-01'), ('middle article title', '2024-02-01')]
+
+def test_gzipped_content_is_decompressed():
+    xml = _sitemap([('https://b.example/a-long-article-title', '2024-01-01')])
+    records = read_feed('https://b.example/sitemap.xml.gz', 5, FakeSession({}), content=gzip.compress(xml.encode()))
+    assert records[0]['title'] == 'a long article title'
+
+def test_sitemap_index_reads_children_and_skips_broken_ones():
+    index = """<?xml version="1.0"?><sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+        <sitemap><loc>https://b.example/posts.xml</loc><lastmod>2024-03-01</lastmod></sitemap>
+        <sitemap><loc>https://b.example/missing.xml</loc><lastmod>2024-02-01</lastmod></sitemap>
+        <sitemap><loc>https://b.example/broken.xml.gz</loc><lastmod>2024-01-01</lastmod></sitemap>
+        </sitemapindex>"""
+    session = FakeSession({
+        'https://b.example/posts.xml': _sitemap([('https://b.example/a-long-article-title', '2024-03-01')]).encode(),
+        'https://b.example/broken.xml.gz': b'\x1f\x8b' + b'not gzip at all',
+    })
+    records = read_feed('https://b.example/sitemap.xml', 5, session, content=index.encode())
+    assert [r['link'] for r in records] == ['https://b.example/a-long-article-title']
+    assert len(session.requested) == 3
+
+def test_malformed_xml_raises_syntax_error():
+    with pytest.raises(SyntaxError):
+        _read('<rss><channel><item><title>x</title></channel>')
+
+def test_iter_feed_yields_sitemap_index_records():
+    xml = b'<sitemapindex><sitemap><loc>/child.xml</loc></sitemap></sitemapindex>'
+    assert list(iter_feed(io.BytesIO(xml), 'https://b.example/')) == [
+        {'sitemap': 'https://b.example/child.xml', 'published': None}]
+
+def test_parse_date_formats():
+    assert parse_date('2024-09-03') == '2024-09-03T00:00:00'
+    assert parse_date('Tue, 03 Sep 2024 08:00:00 GMT') == '2024-09-03T08:00:00+00:00'
+    assert parse_date('yesterday') is None
+
+def test_find_feed_links_puts_comment_feeds_last():
+    html = b"""<html><head>
+        <link rel="alternate" type="application/rss+xml" title="Comments" href="/comments/feed">
+        <link rel="alternate" type="application/atom+xml" href="/atom.xml">
+        <link rel="stylesheet" href="/style.css">
+        </head><body><link rel="alternate" type="application/rss+xml" href="/body-feed"></body></html>"""
+    page = {'url': 'https://b.example/', 'content': html, 'encoding': 'utf-8'}
+    assert find_feed_links(page) == ['https://b.example/atom.xml', 'https://b.example/comments/feed']
+
+# --- stream_articles (--stream) ---
+def _listing(count, head=''):
+    cards = ''.join(f'<article><h2>A long enough title {i}</h2><a href="/p/{i}">more</a></article>' for i in range(count))
+    return f'<html><head><title>Blog</title>{head}</head><body>{cards}</body></html>'.encode()
+
+def test_stream_stops_reading_after_the_limit():
+    pytest.importorskip('lxml')
+    response = FakeResponse(_listing(200), 'text/html; charset=utf-8')
+    session = FakeSession({'https://b.example/': response})
+    records = list(crawler.stream_articles('https://b.example/', limit=5, session=session, chunk_size=1024))
+    assert [r['link'] for r in records] == [f'https://b.example/p/{i}' for i in range(5)]
+    assert response.chunks_read < len(response.body) // 1024 / 2
+
+def test_stream_reads_an_announced_feed_instead_of_the_body():
+    pytest.importorskip('lxml')
+    head = '<link rel="alternate" type="application/rss+xml" href="/feed.xml">'
+    response = FakeResponse(_listing(200, head), 'text/html; charset=utf-8')
+    feed = b'<rss><channel><item><title>From the feed</title><link>/f/1</link></item></channel></rss>'
+    session = FakeSession({'https://b.example/': response, 'https://b.example/feed.xml': feed})
+    records = list(crawler.stream_articles('https://b.example/', session=session, chunk_size=1024, feeds=True))
+    assert records == [{'title': 'From the feed', 'link': 'https://b.example/f/1', 'published': None}]
+    assert response.chunks_read <= 2
+
+def test_stream_falls_back_to_html_without_a_usable_feed():
+    pytest.importorskip('lxml')
+    head = '<link rel="alternate" type="application/rss+xml" href="/missing.xml">'
+    session = FakeSession({'https://b.example/': _listing(3, head)})
+    records = list(crawler.stream_articles('https://b.example/', session=session, feeds=True))
+    assert len(records) == 3
+
+# --- Feeds announced by a cached page ---
+class ConditionalSession:
+    """Serves {url: body} with the body's hash as ETag and answers 304 when it matches If-None-Match."""
+    def __init__(self, routes):
+        self.routes = routes
+
+    def get(self, url, headers=None, **kwargs):
+        body = self.routes[url]
+        etag = f'"{hash(body)}"'
+        response = requests.Response()
+        response.url = url
+        response.raw = io.BytesIO(b'')
+        response.elapsed = timedelta(0)
+        response.headers['ETag'] = etag
+        response.headers['Content-Type'] = 'application/xml' if url.endswith('.xml') else 'text/html; charset=utf-8'
+        if (headers or {}).get('If-None-Match') == etag:
+            response.status_code = 304
+            response._content = b''
+        else:
+            response.status_code = 200
+            response._content = body
+        return response
+
+def _rss(*titles):
+    items = ''.join(f'<item><title>{title}</title><link>/p/{i}</link></item>' for i, title in enumerate(titles))
+    return f'<rss><channel>{items}</channel></rss>'.encode()
+
+def test_announced_feed_is_revalidated_on_its_own_url(tmp_path):
+    from http_cache import HttpCache
+    cache = HttpCache(str(tmp_path / 'cache'))
+    shell = _listing(0, '<link rel="alternate" type="application/rss+xml" href="/feed.xml">')
+    session = ConditionalSession({'https://b.example/': shell, 'https://b.example/feed.xml': _rss('Old post')})
+    assert [r['title'] for r in crawler.fetch_articles('https://b.example/', session, cache)] == ['Old post']
+
+    # The HTML shell is unchanged (304) but the feed has a new entry
+    session.routes['https://b.example/feed.xml'] = _rss('New post', 'Old post')
+    assert [r['title'] for r in crawler.fetch_articles('https://b.example/', session, cache)] == ['New post', 'Old post']
+    # Both unchanged: the cached feed entries are reused
+    assert [r['title'] for r in crawler.fetch_articles('https://b.example/', session, cache)] == ['New post', 'Old post']
+    assert cache.stats['extraction_hits'] == 1
@@ -0,0 +1,108 @@
+import pytest
+import requests
+from bs4 import BeautifulSoup
+
+from frontier import BloomSeenSet, CompactSeenSet, HostScheduler, crawl_site, discover_links
+
+def _html(*links, articles=()):
+    anchors = ''.join(f'<a href="{href}">{text}</a>' for href, text in links)
+    cards = ''.join(f'<article><h2><a href="{href}">{title}</a></h2></article>' for href, title in articles)
+    return f'<html><body>{cards}{anchors}</body></html>'
+
+# A small site: the home page links to two sections, each linking one level deeper
+SITE = {
+    'https://blog.example/': _html(('/a', 'Section A'), ('/b', 'Section B'), ('https://other.example/x', 'Elsewhere'),
+                                   articles=[('/posts/1', 'A long enough first title')]),
+    'https://blog.example/a': _html(('/a/deep', 'Deeper'), ('/', 'Home'),
+                                    articles=[('/posts/1', 'A long enough first title'), ('/posts/2', 'A long enough second title')]),
+    'https://blog.example/b': _html(('/b/deep', 'Deeper'), ('/a', 'Section A')),
+    'https://blog.example/a/deep': _html(('/a/deeper', 'Even deeper')),
+    'https://blog.example/b/deep': _html(),
+    'https://blog.example/posts/1': _html(),
+    'https://blog.example/posts/2': _html(),
+}
+
+def _crawl(start='https://blog.example/', site=SITE, **kwargs):
+    fetched = []
+
+    def fetch_soup(url, session, cache, only):
+        fetched.append(url)
+        if url not in site:
+            raise requests.exceptions.HTTPError(f'404 for {url}')
+        return BeautifulSoup(site[url], 'html.parser')
+
+    pages = []
+    kwargs.setdefault('delay', 0)
+    records = crawl_site([start], session=object(), fetch_soup=fetch_soup,
+                         on_page=lambda url, records, error: pages.append((url, len(records), error)), **kwargs)
+    return records, fetched, pages
+
+def test_depth_limit():
+    _, fetched, _ = _crawl(max_depth=1)
+    assert sorted(fetched) == ['https://blog.example/', 'https://blog.example/a', 'https://blog.example/b',
+                               'https://blog.example/posts/1']
+    _, fetched, _ = _crawl(max_depth=2)
+    assert 'https://blog.example/a/deep' in fetched and 'https://blog.example/a/deeper' not in fetched
+
+def test_page_limit():
+    _, fetched, _ = _crawl(max_depth=5, max_pages=2)
+    assert len(fetched) == 2
+
+def test_stays_on_the_start_domains_and_fetches_each_page_once():
+    records, fetched, _ = _crawl(max_depth=5)
+    assert len(fetched) == len(set(fetched))
+    assert all(url.startswith('https://blog.example/') for url in fetched)
+    # /posts/1 is on two pages but returned once
+    assert [r['link'] for r in records].count('https://blog.example/posts/1') == 1
+
+def test_extraction_error_is_reported_and_the_crawl_goes_on():
+    def extract(soup, url):
+        if url.endswith('/a'):
+            raise KeyError('broken page')
+        return []
+    _, fetched, pages = _crawl(max_depth=5, extract=extract)
+    errors = {url: error for url, _, error in pages if error}
+    assert list(errors) == ['https://blog.example/a']
+    assert 'https://blog.example/b/deep' in fetched
+
+def test_fetch_error_is_reported():
+    site = dict(SITE, **{'https://blog.example/': _html(('/missing', 'Gone'), ('/b', 'Section B'))})
+    _, _, pages = _crawl(site=site, max_depth=1)
+    assert any(url.endswith('/missing') and '404' in error for url, _, error in pages if error)
+
+def test_discover_links_scopes_and_orders_pagination_first():
+    html = ('<a href="/post">Post</a><a href="/page/2">2</a><a href="https://www.blog.example/about">About</a>'
+            '<a href="https://other.example/">Other</a><a href="/logo.png">Logo</a><a href="mailto:a@b.c">Mail</a>'
+            '<a href="/archive" rel="next">Archive</a>')
+    soup = BeautifulSoup(html, 'html.parser')
+    links = discover_links(soup, 'https://blog.example/', {'blog.example'})
+    assert links == ['https://blog.example/page/2', 'https://blog.example/archive',
+                     'https://blog.example/post', 'https://www.blog.example/about']
+    assert discover_links(soup, 'https://blog.example/', {'blog.example'}, pagination_only=True) == links[:2]
+
+@pytest.mark.parametrize('seen', [CompactSeenSet(), BloomSeenSet(1000)])
+def test_seen_sets(seen):
+    assert seen.add('https://blog.example/a')
+    assert not seen.add('https://blog.example/a')
+    assert 'https://blog.example/a' in seen and 'https://blog.example/b' not in seen
+    assert len(seen) == 1
+
+def test_bloom_false_positive_rate_is_bounded():
+    seen = BloomSeenSet(2000, error_rate=0.01)
+    for i in range(2000):
+        seen.add(f'https://blog.example/{i}')
+    false_positives = sum(f'https://other.example/{i}' in seen for i in range(2000))
+    assert false_positives < 2000 * 0.03
+
+def test_host_scheduler_serializes_each_host():
+    scheduler = HostScheduler(delay=1.0)
+    scheduler.push('https://a.example/1', 0)
+    scheduler.push('https://a.example/2', 0)
+    scheduler.push('https://b.example/1', 0)
+    assert scheduler.pop_ready(0)[:2] == ('a.example', 'https://a.example/1')
+    assert scheduler.pop_ready(0)[:2] == ('b.example', 'https://b.example/1')
+    assert scheduler.pop_ready(0) is None # a.example is busy
+    scheduler.release('a.example', 10)
+    assert scheduler.pop_ready(10.5) is None and scheduler.next_wake(10.5) == pytest.approx(0.5)
+    assert scheduler.pop_ready(11)[1] == 'https://a.example/2'
+    assert not scheduler.has_pending()
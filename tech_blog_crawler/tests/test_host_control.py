@@ -0,0 +1,129 @@
+import io
+import threading
+import time
+from email.utils import formatdate
+from unittest import mock
+
+import pytest
+import requests
+from requests.adapters import HTTPAdapter
+
+import host_control
+from host_control import AdaptiveController, AdaptiveHTTPAdapter, parse_crawl_delay, parse_retry_after
+
+def _response(status, headers=None):
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers or {})
+    response.raw = io.BytesIO(b'')
+    return response
+
+def _request(url='http://example.com/page'):
+    return requests.Request('GET', url).prepare()
+
+def test_parse_retry_after():
+    assert parse_retry_after('120') == 120.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after('soon') is None
+    now = time.time()
+    assert 55 <= parse_retry_after(formatdate(now + 60, usegmt=True), now=now) <= 60
+    assert parse_retry_after(formatdate(now - 60, usegmt=True), now=now) == 0.0
+
+def test_parse_crawl_delay_prefers_specific_agent():
+    robots = "User-agent: *\nCrawl-delay: 5\n\nUser-agent: MyBot\nCrawl-delay: 0.5\n"
+    assert parse_crawl_delay(robots, 'MyBot/1.0') == 0.5
+    assert parse_crawl_delay(robots, 'OtherBot') == 5.0
+    assert parse_crawl_delay("User-agent: *\nDisallow: /x\n") is None
+
+def test_release_ok_grows_and_throttle_halves():
+    controller = AdaptiveController()
+    controller.acquire('h')
+    state = controller._hosts['h']
+    assert state.in_flight == 1
+    controller.release('h', 'ok')
+    assert state.in_flight == 0
+    assert state.limit == host_control.INITIAL_CONCURRENCY + 1
+
+    controller.acquire('h')
+    controller.release('h', 'throttled', retry_after=2)
+    assert state.limit == (host_control.INITIAL_CONCURRENCY + 1) / 2
+    assert not state.slow_start
+    assert 1.5 < state.blocked_until - time.monotonic() <= 2
+
+def test_retry_after_pause_is_capped():
+    controller = AdaptiveController()
+    controller.acquire('h')
+    controller.release('h', 'throttled', retry_after=3600)
+    assert controller._hosts['h'].blocked_until - time.monotonic() <= host_control.MAX_RETRY_AFTER
+
+def test_acquire_waits_for_a_free_slot():
+    controller = AdaptiveController(max_concurrency=1)
+    controller.acquire('h')
+    acquired = threading.Event()
+
+    def second():
+        controller.acquire('h')
+        acquired.set()
+
+    thread = threading.Thread(target=second, daemon=True)
+    thread.start()
+    assert not acquired.wait(0.2)
+    controller.release('h', 'ok')
+    assert acquired.wait(2)
+    controller.release('h', 'ok')
+    thread.join(2)
+
+def test_adapter_retries_throttled_responses():
+    controller = AdaptiveController()
+    adapter = AdaptiveHTTPAdapter(controller)
+    responses = [_response(429, {'Retry-After': '0'}), _response(200)]
+    with mock.patch.object(HTTPAdapter, 'send', side_effect=responses) as send:
+        response = adapter.send(_request())
+    assert response.status_code == 200
+    assert send.call_count == 2
+    state = controller._hosts['example.com']
+    assert state.in_flight == 0
+    assert state.throttled == 1
+
+def test_adapter_does_not_retry_long_retry_after():
+    controller = AdaptiveController()
+    adapter = AdaptiveHTTPAdapter(controller)
+    with mock.patch.object(HTTPAdapter, 'send', return_value=_response(429, {'Retry-After': '3600'})) as send:
+        response = adapter.send(_request())
+    assert response.status_code == 429
+    assert send.call_count == 1
+
+@pytest.mark.parametrize('error', [requests.exceptions.InvalidHeader('bad'),
+                                   requests.exceptions.ContentDecodingError('bad'),
+                                   requests.exceptions.ConnectionError('down'),
+                                   KeyboardInterrupt()])
+def test_adapter_frees_the_slot_when_send_raises(error):
+    controller = AdaptiveController(max_concurrency=1)
+    adapter = AdaptiveHTTPAdapter(controller)
+    with mock.patch.object(HTTPAdapter, 'send', side_effect=error):
+        with pytest.raises(type(error)):
+            adapter.send(_request())
+    assert controller._hosts['example.com'].in_flight == 0
+
+def test_adapter_reports_the_wait_before_the_final_attempt(monkeypatch):
+    monkeypatch.setattr(host_control, 'BACKOFF_BASE', 0.2)
+    monkeypatch.setattr(host_control.random, 'uniform', lambda low, high: 1.0)
+    adapter = AdaptiveHTTPAdapter(AdaptiveController())
+    with mock.patch.object(HTTPAdapter, 'send', side_effect=[_response(429), _response(200)]):
+        response = adapter.send(_request())
+    assert 0.2 <= response.wait_seconds < 1.0
+
+def test_token_bucket_reconfigure_keeps_tokens_up_to_the_new_burst():
+    bucket = host_control.TokenBucket(rate=10.0, burst=4.0)
+    bucket.reconfigure(1.0, 1.0, now=bucket._last)
+    assert bucket.reserve(bucket._last) == 0.0 # The one token left fits the new burst
+    assert bucket.reserve(bucket._last) == pytest.approx(1.0) # Then one per second
+
+def test_crawl_delay_limits_the_host_to_one_request_per_delay():
+    controller = AdaptiveController()
+    controller.set_crawl_delay('example.com', 2.0)
+    state = controller._hosts['example.com']
+    assert (state.limit, state.bucket.rate, state.bucket.burst) == (1.0, 0.5, 1.0)
+    controller.acquire('example.com') # The first request goes out at once
+    controller.release('example.com', 'ok')
+    assert state.bucket.rate == 0.5 # Growth is capped by the crawl delay
@@ -0,0 +1,36 @@
+import pytest
+
+from http_cache import HttpCache
+from site_rules import SiteRules, set_site_rules, get_site_rules
+
+URL = 'https://blog.example/'
+RECORDS = [{'title': 'Hello', 'link': 'https://blog.example/hello'}]
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = HttpCache(str(tmp_path / 'cache'))
+    cache.store(URL, b'<html></html>', {'ETag': '"1"'})
+    return cache
+
+def test_extracted_result_is_reused_under_the_same_version(cache):
+    cache.store_extracted(URL, 'articles', RECORDS, 'v1')
+    assert cache.get_extracted(URL, 'articles', 'v1') == RECORDS
+    assert cache.get_extracted(URL, 'articles', 'v2') is None
+
+def test_unversioned_legacy_entry_is_not_reused(cache):
+    cache._entries[cache._key(URL)]['extracted']['articles'] = RECORDS
+    assert cache.get_extracted(URL, 'articles') is None
+
+def test_article_version_follows_the_site_rule(tmp_path):
+    import crawler
+    previous = get_site_rules()
+    rules = SiteRules(str(tmp_path / 'rules.json'))
+    set_site_rules(rules)
+    try:
+        without_rule = crawler.extractor_version('articles', URL)
+        rules.sync({'blog.example': {'container': 'div.post', 'title': 'h2', 'link': 'a', 'learned': True}})
+        with_rule = crawler.extractor_version('articles', URL)
+        rules.sync({'blog.example': {'container': 'li.post', 'title': 'h3', 'link': 'a', 'learned': True}})
+        assert len({without_rule, with_rule, crawler.extractor_version('articles', URL)}) == 3
+    finally:
+        set_site_rules(previous)
@@ -0,0 +1,13 @@
+from crawler import _image_filename
+
+def test_same_basename_on_different_paths_gets_different_names():
+    first = _image_filename('https://example.com/a/logo.png', 'image/png', 0)
+    second = _image_filename('https://example.com/b/logo.png', 'image/png', 1)
+    assert first != second
+    assert first.startswith('logo_') and first.endswith('.png')
+
+def test_name_is_stable_for_a_url():
+    assert _image_filename('https://example.com/a/logo.png', None, 0) == _image_filename('https://example.com/a/logo.png', None, 5)
+
+def test_name_without_extension_falls_back_to_content_type():
+    assert _image_filename('https://example.com/img/', 'image/webp; charset=binary', 2) == 'image_3.webp'
@@ -0,0 +1,114 @@
+import gzip
+import os
+import sqlite3
+
+import pytest
+import requests
+
+import crawler
+from image_store import ImageStore
+
+PNG = b'\x89PNG\r\n\x1a\n' + bytes(range(256)) * 4
+
+class FakeResponse:
+    def __init__(self, body, headers=None, status_code=200):
+        self.body = body
+        self.headers = dict(headers or {})
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f'{self.status_code} error')
+
+    def iter_content(self, chunk_size=1):
+        for start in range(0, len(self.body), chunk_size):
+            yield self.body[start:start + chunk_size]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+class FakeSession:
+    """Answers GET with the image and HEAD with the given headers; counts both."""
+    def __init__(self, body=PNG, headers=None, head_headers=None):
+        self.body = body
+        self.headers = headers or {'Content-Type': 'image/png'}
+        self.head_headers = head_headers if head_headers is not None else self.headers
+        self.gets = []
+        self.heads = []
+
+    def get(self, url, **kwargs):
+        self.gets.append(url)
+        return FakeResponse(self.body, self.headers)
+
+    def head(self, url, **kwargs):
+        self.heads.append(url)
+        return FakeResponse(b'', self.head_headers)
+
+@pytest.fixture
+def store(tmp_path):
+    store = ImageStore(str(tmp_path / 'store'))
+    yield store
+    store.close()
+
+def test_same_content_under_two_urls_is_stored_once(store):
+    first = store.ingest('https://a.example/logo.png', FakeResponse(PNG))
+    second = store.ingest('https://b.example/copy.png', FakeResponse(PNG))
+    assert first[2] and not second[2]
+    assert first[0] == second[0] and first[1] == second[1] == len(PNG)
+    assert store.lookup('https://b.example/copy.png')['digest'] == first[0]
+    blobs = [name for _, _, names in os.walk(store.root) for name in names if not name.startswith('index.sqlite3')]
+    assert blobs == [first[0]]
+
+def test_known_url_is_not_downloaded_again(store, tmp_path):
+    session = FakeSession()
+    images = str(tmp_path / 'images')
+    results = [crawler.save_images(['https://a.example/logo.png'], 'https://a.example/', session=session, store=store,
+                                   output_dir=images) for _ in range(2)]
+    assert session.gets == ['https://a.example/logo.png']
+    assert [r['saved'] for r in results] == [1, 1] and results[1]['bytes'] == 0
+
+def test_is_fresh_prefers_the_etag(store):
+    store.ingest('https://a.example/logo.png', FakeResponse(PNG, {'ETag': '"v1"', 'Content-Length': str(len(PNG))}))
+    entry = store.lookup('https://a.example/logo.png')
+    assert store.is_fresh('https://a.example/logo.png', entry, FakeSession(head_headers={'ETag': '"v1"'}))
+    assert not store.is_fresh('https://a.example/logo.png', entry,
+                              FakeSession(head_headers={'ETag': '"v2"', 'Content-Length': str(len(PNG))}))
+
+@pytest.mark.parametrize('head_length, fresh', [(None, True), ('1', False), ('', False), ('12abc', False)])
+def test_is_fresh_falls_back_to_the_content_length(store, head_length, fresh):
+    store.ingest('https://a.example/logo.png', FakeResponse(PNG, {'Content-Length': str(len(PNG))}))
+    entry = store.lookup('https://a.example/logo.png')
+    headers = {'Content-Length': str(len(PNG)) if head_length is None else head_length}
+    assert store.is_fresh('https://a.example/logo.png', entry, FakeSession(head_headers=headers)) is fresh
+
+def test_gzip_served_image_stays_fresh(store):
+    # requests hands over the decoded bytes, while HEAD reports the encoded size
+    encoded_length = str(len(gzip.compress(PNG)))
+    store.ingest('https://a.example/logo.svg', FakeResponse(PNG, {'Content-Length': encoded_length, 'Content-Encoding': 'gzip'}))
+    entry = store.lookup('https://a.example/logo.svg')
+    assert store.is_fresh('https://a.example/logo.svg', entry, FakeSession(head_headers={'Content-Length': encoded_length}))
+
+def test_link_into_copies_when_hardlinks_fail(store, tmp_path, monkeypatch):
+    digest = store.ingest('https://a.example/logo.png', FakeResponse(PNG))[0]
+    def no_links(source, dest):
+        raise OSError('hardlinks not supported')
+    monkeypatch.setattr(os, 'link', no_links)
+    dest = tmp_path / 'logo.png'
+    dest.write_bytes(b'old')
+    store.link_into(digest, str(dest))
+    assert dest.read_bytes() == PNG
+
+def test_locked_index_fails_only_that_image(store, tmp_path, monkeypatch, capsys):
+    lookup = store.lookup
+    def locked_lookup(url):
+        if 'locked' in url:
+            raise sqlite3.OperationalError('database is locked')
+        return lookup(url)
+    monkeypatch.setattr(store, 'lookup', locked_lookup)
+    result = crawler.save_images(['https://a.example/locked.png', 'https://a.example/logo.png'], 'https://a.example/',
+                                 session=FakeSession(), store=store, output_dir=str(tmp_path / 'images'))
+    assert result['saved'] == 1
+    assert 'database is locked' in capsys.readouterr().out
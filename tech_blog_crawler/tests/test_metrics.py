@@ -0,0 +1,85 @@
+import json
+from datetime import timedelta
+
+import pytest
+
+import fetcher
+import metrics
+from metrics import Metrics
+
+@pytest.fixture
+def recorder():
+    recorder = Metrics()
+    recorder.enable()
+    return recorder
+
+def test_disabled_metrics_record_nothing():
+    recorder = Metrics()
+    recorder.observe('fetch', 1.0, 'a.example')
+    recorder.increment('pages')
+    with recorder.timer('parse'):
+        pass
+    assert recorder.stats() == [] and recorder.counters() == []
+
+def test_nearest_rank_percentiles(recorder):
+    for ms in range(1, 101):
+        recorder.observe('fetch', ms / 1000, 'a.example')
+    [entry] = recorder.stats()
+    assert (entry['p50'], entry['p90'], entry['p99'], entry['max']) == (0.05, 0.09, 0.099, 0.1)
+    assert entry['count'] == 100 and entry['sum'] == pytest.approx(5.05)
+
+def test_single_sample_is_every_percentile(recorder):
+    recorder.observe('save', 0.25)
+    [entry] = recorder.stats()
+    assert entry['p50'] == entry['p99'] == 0.25 and entry['host'] is None
+
+def test_reservoir_keeps_memory_bounded(recorder, monkeypatch):
+    monkeypatch.setattr(metrics, 'MAX_SAMPLES', 100)
+    for i in range(10000):
+        recorder.observe('fetch', i / 10000, 'a.example')
+    assert len(recorder._series[('fetch', 'a.example')][3]) == 100
+    [entry] = recorder.stats()
+    # Count, sum and max stay exact; the percentiles come from a uniform sample
+    assert entry['count'] == 10000 and entry['max'] == 0.9999
+    assert 0.35 < entry['p50'] < 0.65
+
+def test_jsonl_export(recorder, tmp_path):
+    recorder.observe('fetch', 0.5, 'a.example')
+    recorder.increment('pages', 2, 'a.example')
+    path = tmp_path / 'metrics.jsonl'
+    recorder.export(str(path))
+    records = [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+    assert records == [
+        {'stage': 'fetch', 'host': 'a.example', 'count': 1, 'sum': 0.5, 'max': 0.5, 'p50': 0.5, 'p90': 0.5, 'p99': 0.5, 'type': 'timing'},
+        {'name': 'pages', 'host': 'a.example', 'value': 2, 'type': 'counter'},
+    ]
+
+def test_prometheus_export(recorder, tmp_path):
+    recorder.observe('fetch', 0.5, 'a"b.example')
+    recorder.increment('pages')
+    path = tmp_path / 'metrics.prom'
+    recorder.export(str(path))
+    lines = path.read_text(encoding='utf-8').splitlines()
+    assert '# TYPE crawler_stage_seconds summary' in lines
+    assert 'crawler_stage_seconds{stage="fetch",host="a\\"b.example",quantile="0.5"} 0.500000' in lines
+    assert 'crawler_stage_seconds_count{stage="fetch",host="a\\"b.example"} 1' in lines
+    assert lines[-2:] == ['# TYPE crawler_pages_total counter', 'crawler_pages_total 1']
+
+class _Response:
+    status_code = 200
+    content = b'x' * 10
+
+    def __init__(self, elapsed, wait_seconds=None):
+        self.elapsed = timedelta(seconds=elapsed)
+        if wait_seconds is not None:
+            self.wait_seconds = wait_seconds
+
+@pytest.mark.parametrize('wait_seconds, ttfb', [(None, 0.75), (0.5, 0.25)])
+def test_ttfb_leaves_out_the_host_wait(recorder, monkeypatch, wait_seconds, ttfb):
+    monkeypatch.setattr(fetcher, '_metrics', recorder)
+    monkeypatch.setattr(fetcher.time, 'perf_counter', lambda: 101.0)
+    fetcher._record_fetch(_Response(0.75, wait_seconds), 100.0, 'a.example')
+    stages = {entry['stage']: entry['sum'] for entry in recorder.stats()}
+    assert stages['fetch'] == 1.0
+    assert stages['fetch.ttfb'] == pytest.approx(ttfb)
+    assert stages['fetch.body'] == pytest.approx(0.25)
@@ -0,0 +1,80 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmarks')))
+
+import crawler
+import site_rules
+from fixtures import article_page, gallery_page, link_page
+from parse_pool import ParsePool
+
+EXTRACTORS = [(name, crawler.EXTRACTORS[name][0]) for name in ('articles', 'images', 'meta')]
+
+def _page(url, html):
+    return {'url': url, 'content': html.encode('utf-8'), 'headers': {}, 'encoding': 'utf-8',
+            'encoding_source': 'test', 'not_modified': False}
+
+PAGES = [_page('https://a.example/', article_page(num_articles=30, paragraphs=4)),
+         _page('https://b.example/', link_page(num_links=30, paragraphs=4)),
+         _page('https://c.example/', gallery_page(num_images=20))]
+
+# Extractors run in the worker processes, which import them from this module
+def fail(soup, url):
+    raise ValueError(f"cannot extract {url}")
+
+def exit_worker(soup, url):
+    os._exit(1) # Like a worker killed for running out of memory
+
+@pytest.fixture
+def fresh_rules(tmp_path):
+    def make(name):
+        registry = site_rules.SiteRules(str(tmp_path / f'{name}.json'))
+        site_rules.set_site_rules(registry)
+        return registry
+    yield make
+    site_rules.set_site_rules(None)
+
+def _tags(page):
+    return crawler.page_tags(page['url'], [name for name, _ in EXTRACTORS])
+
+def test_pool_output_matches_parsing_in_the_thread(fresh_rules):
+    fresh_rules('threads')
+    expected = [crawler.run_extractors(page, EXTRACTORS, _tags(page)) for page in PAGES]
+    fresh_rules('pool')
+    with ParsePool(workers=2, batch_size=2) as pool:
+        futures = [pool.submit(page, EXTRACTORS, _tags(page)) for page in PAGES]
+        assert [future.result(timeout=60) for future in futures] == expected
+        assert not pool.broken
+    assert expected[0]['articles'] and expected[1]['articles'] and expected[2]['images']
+
+def test_extraction_error_fails_only_its_page(fresh_rules):
+    fresh_rules('pool')
+    with ParsePool(workers=1, batch_size=2) as pool:
+        failing = pool.submit(PAGES[0], [('fail', fail)], None)
+        ok = pool.submit(PAGES[1], EXTRACTORS, _tags(PAGES[1]))
+        with pytest.raises(ValueError, match='cannot extract'):
+            failing.result(timeout=60)
+        assert ok.result(timeout=60)['articles']
+        assert not pool.broken
+
+def test_batch_goes_on_in_threads_after_a_worker_dies(fresh_rules, monkeypatch, tmp_path):
+    fresh_rules('pool')
+    pages = {page['url']: page for page in PAGES[:2]}
+    pages['https://crash.example/'] = PAGES[0]
+    monkeypatch.setitem(crawler.EXTRACTORS, 'crash', (exit_worker, None, None))
+
+    def crawl_page(url, mode, session, cache, streaming, feeds):
+        name = 'crash' if 'crash' in url else 'articles'
+        return crawler.process_page(url, [name], page=dict(pages[url], url=url))['extracted'][name]
+    monkeypatch.setattr(crawler, '_crawl_page_for_batch', crawl_page)
+
+    output = tmp_path / 'out.jsonl'
+    urls = ['https://crash.example/', 'https://a.example/', 'https://b.example/']
+    assert crawler.run_batch(urls, str(output), workers=1, parse_workers=1) == (2, 1)
+    with open(output, encoding='utf-8') as f:
+        lines = [json.loads(line) for line in f]
+    assert lines[0]['source_url'] == 'https://crash.example/' and lines[0]['error']
+    assert {line['source_url'] for line in lines[1:]} == {'https://a.example/', 'https://b.example/'}
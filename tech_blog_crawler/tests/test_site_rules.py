@@ -0,0 +1,121 @@
+import json
+import os
+import sys
+
+import pytest
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmarks')))
+
+import crawler
+import site_rules
+from fixtures import article_page, link_page
+from site_rules import SiteRules, apply_rule, learn_rule
+
+URL = 'https://blog.example.com/'
+
+def _soup(html, only=crawler.ARTICLE_STRAINER):
+    return BeautifulSoup(html, 'html.parser', parse_only=only)
+
+def _learn(html, only=crawler.ARTICLE_STRAINER):
+    soup = _soup(html, only)
+    articles = crawler.extract_articles_heuristic(soup, URL)
+    return soup, articles, learn_rule(soup, URL, articles, crawler.MAX_ARTICLES)
+
+@pytest.fixture
+def rules(tmp_path):
+    registry = SiteRules(str(tmp_path / 'site_rules.json'))
+    site_rules.set_site_rules(registry)
+    yield registry
+    site_rules.set_site_rules(None)
+
+def test_learns_article_cards():
+    soup, articles, rule = _learn(article_page(num_articles=30, paragraphs=4))
+    assert rule == {'container': 'article.post', 'title': 'h2.title', 'link': 'a'}
+    assert apply_rule(rule, soup, URL, crawler.MAX_ARTICLES) == articles
+
+def test_learns_list_items_on_the_full_tree():
+    # The whole list holds every article, so <ul class="stories"> must not win
+    soup, articles, rule = _learn(link_page(num_links=30, paragraphs=4), only=None)
+    assert rule == {'container': 'li', 'title': 'a', 'link': 'a'}
+    assert apply_rule(rule, soup, URL, crawler.MAX_ARTICLES) == articles
+
+def test_prefers_the_outer_container_on_ties():
+    cards = ''.join(f'<article><h2><a href="/p/{i}">A long enough title {i}</a></h2></article>' for i in range(5))
+    _, _, rule = _learn(f'<html><body>{cards}</body></html>')
+    assert rule['container'] == 'article'
+    assert rule['title'] == 'h2'
+
+def test_rejects_patterns_with_low_precision():
+    # Every article link sits in a <p> next to many other <p> without articles
+    filler = ''.join(f'<p>plain paragraph {i}</p>' for i in range(20))
+    links = ''.join(f'<p><a href="/p/{i}">A long enough title {i}</a></p>' for i in range(4))
+    _, articles, rule = _learn(f'<html><body>{filler}{links}</body></html>', only=None)
+    assert len(articles) == 4
+    assert rule == {'container': 'a', 'title': '', 'link': ''} # Not 'p', which matches 24 elements for 4 articles
+
+def test_returns_none_without_a_reliable_pattern():
+    # Each article sits in a different tag, and most <a> are navigation links
+    nav = ''.join(f'<a href="/n/{i}">nav {i}</a>' for i in range(20))
+    links = ''.join(f'<{tag}><a href="/p/{i}">A long enough title {i}</a></{tag}>'
+                    for i, tag in enumerate(['span', 'em', 'b', 'strong']))
+    _, articles, rule = _learn(f'<html><body>{nav}{links}</body></html>', only=None)
+    assert len(articles) == 4
+    assert rule is None
+
+def test_needs_enough_articles():
+    _, articles, rule = _learn('<html><body><article><h2><a href="/p/1">Only one article here</a></h2></article></body></html>')
+    assert len(articles) == 1
+    assert rule is not None # A single article is all there is to cover
+    assert learn_rule(_soup('<html><body></body></html>'), URL, [], crawler.MAX_ARTICLES) is None
+
+def test_learned_rule_is_used_and_saved(rules):
+    html = article_page(num_articles=30, paragraphs=4)
+    first = crawler.extract_articles(_soup(html), URL)
+    assert rules.get(URL)['learned']
+    assert crawler.extract_articles(_soup(html), URL) == first
+    assert rules.stats == {'rule_hits': 1, 'learned': 1}
+    rules.save()
+    with open(rules.path, encoding='utf-8') as f:
+        assert json.load(f)['blog.example.com']['container'] == 'article.post'
+
+def test_few_rule_matches_fall_back_to_the_heuristics(rules):
+    crawler.extract_articles(_soup(article_page(num_articles=30, paragraphs=4)), URL)
+    # Another layout of the domain: one featured card, then plain article tags
+    featured = '<article class="post"><h2 class="title"><a href="/featured">The featured story today</a></h2></article>'
+    others = ''.join(f'<article><h3><a href="/o/{i}">Another story number {i}</a></h3></article>' for i in range(10))
+    results = crawler.extract_articles(_soup(f'<html><body>{featured}{others}</body></html>'), URL)
+    assert len(results) == 11
+    assert rules.get(URL)['container'] == 'article.post' # Not relearned from this layout
+
+def test_hand_written_rules_are_trusted_and_kept(rules):
+    rules._rules['blog.example.com'] = {'container': 'div.card', 'title': 'h2', 'link': 'a'}
+    html = '<html><body><div class="card"><h2>Hand picked</h2><a href="/x">more</a></div></body></html>'
+    assert crawler.extract_articles(_soup(html, None), URL) == [{'title': 'Hand picked', 'link': URL + 'x'}]
+    soup = _soup(article_page(num_articles=30, paragraphs=4))
+    assert rules.learn(soup, URL, crawler.extract_articles_heuristic(soup, URL), crawler.MAX_ARTICLES) is None
+    assert not rules.get(URL).get('learned')
+
+def test_invalid_selectors_are_skipped(tmp_path, capsys):
+    path = tmp_path / 'site_rules.json'
+    path.write_text(json.dumps({'a.com': {'container': 'div[', 'title': 'h2'},
+                                'b.com': {'container': 'div.ok', 'title': 'h2'}}), encoding='utf-8')
+    registry = SiteRules(str(path))
+    assert registry.get('https://a.com/') is None
+    assert registry.get('https://www.b.com/x')['container'] == 'div.ok'
+    assert 'a.com' in capsys.readouterr().err
+
+def test_adopt_keeps_the_first_rule_learned_in_a_run(rules):
+    first = {'container': 'article.post', 'title': 'h2', 'link': 'a', 'learned': True}
+    second = {'container': 'div.card', 'title': 'h3', 'link': 'a', 'learned': True}
+    assert rules.adopt('blog.example.com', first) is first
+    assert rules.adopt('blog.example.com', second) is first
+    assert rules.stats['learned'] == 1
+    assert rules.take_updates() == {'learned': {'blog.example.com': first}, 'rule_hits': 0}
+
+def test_sync_takes_over_rules_without_learning_them(rules):
+    rule = {'container': 'article.post', 'title': 'h2', 'link': 'a', 'learned': True}
+    rules.sync({'blog.example.com': rule, 'other.example.com': None})
+    assert rules.get(URL) is rule
+    assert rules.get('https://other.example.com/') is None
+    assert rules.take_updates() == {'learned': {}, 'rule_hits': 0}
@@ -0,0 +1,34 @@
+import os
+import sys
+
+import pytest
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmarks')))
+
+import crawler
+from fixtures import article_page, huge_page, link_page
+from test_feeds import FakeResponse, FakeSession
+
+URL = 'https://blog.example.com/'
+
+def _headingless_page():
+    # <article> cards without headings: both paths fall back to the prominent links, inside the cards too
+    cards = ''.join(f'<article class="card"><a href="/posts/{i}">A long enough card title number {i}</a></article>'
+                    for i in range(30))
+    return f'<html><body><nav><a href="/about">About this blog and its author</a></nav>{cards}</body></html>'
+
+@pytest.mark.parametrize('html', [
+    article_page(num_articles=30, paragraphs=20),
+    link_page(num_links=30, paragraphs=20),
+    huge_page(num_articles=30, inline_json_kb=64),
+    _headingless_page(),
+], ids=['articles', 'links', 'huge', 'headingless'])
+def test_stream_matches_the_full_parse(html):
+    pytest.importorskip('lxml')
+    body = html.encode('utf-8')
+    soup = BeautifulSoup(body, 'html.parser', parse_only=crawler.ARTICLE_STRAINER)
+    expected = crawler.extract_articles_heuristic(soup, URL)
+    session = FakeSession({URL: FakeResponse(body, 'text/html; charset=utf-8')})
+    assert list(crawler.stream_articles(URL, session=session, chunk_size=4096)) == expected
+    assert expected
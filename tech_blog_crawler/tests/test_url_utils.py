@@ -0,0 +1,21 @@
+import pytest
+
+from url_utils import normalize_url
+
+@pytest.mark.parametrize('url, expected', [
+    ('HTTPS://Blog.Example.COM', 'https://blog.example.com/'),
+    ('https://blog.example.com:443/a#top', 'https://blog.example.com/a'),
+    ('http://blog.example.com:8080/a', 'http://blog.example.com:8080/a'),
+    ('https://blog.example.com/a?b=2&utm_source=x&a=1&fbclid=y', 'https://blog.example.com/a?a=1&b=2'),
+    ('  https://blog.example.com/a \n', 'https://blog.example.com/a'),
+    ('http://[::1]:8080/a', 'http://[::1]:8080/a'),
+    ('http://[2001:DB8::1]/a', 'http://[2001:db8::1]/a'),
+    ('https://User:Pw@Host.example/p', 'https://User:Pw@host.example/p'),
+    ('https://user@host.example:443/p', 'https://user@host.example/p'),
+])
+def test_normalize_url(url, expected):
+    assert normalize_url(url) == expected
+
+@pytest.mark.parametrize('url', ['http://blog.example.com:99999/a', 'http://[::1/a'])
+def test_unparsable_url_is_returned_unchanged(url):
+    assert normalize_url(' ' + url) == url
@@ -0,0 +1,30 @@
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# Query parameters that only track the visitor and never change the page content
+TRACKING_PARAMS = ('utm_source', 'utm_medium', 'utm_campaign', 'utm_term', 'utm_content', 'fbclid', 'gclid', 'ref')
+
+def normalize_url(url):
+    """
+    Normalizes a URL so that trivially different spellings of the same page
+    compare equal: lowercases scheme and host, drops default ports, fragments and
+    tracking parameters, and sorts the query string; user info and IPv6
+    brackets are kept. A URL that cannot be parsed (e.g. with a port above
+    65535 or a broken IPv6 host) is returned stripped but otherwise unchanged.
+    """
+    url = url.strip()
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return url
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if ':' in host:
+        host = f"[{host}]" # IPv6 literal; hostname drops the brackets
+    if port and not ((scheme == 'http' and port == 80) or (scheme == 'https' and port == 443)):
+        host = f"{host}:{port}"
+    userinfo, at, _ = parts.netloc.rpartition('@')
+    path = parts.path or '/'
+    query = urlencode(sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                             if k.lower() not in TRACKING_PARAMS))
+    return urlunsplit((scheme, userinfo + at + host, path, query, ''))